@@ -1,18 +1,21 @@
+import argparse
 import asyncio
+import time
 from autogen_core import AgentId
 from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
 from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost
 from idea_generator_agent import IdeaGeneratorAgent
-from market_research_agent import MarketResearchAgent
+from market_research_agent import MarketResearchAgent, start_fetcher_pool, stop_fetcher_pool
 from evaluator_agent import EvaluatorAgent
 from message import Message
+from model_clients import close_model_clients
 from opentelemetry import trace
 import openlit
 
 tracer = trace.get_tracer("autogen-example")
 tracer_provider = trace.get_tracer_provider()
 
-async def main():
+async def main(ideas: int = 1, max_concurrency: int = 4, mcp_servers: int = 2):
 
     openlit.init(environment="test")
 
@@ -25,23 +28,36 @@ async def main():
 
     worker2 = GrpcWorkerAgentRuntime(host_address="localhost:50052", tracer_provider=tracer_provider)
     await worker2.start()
+    # start the fetch MCP servers and discover their tools up front, rather than
+    # when the first market research agent is created
+    await start_fetcher_pool(size=mcp_servers)
     await MarketResearchAgent.register(worker2, "market_research_agent", lambda: MarketResearchAgent("market_research_agent"))
 
     worker = GrpcWorkerAgentRuntime(host_address="localhost:50052", tracer_provider=tracer_provider)
     await worker.start()
-    await EvaluatorAgent.register(worker, "evaluator_agent", lambda: EvaluatorAgent("evaluator_agent"))
+    await EvaluatorAgent.register(worker, "evaluator_agent", lambda: EvaluatorAgent("evaluator_agent", ideas=ideas, max_concurrency=max_concurrency))
     agent_id = AgentId("evaluator_agent", "default")
 
     # start a span manually, so we capture all of the evaluation steps in a single trace
     with tracer.start_as_current_span("invoke-workflow") as current_span:
-        response = await worker.send_message(Message(content="Go!"), agent_id)
+        response = await worker.send_message(Message(content="Go!", sent_at=time.time()), agent_id)
 
     print(response.content)
 
     await worker.stop()
     await worker1.stop()
     await worker2.stop()
+    await stop_fetcher_pool()
+    await close_model_clients()
     await host.stop()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Generate and evaluate startup ideas with AutoGen agents")
+    parser.add_argument("--ideas", type=int, default=1,
+                        help="number of ideas to generate and research at the same time, and then rank")
+    parser.add_argument("--max-concurrency", type=int, default=4,
+                        help="maximum number of requests the evaluator sends to other agents at once")
+    parser.add_argument("--mcp-servers", type=int, default=2,
+                        help="number of fetch MCP servers shared by the market research agents")
+    args = parser.parse_args()
+    asyncio.run(main(ideas=args.ideas, max_concurrency=args.max_concurrency, mcp_servers=args.mcp_servers))
@@ -1,8 +1,16 @@
+import asyncio
+import time
+from typing import List, Tuple
+
 from autogen_core import AgentId, MessageContext, RoutedAgent, message_handler
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.messages import TextMessage
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 from message import Message
+from model_clients import get_model_client
+from opentelemetry import trace
+from sharding import shard_agent_id
+
+tracer = trace.get_tracer("autogen-example")
 
 IDEA_GENERATOR_INSTRUCTIONS = "Your role is to generate an idea for a startup based on a market trend or theme"
 
@@ -13,26 +21,81 @@ Estimate the Total Addressable Market (TAM) for this idea."""
 EVALUATION_INSTRUCTIONS = """You must make a decision on whether to proceed with the proposed startup idea.
 Based purely on the research from your market analyst, please respond with your decision and brief rationale."""
 
+RANKING_INSTRUCTIONS = """You must decide which of the proposed startup ideas to proceed with.
+Based purely on the research from your market analyst, rank the ideas from most to least promising,
+and respond with the ranking and a brief rationale for each idea."""
+
 class EvaluatorAgent(RoutedAgent):
 
-    def __init__(self, name: str) -> None:
+    def __init__(self, name: str, ideas: int = 1, max_concurrency: int = 4, workers: int = 1) -> None:
+        """
+        With more than one idea, the evaluator asks for that many ideas at the same time,
+        researches them at the same time, and ranks them with a single model call.
+        At most max_concurrency requests to the other agents are in flight at once.
+        The requests are spread across the given number of workers per agent type.
+        """
         super().__init__(name)
-        model_client = OpenAIChatCompletionClient(model="gpt-4o-mini")
+        if ideas < 1 or max_concurrency < 1:
+            raise ValueError("ideas and max_concurrency must be at least 1")
+        self._ideas = ideas
+        self._max_concurrency = max_concurrency
+        self._workers = workers
+        model_client = get_model_client(name, model="gpt-4o-mini")
         self._delegate = AssistantAgent(name, model_client=model_client)
 
     @message_handler
     async def handle_message(self, message: Message, ctx: MessageContext) -> Message:
-        idea_generator_message = Message(content=IDEA_GENERATOR_INSTRUCTIONS)
-        market_research_message = Message(content=MARKET_RESEARCH_INSTRUCTIONS)
-        idea_generator_agent = AgentId("idea_generator_agent", "default")
-        market_research_agent = AgentId("market_research_agent", "default")
-        idea = await self.send_message(idea_generator_message, idea_generator_agent)
+        if self._ideas > 1:
+            return await self._evaluate_ideas(ctx)
+
+        # the requests go to the evaluator's own key, as in _evaluate_ideas, so that
+        # evaluators don't share agent instances and are spread across the workers
+        idea_generator_message = Message(content=IDEA_GENERATOR_INSTRUCTIONS, sent_at=time.time())
+        idea_generator_agent = shard_agent_id("idea_generator_agent", self.id.key, self._workers)
+        market_research_agent = shard_agent_id("market_research_agent", self.id.key, self._workers)
+        idea = await self.send_message(idea_generator_message, idea_generator_agent,
+                                       cancellation_token=ctx.cancellation_token)
 
         market_research_request = f"## Startup Idea:\n{idea.content}\n\n{MARKET_RESEARCH_INSTRUCTIONS}\n\n"
-        market_research = await self.send_message(Message(content=market_research_request), market_research_agent)
+        market_research_message = Message(content=market_research_request, sent_at=time.time())
+        market_research = await self.send_message(market_research_message, market_research_agent,
+                                                  cancellation_token=ctx.cancellation_token)
 
         result = f"## Startup Idea:\n{idea.content}\n\n## Market Research Result:\n{market_research.content}\n\n"
         evaluation = f"{EVALUATION_INSTRUCTIONS}\n{result}Respond with your decision and brief explanation"
         message = TextMessage(content=evaluation, source="user")
         response = await self._delegate.on_messages([message], ctx.cancellation_token)
-        return Message(content=result + "\n\n## Decision:\n\n" + response.chat_message.content)
\ No newline at end of file
+        return Message(content=result + "\n\n## Decision:\n\n" + response.chat_message.content)
+
+    async def _evaluate_ideas(self, ctx: MessageContext) -> Message:
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def send(message: Message, agent_id: AgentId) -> Message:
+            async with semaphore:
+                message.sent_at = time.time()
+                return await self.send_message(message, agent_id, cancellation_token=ctx.cancellation_token)
+
+        async def research_idea(index: int) -> Tuple[str, str]:
+            # every idea goes to its own agent key, so that each one is handled by a separate
+            # agent instance with its own chat history, and the keys can be spread across workers.
+            # The keys include the evaluator's own key, so that evaluators don't share instances
+            key = f"{self.id.key}-idea-{index}"
+            with tracer.start_as_current_span("research-idea") as span:
+                span.set_attribute("startup_idea.index", index)
+                idea = await send(Message(content=IDEA_GENERATOR_INSTRUCTIONS), shard_agent_id("idea_generator_agent", key, self._workers))
+                market_research_request = f"## Startup Idea:\n{idea.content}\n\n{MARKET_RESEARCH_INSTRUCTIONS}\n\n"
+                market_research = await send(Message(content=market_research_request), shard_agent_id("market_research_agent", key, self._workers))
+                return idea.content, market_research.content
+
+        # asyncio.gather copies the current context into each task, so the requests
+        # all stay in the trace of the message being handled
+        researched: List[Tuple[str, str]] = await asyncio.gather(*(research_idea(index) for index in range(1, self._ideas + 1)))
+
+        result = "".join(
+            f"## Startup Idea {index}:\n{idea}\n\n## Market Research Result {index}:\n{market_research}\n\n"
+            for index, (idea, market_research) in enumerate(researched, start=1)
+        )
+        ranking = f"{RANKING_INSTRUCTIONS}\n{result}Respond with your ranking and brief explanation"
+        message = TextMessage(content=ranking, source="user")
+        response = await self._delegate.on_messages([message], ctx.cancellation_token)
+        return Message(content=result + "\n\n## Ranking:\n\n" + response.chat_message.content)
@@ -1,13 +1,13 @@
 from autogen_core import MessageContext, RoutedAgent, message_handler
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.messages import TextMessage
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 from message import Message
+from model_clients import get_model_client
 
 class IdeaGeneratorAgent(RoutedAgent):
     def __init__(self, name: str) -> None:
         super().__init__(name)
-        model_client = OpenAIChatCompletionClient(model="gpt-4o-mini")
+        model_client = get_model_client(name, model="gpt-4o-mini")
         self._delegate = AssistantAgent(name, model_client=model_client)
 
     @message_handler
@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from autogen_core import MessageContext, message_handler, try_get_known_serializers_for_type
+from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost
+from idea_generator_agent import IdeaGeneratorAgent
+from market_research_agent import MarketResearchAgent, start_fetcher_pool, stop_fetcher_pool
+from evaluator_agent import EvaluatorAgent
+from message import Message
+from model_clients import close_model_clients
+from opentelemetry import trace
+from sharding import shard_agent_id, worker_agent_type
+import openlit
+
+tracer = trace.get_tracer("autogen-example")
+
+AGENT_CLASSES = {
+    "idea_generator_agent": IdeaGeneratorAgent,
+    "market_research_agent": MarketResearchAgent,
+    "evaluator_agent": EvaluatorAgent,
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+@dataclass
+class WorkerStats:
+    """
+    The messages handled by one worker process.
+    """
+    agent_type: str
+    pid: int
+    handled: int = 0
+    failures: int = 0
+    # seconds between a message being sent and the worker starting to handle it
+    queue_latencies: List[float] = field(default_factory=list)
+    handler_durations: List[float] = field(default_factory=list)
+    first_received: Optional[float] = None
+    last_finished: Optional[float] = None
+
+    def record(self, sent_at: float, received: float, finished: float, failed: bool):
+        self.handled += 1
+        self.failures += failed
+        if sent_at:
+            self.queue_latencies.append(max(0.0, received - sent_at))
+        self.handler_durations.append(finished - received)
+        self.first_received = received if self.first_received is None else min(self.first_received, received)
+        self.last_finished = finished if self.last_finished is None else max(self.last_finished, finished)
+
+    @property
+    def throughput(self) -> float:
+        """Messages handled per second, while the worker was busy."""
+        if self.first_received is None or self.last_finished <= self.first_received:
+            return 0.0
+        return self.handled / (self.last_finished - self.first_received)
+
+
+class WorkerRuntime(GrpcWorkerAgentRuntime):
+    """
+    The host matches responses to requests by the worker handling the request and the
+    request ID, but request IDs are only unique per sending runtime, so when several
+    runtimes send requests to the same worker, their pending responses overwrite each
+    other and some requests never complete.  Prefix the IDs to make them unique.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._request_id_prefix = uuid.uuid4().hex[:12]
+
+    async def _get_new_request_id(self) -> str:
+        return f"{self._request_id_prefix}-{await super()._get_new_request_id()}"
+
+
+def timed_agent_class(agent_class, stats: WorkerStats):
+    """
+    Subclass the agent so that every message it handles is recorded in the worker's stats,
+    and on the span of the message.
+    """
+
+    class TimedAgent(agent_class):
+        @message_handler
+        async def handle_message(self, message: Message, ctx: MessageContext) -> Message:
+            received = time.time()
+            span = trace.get_current_span()
+            span.set_attribute("autogen.worker.agent_type", stats.agent_type)
+            span.set_attribute("autogen.worker.pid", stats.pid)
+            if message.sent_at:
+                span.set_attribute("autogen.message.queue_latency", max(0.0, received - message.sent_at))
+            failed = True
+            try:
+                response = await super().handle_message(message, ctx)
+                failed = False
+                return response
+            finally:
+                stats.record(message.sent_at, received, time.time(), failed)
+
+    TimedAgent.__name__ = TimedAgent.__qualname__ = agent_class.__name__
+    return TimedAgent
+
+
+def run_worker(agent_type: str, index: int, options: Dict, ready, stop, results) -> None:
+    """Entry point of a worker process."""
+    asyncio.run(_serve(agent_type, index, options, ready, stop, results))
+
+
+async def _serve(agent_type: str, index: int, options: Dict, ready, stop, results) -> None:
+    openlit.init(environment="test")
+    workers = options["workers"]
+    registered_type = worker_agent_type(agent_type, index, workers)
+    stats = WorkerStats(agent_type=registered_type, pid=os.getpid())
+    agent_class = timed_agent_class(AGENT_CLASSES[agent_type], stats)
+
+    if agent_type == "evaluator_agent":
+        def factory():
+            return agent_class(agent_type, ideas=options["ideas"], max_concurrency=options["max_concurrency"], workers=workers)
+    else:
+        def factory():
+            return agent_class(agent_type)
+
+    runtime = WorkerRuntime(host_address=options["host_address"], tracer_provider=trace.get_tracer_provider())
+    try:
+        await runtime.start()
+        if agent_type == "market_research_agent":
+            await start_fetcher_pool(size=options["mcp_servers"])
+        await agent_class.register(runtime, registered_type, factory)
+    except Exception as e:
+        ready.put((registered_type, repr(e)))
+        raise
+    ready.put((registered_type, None))
+
+    await asyncio.to_thread(stop.wait)
+    await runtime.stop()
+    await stop_fetcher_pool()
+    await close_model_clients()
+    results.put(stats)
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "force_flush"):
+        provider.force_flush()
+
+
+@dataclass
+class LaunchReport:
+    workers: int
+    workflows: int
+    failures: int
+    wall_time: float
+    workflow_latencies: List[float]
+    worker_stats: List[WorkerStats]
+    # the workers that crashed or didn't stop in time, so their stats are missing
+    missing_workers: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        per_minute = self.workflows / self.wall_time * 60 if self.wall_time else 0.0
+        lines = [
+            f"Ran {self.workflows - self.failures}/{self.workflows} workflows in {self.wall_time:.2f}s "
+            f"({per_minute:.1f} per minute) with {self.workers} workers per agent type",
+            f"Workflow latency p50={percentile(self.workflow_latencies, 50):.2f}s "
+            f"p99={percentile(self.workflow_latencies, 99):.2f}s",
+            "",
+            f"{'worker':<26} {'pid':>7} {'handled':>8} {'failed':>7} {'msg/s':>7} "
+            f"{'queue p50':>10} {'queue p99':>10} {'handler p50':>12}",
+        ]
+        for stats in sorted(self.worker_stats, key=lambda stats: stats.agent_type):
+            lines.append(
+                f"{stats.agent_type:<26} {stats.pid:>7} {stats.handled:>8} {stats.failures:>7} "
+                f"{stats.throughput:>7.2f} {percentile(stats.queue_latencies, 50) * 1000:>8.1f}ms "
+                f"{percentile(stats.queue_latencies, 99) * 1000:>8.1f}ms "
+                f"{percentile(stats.handler_durations, 50):>11.2f}s"
+            )
+        if self.missing_workers:
+            lines.append(f"No stats from {', '.join(sorted(self.missing_workers))}")
+        return "\n".join(lines)
+
+
+def collect_worker_stats(results, worker_names: List[str], timeout: float) -> Tuple[List[WorkerStats], List[str]]:
+    """
+    Wait up to `timeout` seconds in all for every worker to put its stats on `results`,
+    and return the stats that arrived, with the names of the workers that didn't report.
+    """
+    worker_stats: List[WorkerStats] = []
+    deadline = time.monotonic() + timeout
+    for _ in worker_names:
+        try:
+            worker_stats.append(results.get(True, max(0.0, deadline - time.monotonic())))
+        except queue.Empty:
+            break
+    reported = {stats.agent_type for stats in worker_stats}
+    return worker_stats, [name for name in worker_names if name not in reported]
+
+
+async def launch(
+    workers: int = 2,
+    workflows: int = 4,
+    concurrency: Optional[int] = None,
+    ideas: int = 2,
+    max_concurrency: int = 4,
+    mcp_servers: int = 1,
+    host_address: str = "localhost:50052",
+    startup_timeout: float = 120.0,
+) -> LaunchReport:
+    """
+    Start a gRPC host, and `workers` worker processes for each agent type, then run
+    `workflows` evaluations, `concurrency` at a time, and collect the stats of every worker.
+    """
+    if workers < 1 or workflows < 1:
+        raise ValueError("workers and workflows must be at least 1")
+    concurrency = concurrency or workers
+    options = dict(workers=workers, ideas=ideas, max_concurrency=max_concurrency,
+                   mcp_servers=mcp_servers, host_address=host_address)
+
+    host = GrpcWorkerAgentRuntimeHost(address=host_address)
+    host.start()
+
+    context = multiprocessing.get_context("spawn")
+    ready, results, stop = context.Queue(), context.Queue(), context.Event()
+    processes = [
+        context.Process(target=run_worker, args=(agent_type, index, options, ready, stop, results),
+                        name=worker_agent_type(agent_type, index, workers))
+        for agent_type in AGENT_CLASSES
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    client = WorkerRuntime(host_address=host_address, tracer_provider=trace.get_tracer_provider())
+    client_started = False
+    latencies: List[float] = []
+    failures = 0
+    worker_stats: List[WorkerStats] = []
+    missing_workers: List[str] = []
+    try:
+        for _ in processes:
+            registered_type, error = await asyncio.to_thread(ready.get, True, startup_timeout)
+            if error is not None:
+                raise RuntimeError(f"worker {registered_type} failed to start: {error}")
+
+        await client.start()
+        client_started = True
+        # the client doesn't register any agents, so it needs to be told how to serialize messages
+        client.add_message_serializer(try_get_known_serializers_for_type(Message))
+
+        async def run_client(client_index: int):
+            nonlocal failures
+            # each client sends its workflows to its own evaluator key, one after another
+            agent_id = shard_agent_id("evaluator_agent", f"client-{client_index}", workers)
+            for workflow in range(client_index, workflows, concurrency):
+                start = time.perf_counter()
+                with tracer.start_as_current_span("invoke-workflow") as span:
+                    span.set_attribute("autogen.workflow.index", workflow)
+                    span.set_attribute("autogen.workflow.evaluator", agent_id.type)
+                    try:
+                        await client.send_message(Message(content="Go!", sent_at=time.time()), agent_id)
+                    except Exception as e:
+                        span.record_exception(e)
+                        print(f"Workflow {workflow} failed: {e!r}")
+                        failures += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_client(index) for index in range(min(concurrency, workflows))))
+        wall_time = time.perf_counter() - start
+
+        stop.set()
+        worker_stats, missing_workers = await asyncio.to_thread(
+            collect_worker_stats, results, [process.name for process in processes], 30)
+    finally:
+        stop.set()
+        for process in processes:
+            await asyncio.to_thread(process.join, 30)
+            if process.is_alive():
+                process.terminate()
+        if client_started:
+            await client.stop()
+        await host.stop()
+
+    return LaunchReport(workers, workflows, failures, wall_time, latencies, worker_stats, missing_workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the AutoGen agents in several worker processes per agent type")
+    parser.add_argument("--workers", type=int, default=2, help="number of worker processes per agent type")
+    parser.add_argument("--workflows", type=int, default=4, help="number of evaluations to run")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="number of evaluations to run at the same time (defaults to --workers)")
+    parser.add_argument("--ideas", type=int, default=2, help="number of ideas each evaluation generates and ranks")
+    parser.add_argument("--max-concurrency", type=int, default=4,
+                        help="maximum number of requests each evaluator sends to other agents at once")
+    parser.add_argument("--mcp-servers", type=int, default=1,
+                        help="number of fetch MCP servers in each market research worker")
+    parser.add_argument("--host-address", default="localhost:50052")
+    args = parser.parse_args()
+
+    openlit.init(environment="test")
+    report = asyncio.run(launch(
+        workers=args.workers,
+        workflows=args.workflows,
+        concurrency=args.concurrency,
+        ideas=args.ideas,
+        max_concurrency=args.max_concurrency,
+        mcp_servers=args.mcp_servers,
+        host_address=args.host_address,
+    ))
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,46 @@
-import asyncio
 from autogen_core import MessageContext, RoutedAgent, message_handler
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.messages import TextMessage
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_ext.tools.mcp import StdioServerParams, mcp_server_tools
+from autogen_ext.tools.mcp import StdioServerParams
 
+from mcp_pool import McpServerPool
 from message import Message
+from model_clients import get_model_client
 
-_fetcher = None
+FETCH_MCP_SERVER = StdioServerParams(command="uvx", args=["mcp-server-fetch"], read_timeout_seconds=30)
+
+_fetcher_pool = None
+
+
+async def start_fetcher_pool(size: int = 2) -> None:
+    """
+    Start the fetch MCP servers shared by the market research agents in this process.
+    Call this after the worker runtime has started, and before registering the agent.
+    """
+    global _fetcher_pool
+    if _fetcher_pool is None:
+        pool = McpServerPool(FETCH_MCP_SERVER, size=size)
+        await pool.start()
+        _fetcher_pool = pool
+
+
+async def stop_fetcher_pool() -> None:
+    global _fetcher_pool
+    if _fetcher_pool is not None:
+        await _fetcher_pool.stop()
+        _fetcher_pool = None
 
 
 def _get_fetcher():
-    global _fetcher
-    if _fetcher is None:
-        fetch_mcp_server = StdioServerParams(command="uvx", args=["mcp-server-fetch"], read_timeout_seconds=30)
-        _fetcher = asyncio.run(mcp_server_tools(fetch_mcp_server))
-    return _fetcher
+    if _fetcher_pool is None:
+        raise RuntimeError("start_fetcher_pool() must be awaited before creating a MarketResearchAgent")
+    return _fetcher_pool.tools()
 
 
 class MarketResearchAgent(RoutedAgent):
     def __init__(self, name: str) -> None:
         super().__init__(name)
-        model_client = OpenAIChatCompletionClient(model="gpt-4o-mini")
+        model_client = get_model_client(name, model="gpt-4o-mini")
 
         self._delegate = AssistantAgent(name, model_client=model_client, tools=_get_fetcher(), reflect_on_tool_use=True)
 
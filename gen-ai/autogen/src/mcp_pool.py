@@ -0,0 +1,75 @@
+import asyncio
+import itertools
+from typing import List, Optional
+
+from autogen_ext.tools.mcp import McpServerParams, create_mcp_server_session, mcp_server_tools
+from opentelemetry import trace
+
+tracer = trace.get_tracer("autogen-example")
+
+
+class McpServerPool:
+    """
+    A fixed number of long-lived MCP server sessions, shared by all of the agents in a process.
+
+    Without a session, MCP tool adapters start a new server, e.g. a `uvx mcp-server-fetch`
+    subprocess, for every tool call.  The pool starts its servers and discovers their tools
+    once, when the worker runtime starts, and then hands the tools of each server out to
+    agents in turn.
+    """
+
+    def __init__(self, server_params: McpServerParams, size: int = 2) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._server_params = server_params
+        self._size = size
+        self._tools: List[list] = []
+        self._next = itertools.count()
+        self._stopping: Optional[asyncio.Event] = None
+        self._session_tasks: List[asyncio.Task] = []
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tools)
+
+    async def start(self) -> None:
+        if self.started:
+            return
+        self._stopping = asyncio.Event()
+        with tracer.start_as_current_span("start-mcp-servers") as span:
+            span.set_attribute("mcp.server.count", self._size)
+            sessions = [asyncio.get_running_loop().create_future() for _ in range(self._size)]
+            # each session is entered and exited by its own task, since the stdio client
+            # has to be closed by the same task that opened it
+            self._session_tasks = [asyncio.create_task(self._hold_session(session)) for session in sessions]
+            try:
+                for session in await asyncio.gather(*sessions):
+                    self._tools.append(await mcp_server_tools(self._server_params, session=session))
+            except BaseException:
+                await self.stop()
+                raise
+            span.set_attribute("mcp.tool.count", len(self._tools[0]))
+
+    async def _hold_session(self, started: asyncio.Future) -> None:
+        try:
+            async with create_mcp_server_session(self._server_params) as session:
+                await session.initialize()
+                started.set_result(session)
+                await self._stopping.wait()
+        except BaseException as e:
+            if not started.done():
+                started.set_exception(e)
+            raise
+
+    def tools(self) -> list:
+        """The tools of the next server in the pool."""
+        if not self.started:
+            raise RuntimeError("the MCP server pool hasn't been started")
+        return self._tools[next(self._next) % len(self._tools)]
+
+    async def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+        await asyncio.gather(*self._session_tasks, return_exceptions=True)
+        self._session_tasks = []
+        self._tools = []
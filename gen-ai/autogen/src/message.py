@@ -3,3 +3,6 @@ from dataclasses import dataclass
 @dataclass
 class Message:
     content: str
+    # time.time() when the message was sent, used to measure how long it was queued
+    # (0 if unknown; optional fields aren't supported by the dataclass serializer)
+    sent_at: float = 0.0
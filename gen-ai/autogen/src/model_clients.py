@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Dict, Literal, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo, RequestUsage
+from autogen_core.tools import Tool, ToolSchema
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from opentelemetry import trace
+from pydantic import BaseModel
+
+tracer = trace.get_tracer("autogen-example")
+
+
+class RequestLimiter:
+    """
+    Limits the number of model requests in flight, and optionally the number of requests
+    started per second, across all of the agents in the process.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_second: float = 0.0) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_start = 0.0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[float, None]:
+        """Wait for a free slot, yielding how many seconds the request had to wait."""
+        start = time.perf_counter()
+        async with self._semaphore:
+            if self._interval:
+                now = time.monotonic()
+                # reserve the next start time before sleeping, so waiting requests are spaced out
+                start_at = max(now, self._next_start)
+                self._next_start = start_at + self._interval
+                await asyncio.sleep(start_at - now)
+            yield time.perf_counter() - start
+
+
+class AgentModelClient(ChatCompletionClient):
+    """
+    An agent's handle on a model client that is shared by all of the agents in the process.
+
+    Requests go through the process-wide limiter, and each one is recorded in a
+    model-request span attributed to the agent, with the tokens it used.  Usage is also
+    tracked per agent, since the shared client's usage covers every agent.
+    """
+
+    def __init__(self, client: ChatCompletionClient, agent_name: str, model: str, limiter: RequestLimiter) -> None:
+        self._client = client
+        self._agent_name = agent_name
+        self._model = model
+        self._limiter = limiter
+        self._actual_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    @property
+    def client(self) -> ChatCompletionClient:
+        return self._client
+
+    @asynccontextmanager
+    async def _request(self):
+        with tracer.start_as_current_span("model-request") as span:
+            span.set_attribute("gen_ai.agent.name", self._agent_name)
+            span.set_attribute("gen_ai.request.model", self._model)
+            async with self._limiter.acquire() as waited:
+                span.set_attribute("autogen.model_client.wait_time", waited)
+                yield span
+
+    def _record_usage(self, span, result: CreateResult) -> None:
+        usage = result.usage
+        span.set_attribute("gen_ai.usage.input_tokens", usage.prompt_tokens)
+        span.set_attribute("gen_ai.usage.output_tokens", usage.completion_tokens)
+        self._total_usage = RequestUsage(
+            prompt_tokens=self._total_usage.prompt_tokens + usage.prompt_tokens,
+            completion_tokens=self._total_usage.completion_tokens + usage.completion_tokens,
+        )
+        if not result.cached:
+            self._actual_usage = RequestUsage(
+                prompt_tokens=self._actual_usage.prompt_tokens + usage.prompt_tokens,
+                completion_tokens=self._actual_usage.completion_tokens + usage.completion_tokens,
+            )
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        async with self._request() as span:
+            result = await self._client.create(
+                messages,
+                tools=tools,
+                tool_choice=tool_choice,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+            self._record_usage(span, result)
+            return result
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            async with self._request() as span:
+                async for chunk in self._client.create_stream(
+                    messages,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                ):
+                    if isinstance(chunk, CreateResult):
+                        self._record_usage(span, chunk)
+                    yield chunk
+
+        return _generator()
+
+    async def close(self) -> None:
+        # the shared client is closed by close_model_clients(), once no agent needs it
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._actual_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+
+_clients: Dict[str, ChatCompletionClient] = {}
+_limiter: Optional[RequestLimiter] = None
+_lock = threading.Lock()
+
+
+def get_model_client(agent_name: str, model: str = "gpt-4o-mini", **config: Any) -> AgentModelClient:
+    """
+    Borrow the process-wide OpenAI client for the given model and configuration, so that
+    agents share its HTTP connection pool rather than each opening their own.
+
+    The limiter is configured with the AUTOGEN_MAX_CONCURRENT_REQUESTS (8 by default) and
+    AUTOGEN_REQUESTS_PER_SECOND (unlimited by default) environment variables.
+    """
+    global _limiter
+    key = json.dumps({"model": model, **config}, sort_keys=True, default=str)
+    with _lock:
+        if _limiter is None:
+            _limiter = RequestLimiter(
+                max_concurrency=int(os.getenv("AUTOGEN_MAX_CONCURRENT_REQUESTS", "8")),
+                requests_per_second=float(os.getenv("AUTOGEN_REQUESTS_PER_SECOND", "0")),
+            )
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = OpenAIChatCompletionClient(model=model, **config)
+        return AgentModelClient(client, agent_name, model, _limiter)
+
+
+async def close_model_clients() -> None:
+    """Close the shared clients, e.g. when the worker runtime stops."""
+    global _limiter
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _limiter = None
+    for client in clients:
+        await client.close()
@@ -0,0 +1,29 @@
+import hashlib
+
+from autogen_core import AgentId
+
+
+def worker_agent_type(agent_type: str, index: int, workers: int = 1) -> str:
+    """
+    The agent type registered by the given worker.
+
+    The gRPC host routes every agent type to a single worker, so when an agent type is
+    scaled out to several workers, each worker registers the type with its index as a
+    suffix, e.g. idea_generator_agent_0.
+    """
+    if workers <= 1:
+        return agent_type
+    return f"{agent_type}_{index}"
+
+
+def shard_agent_type(agent_type: str, key: str, workers: int = 1) -> str:
+    """
+    The agent type of the worker that handles the given agent key.  Keys are spread across
+    the workers by a stable hash, so the same key is always handled by the same agent instance.
+    """
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return worker_agent_type(agent_type, int.from_bytes(digest[:8], "big") % max(workers, 1), workers)
+
+
+def shard_agent_id(agent_type: str, key: str, workers: int = 1) -> AgentId:
+    return AgentId(shard_agent_type(agent_type, key, workers), key)
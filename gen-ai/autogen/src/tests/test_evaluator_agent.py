@@ -1,11 +1,14 @@
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from autogen_core import AgentId
 
 from evaluator_agent import (
     EVALUATION_INSTRUCTIONS,
     IDEA_GENERATOR_INSTRUCTIONS,
     MARKET_RESEARCH_INSTRUCTIONS,
+    RANKING_INSTRUCTIONS,
     EvaluatorAgent,
 )
 from message import Message
@@ -19,7 +22,7 @@ def test_instruction_constants_are_defined():
 
 @pytest.mark.asyncio
 @patch("evaluator_agent.AssistantAgent")
-@patch("evaluator_agent.OpenAIChatCompletionClient")
+@patch("evaluator_agent.get_model_client")
 async def test_handle_message_orchestrates_agents(mock_client_cls, mock_assistant_cls):
     mock_delegate = AsyncMock()
     mock_response = MagicMock()
@@ -27,7 +30,8 @@ async def test_handle_message_orchestrates_agents(mock_client_cls, mock_assistan
     mock_delegate.on_messages = AsyncMock(return_value=mock_response)
     mock_assistant_cls.return_value = mock_delegate
 
-    agent = EvaluatorAgent("evaluator_agent")
+    agent = EvaluatorAgent("evaluator_agent", workers=4)
+    await agent.bind_id_and_runtime(AgentId("evaluator_agent", "client-1"), MagicMock())
     agent.send_message = AsyncMock(
         side_effect=[
             Message(content="Eco-friendly lunch containers"),
@@ -44,4 +48,59 @@ async def test_handle_message_orchestrates_agents(mock_client_cls, mock_assistan
     assert "Strong demand with moderate competition." in result.content
     assert "Proceed with the idea." in result.content
     assert agent.send_message.await_count == 2
+    assert all(call.args[0].sent_at > 0 for call in agent.send_message.await_args_list)
+    assert [call.args[1].key for call in agent.send_message.await_args_list] == ["client-1", "client-1"]
+    assert all(call.kwargs["cancellation_token"] is context.cancellation_token
+               for call in agent.send_message.await_args_list)
     mock_delegate.on_messages.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("evaluator_agent.AssistantAgent")
+@patch("evaluator_agent.get_model_client")
+async def test_multiple_ideas_are_researched_concurrently_and_ranked_once(mock_client_cls, mock_assistant_cls):
+    mock_delegate = AsyncMock()
+    mock_response = MagicMock()
+    mock_response.chat_message.content = "Idea 2 is the most promising."
+    mock_delegate.on_messages = AsyncMock(return_value=mock_response)
+    mock_assistant_cls.return_value = mock_delegate
+
+    tracker = {"running": 0, "peak": 0}
+    recipients = []
+
+    async def send_message(message, recipient, cancellation_token=None):
+        recipients.append(recipient)
+        tracker["running"] += 1
+        tracker["peak"] = max(tracker["peak"], tracker["running"])
+        await asyncio.sleep(0.01)
+        tracker["running"] -= 1
+        return Message(content=f"{recipient.type} for {recipient.key}")
+
+    agent = EvaluatorAgent("evaluator_agent", ideas=3, max_concurrency=2)
+    await agent.bind_id_and_runtime(AgentId("evaluator_agent", "default"), MagicMock())
+    agent.send_message = send_message
+
+    context = MagicMock()
+    result = await agent.handle_message(Message(content="Go!"), context)
+
+    assert tracker["peak"] == 2
+    assert sorted((recipient.type, recipient.key) for recipient in recipients) == [
+        ("idea_generator_agent", "default-idea-1"),
+        ("idea_generator_agent", "default-idea-2"),
+        ("idea_generator_agent", "default-idea-3"),
+        ("market_research_agent", "default-idea-1"),
+        ("market_research_agent", "default-idea-2"),
+        ("market_research_agent", "default-idea-3"),
+    ]
+    assert "## Startup Idea 3:\nidea_generator_agent for default-idea-3" in result.content
+    assert "## Market Research Result 1:\nmarket_research_agent for default-idea-1" in result.content
+    assert result.content.endswith("## Ranking:\n\nIdea 2 is the most promising.")
+    mock_delegate.on_messages.assert_awaited_once()
+    assert mock_delegate.on_messages.await_args.args[0][0].content.startswith(RANKING_INSTRUCTIONS)
+
+
+@patch("evaluator_agent.AssistantAgent")
+@patch("evaluator_agent.get_model_client")
+def test_rejects_invalid_idea_counts(mock_client_cls, mock_assistant_cls):
+    with pytest.raises(ValueError):
+        EvaluatorAgent("evaluator_agent", ideas=0)
@@ -8,7 +8,7 @@ from message import Message
 
 @pytest.mark.asyncio
 @patch("idea_generator_agent.AssistantAgent")
-@patch("idea_generator_agent.OpenAIChatCompletionClient")
+@patch("idea_generator_agent.get_model_client")
 async def test_handle_message_returns_delegate_response(mock_client_cls, mock_assistant_cls):
     mock_delegate = AsyncMock()
     mock_response = MagicMock()
@@ -24,4 +24,4 @@ async def test_handle_message_returns_delegate_response(mock_client_cls, mock_as
 
     assert result.content == "A subscription box for houseplants"
     mock_delegate.on_messages.assert_awaited_once()
-    mock_client_cls.assert_called_once_with(model="gpt-4o-mini")
+    mock_client_cls.assert_called_once_with("idea_generator_agent", model="gpt-4o-mini")
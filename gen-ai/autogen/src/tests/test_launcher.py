@@ -0,0 +1,96 @@
+import queue
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from idea_generator_agent import IdeaGeneratorAgent
+from launcher import LaunchReport, WorkerStats, collect_worker_stats, percentile, timed_agent_class
+from message import Message
+from sharding import shard_agent_id, shard_agent_type, worker_agent_type
+
+
+def test_single_worker_keeps_the_agent_type():
+    assert worker_agent_type("idea_generator_agent", 0) == "idea_generator_agent"
+    assert shard_agent_id("idea_generator_agent", "default").type == "idea_generator_agent"
+
+
+def test_keys_are_spread_across_workers_and_always_go_to_the_same_one():
+    keys = [f"client-{client}-idea-{idea}" for client in range(4) for idea in range(1, 5)]
+
+    types = {shard_agent_type("idea_generator_agent", key, 3) for key in keys}
+
+    assert types == {"idea_generator_agent_0", "idea_generator_agent_1", "idea_generator_agent_2"}
+    assert all(shard_agent_type("idea_generator_agent", key, 3) == shard_agent_type("idea_generator_agent", key, 3)
+               for key in keys)
+    assert shard_agent_id("market_research_agent", "client-0", 3).key == "client-0"
+
+
+@pytest.mark.asyncio
+@patch("idea_generator_agent.AssistantAgent")
+@patch("idea_generator_agent.get_model_client")
+async def test_timed_agent_records_queue_latency_and_duration(mock_client_cls, mock_assistant_cls):
+    mock_response = MagicMock()
+    mock_response.chat_message.content = "An idea"
+    mock_assistant_cls.return_value.on_messages = AsyncMock(return_value=mock_response)
+    stats = WorkerStats(agent_type="idea_generator_agent_0", pid=1)
+
+    agent_class = timed_agent_class(IdeaGeneratorAgent, stats)
+    agent = agent_class("idea_generator_agent")
+    result = await agent.handle_message(Message(content="Go!", sent_at=time.time() - 0.5), MagicMock())
+    await agent.handle_message(Message(content="Go!"), MagicMock())
+
+    assert agent_class.__name__ == "IdeaGeneratorAgent"
+    assert result.content == "An idea"
+    assert stats.handled == 2 and stats.failures == 0
+    assert len(stats.queue_latencies) == 1 and stats.queue_latencies[0] >= 0.5
+    assert len(stats.handler_durations) == 2
+
+
+@pytest.mark.asyncio
+@patch("idea_generator_agent.AssistantAgent")
+@patch("idea_generator_agent.get_model_client")
+async def test_timed_agent_records_failures(mock_client_cls, mock_assistant_cls):
+    mock_assistant_cls.return_value.on_messages = AsyncMock(side_effect=RuntimeError("rate limited"))
+    stats = WorkerStats(agent_type="idea_generator_agent", pid=1)
+
+    agent = timed_agent_class(IdeaGeneratorAgent, stats)("idea_generator_agent")
+    with pytest.raises(RuntimeError):
+        await agent.handle_message(Message(content="Go!"), MagicMock())
+
+    assert stats.failures == 1
+
+
+def test_report_lists_every_worker():
+    busy = WorkerStats(agent_type="market_research_agent_1", pid=42)
+    busy.record(sent_at=9.9, received=10.0, finished=11.0, failed=False)
+    busy.record(sent_at=10.5, received=10.7, finished=12.0, failed=False)
+    idle = WorkerStats(agent_type="market_research_agent_0", pid=41)
+
+    summary = LaunchReport(2, 2, 0, 4.0, [1.0, 3.0], [busy, idle]).summary()
+
+    assert busy.throughput == 1.0
+    assert idle.throughput == 0.0
+    assert "Ran 2/2 workflows in 4.00s (30.0 per minute) with 2 workers per agent type" in summary
+    lines = summary.splitlines()
+    assert lines[-2].startswith("market_research_agent_0")
+    assert lines[-1].split()[:5] == ["market_research_agent_1", "42", "2", "0", "1.00"]
+
+
+def test_missing_workers_leave_a_partial_report():
+    results = queue.Queue()
+    results.put(WorkerStats(agent_type="idea_generator_agent_0", pid=41))
+
+    start = time.monotonic()
+    worker_stats, missing = collect_worker_stats(results, ["idea_generator_agent_0", "idea_generator_agent_1"], 0.1)
+    summary = LaunchReport(2, 1, 0, 1.0, [1.0], worker_stats, missing).summary()
+
+    assert time.monotonic() - start < 1
+    assert [stats.pid for stats in worker_stats] == [41]
+    assert missing == ["idea_generator_agent_1"]
+    assert summary.splitlines()[-1] == "No stats from idea_generator_agent_1"
+
+
+def test_percentile_uses_nearest_rank():
+    assert percentile([0.3, 0.1, 0.2], 50) == 0.2
+    assert percentile([], 99) == 0.0
@@ -2,14 +2,14 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from market_research_agent import MarketResearchAgent
+from market_research_agent import MarketResearchAgent, _get_fetcher
 from message import Message
 
 
 @pytest.mark.asyncio
 @patch("market_research_agent._get_fetcher", return_value=[])
 @patch("market_research_agent.AssistantAgent")
-@patch("market_research_agent.OpenAIChatCompletionClient")
+@patch("market_research_agent.get_model_client")
 async def test_handle_message_returns_delegate_response(
     mock_client_cls, mock_assistant_cls, mock_get_fetcher
 ):
@@ -28,3 +28,8 @@ async def test_handle_message_returns_delegate_response(
     assert result.content == "The market looks promising."
     mock_get_fetcher.assert_called_once()
     mock_delegate.on_messages.assert_awaited_once()
+
+
+def test_fetcher_requires_the_pool_to_be_started():
+    with pytest.raises(RuntimeError):
+        _get_fetcher()
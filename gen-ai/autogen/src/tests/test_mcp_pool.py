@@ -0,0 +1,70 @@
+import json
+import os
+import sys
+import textwrap
+
+import pytest
+from autogen_core import CancellationToken
+from autogen_ext.tools.mcp import StdioServerParams
+
+from mcp_pool import McpServerPool
+
+ECHO_SERVER = textwrap.dedent("""
+    import os
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP("echo")
+
+    @server.tool()
+    def echo(text: str) -> str:
+        return f"{os.getpid()}: {text}"
+
+    server.run()
+""")
+
+
+@pytest.fixture
+def echo_server(tmp_path):
+    script = tmp_path / "echo_server.py"
+    script.write_text(ECHO_SERVER)
+    return StdioServerParams(command=sys.executable, args=[str(script)], read_timeout_seconds=30)
+
+
+@pytest.mark.asyncio
+async def test_pool_shares_long_lived_servers_between_agents(echo_server):
+    pool = McpServerPool(echo_server, size=2)
+    await pool.start()
+    try:
+        first, second, third = pool.tools(), pool.tools(), pool.tools()
+        assert [tool.name for tool in first] == ["echo"]
+        assert third is first and second is not first
+
+        token = CancellationToken()
+        pids = set()
+        for tools in (first, second, third, first):
+            result = await tools[0].run_json({"text": "hi"}, token)
+            text = json.loads(tools[0].return_value_as_string(result))[0]["text"]
+            pids.add(text.split(":")[0])
+        # every call was served by one of the two servers started with the pool
+        assert len(pids) == 2
+        assert str(os.getpid()) not in pids
+    finally:
+        await pool.stop()
+
+    assert not pool.started
+
+
+@pytest.mark.asyncio
+async def test_tools_require_a_started_pool(echo_server):
+    with pytest.raises(RuntimeError):
+        McpServerPool(echo_server).tools()
+
+
+@pytest.mark.asyncio
+async def test_failed_start_cleans_up():
+    pool = McpServerPool(StdioServerParams(command=sys.executable, args=["-c", "pass"], read_timeout_seconds=5))
+
+    with pytest.raises(BaseException):
+        await pool.start()
+
+    assert not pool.started
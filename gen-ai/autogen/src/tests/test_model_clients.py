@@ -0,0 +1,116 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from autogen_core.models import CreateResult, RequestUsage, UserMessage
+
+from model_clients import AgentModelClient, RequestLimiter, close_model_clients, get_model_client
+
+
+def create_result(prompt_tokens=10, completion_tokens=5):
+    return CreateResult(
+        finish_reason="stop",
+        content="An idea",
+        usage=RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+        cached=False,
+    )
+
+
+@pytest.fixture(autouse=True)
+async def reset_registry():
+    yield
+    await close_model_clients()
+
+
+@patch("model_clients.OpenAIChatCompletionClient", side_effect=lambda **config: MagicMock(close=AsyncMock()))
+def test_agents_share_a_client_per_model_and_config(mock_client_cls):
+    idea_generator = get_model_client("idea_generator_agent", model="gpt-4o-mini")
+    evaluator = get_model_client("evaluator_agent", model="gpt-4o-mini")
+    other = get_model_client("evaluator_agent", model="gpt-4o-mini", temperature=0.2)
+
+    assert idea_generator is not evaluator
+    assert idea_generator.client is evaluator.client
+    assert other.client is not evaluator.client
+    assert mock_client_cls.call_count == 2
+    mock_client_cls.assert_any_call(model="gpt-4o-mini", temperature=0.2)
+
+
+@pytest.mark.asyncio
+async def test_usage_is_tracked_per_agent_and_recorded_on_spans():
+    shared = MagicMock()
+    shared.create = AsyncMock(side_effect=[create_result(10, 5), create_result(20, 7)])
+    limiter = RequestLimiter(max_concurrency=2)
+    first = AgentModelClient(shared, "idea_generator_agent", "gpt-4o-mini", limiter)
+    second = AgentModelClient(shared, "evaluator_agent", "gpt-4o-mini", limiter)
+
+    with patch("model_clients.tracer") as mock_tracer:
+        await first.create([UserMessage(content="Go!", source="user")])
+        await second.create([UserMessage(content="Go!", source="user")])
+
+    assert first.total_usage() == RequestUsage(prompt_tokens=10, completion_tokens=5)
+    assert second.actual_usage() == RequestUsage(prompt_tokens=20, completion_tokens=7)
+    span = mock_tracer.start_as_current_span.return_value.__enter__.return_value
+    span.set_attribute.assert_any_call("gen_ai.agent.name", "idea_generator_agent")
+    span.set_attribute.assert_any_call("gen_ai.agent.name", "evaluator_agent")
+    span.set_attribute.assert_any_call("gen_ai.usage.input_tokens", 20)
+
+
+@pytest.mark.asyncio
+async def test_streamed_usage_is_recorded():
+    async def stream(*args, **kwargs):
+        yield "An "
+        yield create_result(3, 2)
+
+    shared = MagicMock()
+    shared.create_stream = stream
+    client = AgentModelClient(shared, "idea_generator_agent", "gpt-4o-mini", RequestLimiter())
+
+    chunks = [chunk async for chunk in client.create_stream([UserMessage(content="Go!", source="user")])]
+
+    assert chunks[0] == "An "
+    assert client.total_usage().prompt_tokens == 3
+
+
+@pytest.mark.asyncio
+async def test_limiter_bounds_concurrent_requests():
+    tracker = {"running": 0, "peak": 0}
+
+    async def create(*args, **kwargs):
+        tracker["running"] += 1
+        tracker["peak"] = max(tracker["peak"], tracker["running"])
+        await asyncio.sleep(0.01)
+        tracker["running"] -= 1
+        return create_result()
+
+    shared = MagicMock()
+    shared.create = create
+    limiter = RequestLimiter(max_concurrency=2)
+    clients = [AgentModelClient(shared, f"agent_{index}", "gpt-4o-mini", limiter) for index in range(3)]
+
+    await asyncio.gather(*(client.create([]) for client in clients for _ in range(3)))
+
+    assert tracker["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_spaces_out_requests():
+    limiter = RequestLimiter(max_concurrency=10, requests_per_second=50)
+
+    async def request():
+        async with limiter.acquire() as waited:
+            return waited
+
+    waits = sorted(await asyncio.gather(*(request() for _ in range(4))))
+
+    assert waits[0] < 0.01
+    assert waits[-1] >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_closing_an_agent_client_keeps_the_shared_client_open():
+    shared = MagicMock()
+    shared.close = AsyncMock()
+
+    await AgentModelClient(shared, "evaluator_agent", "gpt-4o-mini", RequestLimiter()).close()
+
+    shared.close.assert_not_awaited()
@@ -1,3 +1,8 @@
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
 from langchain_core.messages import HumanMessage
 from langchain.agents import (
     create_agent as _create_react_agent,  # type: ignore[attr-defined]
@@ -5,6 +10,7 @@ from langchain.agents import (
 from langchain.tools import tool
 from bedrock_agentcore import BedrockAgentCoreApp
 from mcp_client.client import get_streamable_http_mcp_client
+from mcp_client.tool_cache import ToolCache
 from model.load import load_model
 
 from opentelemetry import trace
@@ -25,26 +31,89 @@ def add_numbers(a: int, b: int) -> int:
 # Import AgentCore Gateway as Streamable HTTP MCP Client
 mcp_client = get_streamable_http_mcp_client()
 
+# The MCP tool list is cached, and refreshed in the background once it's older than the TTL
+tool_cache = ToolCache(lambda: mcp_client.get_tools(), ttl=float(os.getenv("MCP_TOOLS_TTL_SECONDS", "300")))
+
+# The compiled agent graph for the current version of the tool set
+_graphs = {}
+
+@asynccontextmanager
+async def lifespan(app):
+    # load the MCP tools when the app starts, so the first invocation doesn't wait for them
+    try:
+        await get_graph()
+    except Exception:
+        logging.getLogger(__name__).warning("Failed to load the MCP tools at startup", exc_info=True)
+    yield
+
 # Integrate with Bedrock AgentCore
-app = BedrockAgentCoreApp()
+app = BedrockAgentCoreApp(lifespan=lifespan)
 
 # Instantiate model
 llm = load_model()
 
-@app.entrypoint
-async def invoke(payload):
-    # assume payload input is structured as { "prompt": "<user input>" }
-
-    with tracer.start_as_current_span("agentcore-example") as span:
-        # Load MCP Tools
-        tools = await mcp_client.get_tools()
+async def get_graph(span=None):
+    """
+    Return the agent graph, compiling it only when the MCP tool set has changed.
+    """
+    # Load MCP Tools
+    version, tools, cached = await tool_cache.get()
+    if span is not None:
+        span.set_attribute("mcp.tools.cache_hit", cached)
+        span.set_attribute("mcp.tools.version", version)
 
+    graph = _graphs.get(version)
+    if graph is None:
         # Define the agent
         graph = _create_react_agent(llm, tools=tools + [add_numbers]).with_config(
             {
                 "metadata": { "agent_name": "example-agent"}
             }
         )
+        _graphs.clear()
+        _graphs[version] = graph
+    return graph
+
+async def stream_invoke(payload):
+    """
+    Stream the agent's progress as it happens: the model's tokens, the tools it calls and
+    their results, and finally the agent's answer.
+    """
+    with tracer.start_as_current_span("agentcore-example") as span:
+        span.set_attribute("agentcore.streaming", True)
+        start = time.perf_counter()
+        graph = await get_graph(span)
+        prompt = payload.get("prompt", "What is Agentic AI?")
+        first_token = True
+
+        async for event in graph.astream_events({"messages": [HumanMessage(content=prompt)]}, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                text = event["data"]["chunk"].text
+                if not text:
+                    continue
+                if first_token:
+                    span.set_attribute("gen_ai.response.time_to_first_token", time.perf_counter() - start)
+                    first_token = False
+                yield {"type": "token", "content": text}
+            elif kind == "on_tool_start":
+                yield {"type": "tool_call", "name": event["name"], "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                output = event["data"].get("output")
+                yield {"type": "tool_result", "name": event["name"], "output": getattr(output, "content", output)}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # the end of the graph itself, rather than one of its nodes
+                yield {"type": "result", "result": event["data"]["output"]["messages"][-1].content}
+
+@app.entrypoint
+async def invoke(payload):
+    # assume payload input is structured as { "prompt": "<user input>" }
+    # add "stream": true to the payload to receive server-sent events as the agent runs
+    if payload.get("stream"):
+        return stream_invoke(payload)
+
+    with tracer.start_as_current_span("agentcore-example") as span:
+        graph = await get_graph(span)
 
         # Process the user prompt
         prompt = payload.get("prompt", "What is Agentic AI?")
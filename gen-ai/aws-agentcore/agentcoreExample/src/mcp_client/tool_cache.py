@@ -0,0 +1,75 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def tool_set_version(tools: List[Any]) -> str:
+    """
+    A digest of the names, descriptions and argument schemas of the tools, which only
+    changes when the MCP server's tool set changes.
+    """
+    description = [(tool.name, tool.description, getattr(tool, "args_schema", None)) for tool in tools]
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class ToolCache:
+    """
+    Caches the tool list of an MCP server.
+
+    Once the tools are older than `ttl` seconds, the cached tools are still returned, while
+    they are refreshed in the background.  Only when they are older than `max_age` seconds,
+    e.g. because the server couldn't be reached, do callers wait for them to be reloaded.
+    """
+
+    def __init__(self, load: Callable[[], Awaitable[List[Any]]], ttl: float = 300.0, max_age: Optional[float] = None) -> None:
+        self._load = load
+        self.ttl = ttl
+        self.max_age = max_age if max_age is not None else ttl * 4
+        self._tools: Optional[List[Any]] = None
+        self._version: Optional[str] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    async def get(self) -> Tuple[str, List[Any], bool]:
+        """Return the tool set version, the tools, and whether they came from the cache."""
+        age = time.monotonic() - self._loaded_at
+        if self._tools is not None and age < self.max_age:
+            if age >= self.ttl:
+                self._revalidate()
+            return self._version, self._tools, True
+
+        async with self._lock:
+            # another caller may have loaded the tools while this one was waiting
+            if self._tools is not None and time.monotonic() - self._loaded_at < self.max_age:
+                return self._version, self._tools, True
+            await self._refresh()
+            return self._version, self._tools, False
+
+    async def _refresh(self) -> None:
+        tools = await self._load()
+        self._tools, self._version = tools, tool_set_version(tools)
+        self._loaded_at = time.monotonic()
+
+    def _revalidate(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+
+        async def refresh():
+            async with self._lock:
+                try:
+                    await self._refresh()
+                except Exception:
+                    # keep serving the cached tools until they reach max_age
+                    logger.warning("Failed to refresh the MCP tools", exc_info=True)
+
+        self._refresh_task = asyncio.create_task(refresh())
@@ -1,6 +1,7 @@
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
 
 
 def test_add_numbers_tool(main_module):
@@ -27,6 +28,68 @@ async def test_invoke_returns_agent_response(main_module):
     assert result == {"result": "Agentic AI coordinates specialized agents."}
 
 
+@pytest.mark.asyncio
+async def test_graph_is_compiled_once_per_tool_set_version(main_module):
+    search = MagicMock(description="Searches the web", args_schema={"type": "object"})
+    search.name = "search"
+    main_module.mcp_client.get_tools = AsyncMock(return_value=[search])
+
+    with patch.object(main_module, "_create_react_agent") as mock_create:
+        mock_create.return_value.with_config.return_value.ainvoke = AsyncMock(
+            return_value={"messages": [MagicMock(content="42")]}
+        )
+        await main_module.invoke({"prompt": "What is 40 + 2?"})
+        await main_module.invoke({"prompt": "What is 41 + 1?"})
+        assert mock_create.call_count == 1
+        assert main_module.mcp_client.get_tools.await_count == 1
+
+        # a new tool set compiles a new graph
+        crawl = MagicMock(description="Crawls a site", args_schema={"type": "object"})
+        crawl.name = "crawl"
+        main_module.mcp_client.get_tools = AsyncMock(return_value=[search, crawl])
+        main_module.tool_cache.max_age = 0
+        await main_module.invoke({"prompt": "What is 39 + 3?"})
+
+    assert mock_create.call_count == 2
+    assert len(main_module._graphs) == 1
+
+
+@pytest.mark.asyncio
+async def test_streaming_invoke_yields_tokens_tool_calls_and_result(main_module):
+    async def astream_events(graph_input, version):
+        yield {"event": "on_chain_start", "name": "LangGraph", "data": {}, "parent_ids": []}
+        yield {"event": "on_chat_model_stream", "name": "ChatOpenAI", "data": {"chunk": AIMessageChunk(content="")}}
+        yield {"event": "on_tool_start", "name": "add_numbers", "data": {"input": {"a": 40, "b": 2}}}
+        yield {"event": "on_tool_end", "name": "add_numbers", "data": {"output": ToolMessage(content="42", tool_call_id="1")}}
+        yield {"event": "on_chat_model_stream", "name": "ChatOpenAI", "data": {"chunk": AIMessageChunk(content="The sum")}}
+        yield {"event": "on_chat_model_stream", "name": "ChatOpenAI", "data": {"chunk": AIMessageChunk(content=" is 42")}}
+        yield {"event": "on_chain_end", "name": "model", "data": {"output": {}}, "parent_ids": ["graph"]}
+        yield {"event": "on_chain_end", "name": "LangGraph", "parent_ids": [],
+               "data": {"output": {"messages": [AIMessage(content="The sum is 42")]}}}
+
+    mock_graph = MagicMock()
+    mock_graph.with_config.return_value.astream_events = astream_events
+
+    with (
+        patch.object(main_module, "_create_react_agent", return_value=mock_graph),
+        patch.object(main_module, "tracer") as mock_tracer,
+    ):
+        stream = await main_module.invoke({"prompt": "What is 40 + 2?", "stream": True})
+        events = [event async for event in stream]
+
+    assert events == [
+        {"type": "tool_call", "name": "add_numbers", "input": {"a": 40, "b": 2}},
+        {"type": "tool_result", "name": "add_numbers", "output": "42"},
+        {"type": "token", "content": "The sum"},
+        {"type": "token", "content": " is 42"},
+        {"type": "result", "result": "The sum is 42"},
+    ]
+    span = mock_tracer.start_as_current_span.return_value.__enter__.return_value
+    ttft = [call.args[1] for call in span.set_attribute.call_args_list
+            if call.args[0] == "gen_ai.response.time_to_first_token"]
+    assert len(ttft) == 1 and ttft[0] >= 0
+
+
 def test_dependencies_import():
     import bedrock_agentcore
     import langchain
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from mcp_client.tool_cache import ToolCache, tool_set_version
+
+
+def make_tool(name, description="A tool"):
+    return SimpleNamespace(name=name, description=description, args_schema={"type": "object"})
+
+
+def test_version_only_changes_with_the_tool_set():
+    assert tool_set_version([make_tool("search")]) == tool_set_version([make_tool("search")])
+    assert tool_set_version([make_tool("search")]) != tool_set_version([make_tool("search", "Searches")])
+
+
+@pytest.mark.asyncio
+async def test_tools_are_loaded_once_while_fresh():
+    load = AsyncMock(return_value=[make_tool("search")])
+    cache = ToolCache(load, ttl=60)
+
+    results = await asyncio.gather(*(cache.get() for _ in range(5)))
+
+    assert load.await_count == 1
+    assert [cached for _, _, cached in results].count(False) == 1
+    assert cache.version == results[0][0]
+
+
+@pytest.mark.asyncio
+async def test_stale_tools_are_served_while_refreshing_in_the_background():
+    load = AsyncMock(side_effect=[[make_tool("search")], [make_tool("search"), make_tool("crawl")]])
+    cache = ToolCache(load, ttl=10, max_age=100)
+    first_version, _, _ = await cache.get()
+
+    with patch("mcp_client.tool_cache.time.monotonic", return_value=cache._loaded_at + 20):
+        version, tools, cached = await cache.get()
+        assert (version, len(tools), cached) == (first_version, 1, True)
+        await cache._refresh_task
+
+    assert load.await_count == 2
+    version, tools, _ = await cache.get()
+    assert version != first_version and len(tools) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_the_cached_tools_until_max_age():
+    load = AsyncMock(side_effect=[[make_tool("search")], ConnectionError("unreachable"), ConnectionError("unreachable")])
+    cache = ToolCache(load, ttl=10, max_age=100)
+    await cache.get()
+    loaded_at = cache._loaded_at
+
+    with patch("mcp_client.tool_cache.time.monotonic", return_value=loaded_at + 20):
+        _, tools, cached = await cache.get()
+        await cache._refresh_task
+    assert cached and len(tools) == 1
+
+    with patch("mcp_client.tool_cache.time.monotonic", return_value=loaded_at + 200):
+        with pytest.raises(ConnectionError):
+            await cache.get()
@@ -0,0 +1,237 @@
+"""
+Sends many prompts to a Bedrock model at once, over one shared bedrock-runtime client,
+and reports the throughput, latency percentiles and token counts of the batch.
+
+    opentelemetry-instrument python3 batch.py --prompts prompts.jsonl --workers 8
+    opentelemetry-instrument python3 batch.py --count 50 --workers 8 --stream
+"""
+import argparse
+import contextvars
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from opentelemetry import trace
+
+from app import DEFAULT_PROMPT, MODEL_ID, build_native_request
+
+tracer = trace.get_tracer("aws-bedrock-example")
+
+
+@dataclass
+class InvocationResult:
+    prompt: str
+    text: str = ""
+    latency: float = 0.0
+    # time until the first chunk arrived, only set for streamed invocations
+    time_to_first_token: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    error: Optional[str] = None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+@dataclass
+class BatchReport:
+    results: List[InvocationResult]
+    duration: float
+    workers: int
+    stream: bool
+    succeeded: List[InvocationResult] = field(init=False)
+
+    def __post_init__(self):
+        self.succeeded = [result for result in self.results if result.error is None]
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - len(self.succeeded)
+
+    @property
+    def throughput(self) -> float:
+        return len(self.succeeded) / self.duration if self.duration else 0.0
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(result.input_tokens for result in self.succeeded)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(result.output_tokens for result in self.succeeded)
+
+    def summary(self) -> str:
+        latencies = [result.latency for result in self.succeeded]
+        lines = [
+            f"{len(self.succeeded)}/{len(self.results)} prompts succeeded in {self.duration:.2f}s "
+            f"with {self.workers} workers{' (streaming)' if self.stream else ''}",
+            f"throughput: {self.throughput:.2f} prompts/s, "
+            f"{self.output_tokens / self.duration if self.duration else 0.0:.1f} output tokens/s",
+            "latency: " + ", ".join(f"p{pct} {percentile(latencies, pct):.3f}s" for pct in (50, 90, 99)),
+        ]
+        if self.stream:
+            first_tokens = [result.time_to_first_token for result in self.succeeded
+                            if result.time_to_first_token is not None]
+            lines.append("time to first token: "
+                         + ", ".join(f"p{pct} {percentile(first_tokens, pct):.3f}s" for pct in (50, 90, 99)))
+        lines.append(f"tokens: {self.input_tokens} input, {self.output_tokens} output")
+        if self.failed:
+            lines.append(f"{self.failed} prompts failed, e.g. {next(r.error for r in self.results if r.error)}")
+        return "\n".join(lines)
+
+
+def create_client(max_pool_connections: int = 10, max_attempts: int = 5, region: Optional[str] = None):
+    """
+    Creates a bedrock-runtime client that can be shared by all the worker threads.
+
+    The connection pool is sized for the number of workers, so requests don't wait for a
+    connection or open new ones, and the adaptive retry mode backs off on throttling.
+    BEDROCK_ENDPOINT_URL points the client at another endpoint, such as bedrock_stub.py.
+    """
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={"mode": "adaptive", "max_attempts": max_attempts},
+    )
+    return boto3.client(
+        "bedrock-runtime",
+        region_name=region or os.getenv("AWS_REGION_NAME"),
+        endpoint_url=os.getenv("BEDROCK_ENDPOINT_URL") or None,
+        config=config,
+    )
+
+
+def load_prompts(path: str) -> List[str]:
+    """Reads one prompt per line, either a JSON object with a "prompt" key or a JSON string."""
+    prompts = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, dict):
+                record = record.get("prompt")
+            if not isinstance(record, str):
+                raise ValueError(f"{path}:{line_number} has no prompt")
+            prompts.append(record)
+    return prompts
+
+
+def invoke(client, model_id: str, prompt: str) -> InvocationResult:
+    start = time.perf_counter()
+    response = client.invoke_model(modelId=model_id, body=json.dumps(build_native_request(prompt)))
+    model_response = json.loads(response["body"].read())
+    return InvocationResult(
+        prompt=prompt,
+        text=model_response["generation"],
+        latency=time.perf_counter() - start,
+        input_tokens=model_response.get("prompt_token_count") or 0,
+        output_tokens=model_response.get("generation_token_count") or 0,
+    )
+
+
+def invoke_streaming(client, model_id: str, prompt: str) -> InvocationResult:
+    start = time.perf_counter()
+    response = client.invoke_model_with_response_stream(
+        modelId=model_id, body=json.dumps(build_native_request(prompt))
+    )
+    result = InvocationResult(prompt=prompt)
+    parts = []
+    for event in response["body"]:
+        chunk = event.get("chunk")
+        if chunk is None:
+            continue
+        if result.time_to_first_token is None:
+            result.time_to_first_token = time.perf_counter() - start
+        payload = json.loads(chunk["bytes"])
+        parts.append(payload.get("generation") or "")
+        result.input_tokens = payload.get("prompt_token_count") or result.input_tokens
+        result.output_tokens = payload.get("generation_token_count") or result.output_tokens
+        metrics = payload.get("amazon-bedrock-invocationMetrics")
+        if metrics:
+            result.input_tokens = metrics.get("inputTokenCount", result.input_tokens)
+            result.output_tokens = metrics.get("outputTokenCount", result.output_tokens)
+    result.text = "".join(parts)
+    result.latency = time.perf_counter() - start
+    return result
+
+
+def _invoke_prompt(client, model_id: str, prompt: str, index: int, stream: bool) -> InvocationResult:
+    with tracer.start_as_current_span("bedrock-prompt") as span:
+        span.set_attribute("bedrock.batch.index", index)
+        try:
+            result = (invoke_streaming if stream else invoke)(client, model_id, prompt)
+        except (ClientError, Exception) as error:
+            span.record_exception(error)
+            span.set_status(trace.Status(trace.StatusCode.ERROR, str(error)))
+            return InvocationResult(prompt=prompt, error=str(error))
+        span.set_attribute("gen_ai.usage.input_tokens", result.input_tokens)
+        span.set_attribute("gen_ai.usage.output_tokens", result.output_tokens)
+        if result.time_to_first_token is not None:
+            span.set_attribute("gen_ai.response.time_to_first_token", result.time_to_first_token)
+        return result
+
+
+def run_batch(
+    prompts: Iterable[str],
+    *,
+    client=None,
+    model_id: str = MODEL_ID,
+    workers: int = 8,
+    stream: bool = False,
+) -> BatchReport:
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    prompts = list(prompts)
+    client = client or create_client(max_pool_connections=workers)
+
+    with tracer.start_as_current_span("bedrock-batch") as span:
+        span.set_attribute("bedrock.batch.size", len(prompts))
+        span.set_attribute("bedrock.batch.workers", workers)
+        span.set_attribute("bedrock.batch.streaming", stream)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # each prompt runs in a copy of this context, so its span is a child of the batch span
+            futures = [
+                executor.submit(contextvars.copy_context().run, _invoke_prompt, client, model_id, prompt, index, stream)
+                for index, prompt in enumerate(prompts)
+            ]
+            results = [future.result() for future in futures]
+        report = BatchReport(results=results, duration=time.perf_counter() - start, workers=workers, stream=stream)
+        span.set_attribute("bedrock.batch.failed", report.failed)
+        span.set_attribute("gen_ai.usage.input_tokens", report.input_tokens)
+        span.set_attribute("gen_ai.usage.output_tokens", report.output_tokens)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Send a batch of prompts to a Bedrock model")
+    parser.add_argument("--prompts", help="JSONL file with one prompt per line (defaults to repeating the default prompt)")
+    parser.add_argument("--count", type=int, default=20, help="number of prompts to send without --prompts")
+    parser.add_argument("--workers", type=int, default=8, help="number of prompts in flight at once")
+    parser.add_argument("--stream", action="store_true", help="use invoke_model_with_response_stream")
+    parser.add_argument("--model-id", default=MODEL_ID)
+    parser.add_argument("--max-attempts", type=int, default=5, help="attempts per prompt, including retries")
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.prompts) if args.prompts else [DEFAULT_PROMPT] * args.count
+    client = create_client(max_pool_connections=args.workers, max_attempts=args.max_attempts)
+    report = run_batch(prompts, client=client, model_id=args.model_id, workers=args.workers, stream=args.stream)
+    print(report.summary())
+    if not report.succeeded:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
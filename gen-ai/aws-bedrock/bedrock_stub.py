@@ -0,0 +1,182 @@
+"""
+A local stand-in for the Amazon Bedrock runtime API, which answers InvokeModel and
+InvokeModelWithResponseStream requests for Meta Llama models with a canned generation.
+
+It's meant for exercising the batch mode without an AWS account:
+
+    python3 bedrock_stub.py --port 8088 --latency 0.2
+    export BEDROCK_ENDPOINT_URL=http://localhost:8088
+"""
+import argparse
+import base64
+import binascii
+import json
+import re
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+STUB_GENERATION = (
+    "A 'hello world' program is the simplest way to check that a language, "
+    "compiler and environment are set up correctly."
+)
+
+INVOKE_PATH = re.compile(r"^/model/(?P<model_id>[^/]+)/(?P<action>invoke|invoke-with-response-stream)$")
+
+
+@dataclass
+class StubConfig:
+    # seconds before the first token, and between streamed chunks
+    latency: float = 0.0
+    chunk_latency: float = 0.0
+    words_per_chunk: int = 4
+    # every nth request is throttled, to exercise client retries (0 disables throttling)
+    throttle_every: int = 0
+
+
+def count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+def encode_event(payload: dict, event_type: str = "chunk") -> bytes:
+    """Encode a message in the AWS event stream format used by the streaming APIs."""
+    headers = b""
+    for name, value in ((":event-type", event_type), (":content-type", "application/json"), (":message-type", "event")):
+        encoded_name, encoded_value = name.encode("utf-8"), value.encode("utf-8")
+        # header value type 7 is a string
+        headers += struct.pack(">B", len(encoded_name)) + encoded_name + struct.pack(">BH", 7, len(encoded_value)) + encoded_value
+    body = json.dumps(payload).encode("utf-8")
+    total_length = 12 + len(headers) + len(body) + 4
+    prelude = struct.pack(">II", total_length, len(headers))
+    prelude += struct.pack(">I", binascii.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + headers + body
+    return message + struct.pack(">I", binascii.crc32(message) & 0xFFFFFFFF)
+
+
+class BedrockStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        match = INVOKE_PATH.match(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if match is None:
+            self._send_json(404, {"message": f"Unknown operation {self.path}"})
+            return
+        model_id = unquote(match["model_id"])
+        if not model_id.startswith("meta.llama"):
+            self._send_json(400, {"message": f"The stub only serves Meta Llama models, not {model_id}"},
+                            {"x-amzn-ErrorType": "ValidationException"})
+            return
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            request_number = server.requests
+        if server.config.throttle_every and request_number % server.config.throttle_every == 0:
+            self._send_json(429, {"message": "Too many requests, please wait before trying again."},
+                            {"x-amzn-ErrorType": "ThrottlingException"})
+            return
+
+        prompt_tokens = count_tokens(body.get("prompt", ""))
+        words = STUB_GENERATION.split(" ")[: body.get("max_gen_len", 512)]
+        time.sleep(server.config.latency)
+
+        if match["action"] == "invoke":
+            generation = " ".join(words)
+            self._send_json(200, {
+                "generation": generation,
+                "prompt_token_count": prompt_tokens,
+                "generation_token_count": len(words),
+                "stop_reason": "stop",
+            }, {"X-Amzn-Bedrock-Input-Token-Count": str(prompt_tokens),
+                "X-Amzn-Bedrock-Output-Token-Count": str(len(words))})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("X-Amzn-Bedrock-Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        size = max(1, server.config.words_per_chunk)
+        chunks = [words[start:start + size] for start in range(0, len(words), size)]
+        for index, chunk in enumerate(chunks):
+            last = index == len(chunks) - 1
+            text = " ".join(chunk) + ("" if last else " ")
+            payload = {
+                "generation": text,
+                "prompt_token_count": prompt_tokens if index == 0 else None,
+                "generation_token_count": index * size + len(chunk),
+                "stop_reason": "stop" if last else None,
+            }
+            if last:
+                payload["amazon-bedrock-invocationMetrics"] = {
+                    "inputTokenCount": prompt_tokens,
+                    "outputTokenCount": len(words),
+                }
+            event = encode_event({"bytes": base64.b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")})
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+            if not last:
+                time.sleep(server.config.chunk_latency)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class BedrockStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: StubConfig):
+        super().__init__(address, BedrockStubHandler)
+        self.config = config
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_in_background(config: StubConfig = StubConfig(), host: str = "127.0.0.1", port: int = 0) -> BedrockStubServer:
+    server = BedrockStubServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local stub of the Amazon Bedrock runtime API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--chunk-latency", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--throttle-every", type=int, default=0, help="throttle every nth request")
+    args = parser.parse_args()
+
+    server = BedrockStubServer((args.host, args.port), StubConfig(
+        latency=args.latency, chunk_latency=args.chunk_latency, throttle_every=args.throttle_every,
+    ))
+    print(f"Bedrock stub listening on {server.endpoint_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from batch import BatchReport, InvocationResult, create_client, load_prompts, percentile, run_batch
+from bedrock_stub import STUB_GENERATION, StubConfig, start_in_background
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = start_in_background(StubConfig(latency=0.01, throttle_every=5))
+    monkeypatch.setenv("BEDROCK_ENDPOINT_URL", server.endpoint_url)
+    monkeypatch.setenv("AWS_REGION_NAME", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_run_batch_invokes_every_prompt_and_retries_throttling(stub, stream):
+    prompts = [f"prompt {index}" for index in range(12)]
+
+    report = run_batch(prompts, client=create_client(max_pool_connections=4), workers=4, stream=stream)
+
+    assert report.failed == 0
+    assert [result.prompt for result in report.results] == prompts
+    assert all(result.text == STUB_GENERATION for result in report.results)
+    # every fifth request was throttled and retried
+    assert stub.requests > len(prompts)
+    assert report.output_tokens == len(prompts) * len(STUB_GENERATION.split())
+    assert report.input_tokens > 0
+    assert all((result.time_to_first_token is not None) == stream for result in report.results)
+    assert "12/12 prompts succeeded" in report.summary()
+
+
+def test_run_batch_reports_failures(stub):
+    report = run_batch(["hello"], client=create_client(max_attempts=1), model_id="missing/model", workers=1)
+
+    assert report.failed == 1
+    assert report.results[0].error
+
+
+def test_load_prompts_accepts_objects_and_strings(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text(json.dumps({"prompt": "first"}) + "\n\n" + json.dumps("second") + "\n")
+
+    assert load_prompts(str(path)) == ["first", "second"]
+
+    path.write_text(json.dumps({"text": "no prompt"}) + "\n")
+    with pytest.raises(ValueError):
+        load_prompts(str(path))
+
+
+def test_report_percentiles_and_throughput():
+    results = [InvocationResult(prompt="p", latency=latency, output_tokens=10) for latency in (0.1, 0.2, 0.3, 0.4)]
+    report = BatchReport(results=results, duration=2.0, workers=2, stream=False)
+
+    assert percentile([0.1, 0.2, 0.3, 0.4], 50) == 0.2
+    assert percentile([], 99) == 0.0
+    assert report.throughput == 2.0
+    assert "p99 0.400s" in report.summary()
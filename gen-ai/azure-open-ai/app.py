@@ -1,19 +1,48 @@
+import argparse
+import asyncio
+import math
 import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Union
 
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI, OpenAIError
+from opentelemetry import trace
 from opentelemetry.instrumentation.openai_v2 import OpenAIInstrumentor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
 
 DEFAULT_DEPLOYMENT = "gpt-35-turbo"
 DEFAULT_API_VERSION = "2024-12-01-preview"
 
+PARIS_MESSAGES = [
+    {
+        "role": "system",
+        "content": "You are a helpful assistant.",
+    },
+    {
+        "role": "user",
+        "content": "I am going to Paris, what should I see?",
+    },
+]
+COMPLETION_SETTINGS = {
+    "max_tokens": 4096,
+    "temperature": 1.0,
+    "top_p": 1.0,
+}
+
 
 def create_client(
     *,
     endpoint: str,
     api_key: str,
     api_version: str = DEFAULT_API_VERSION,
-) -> AzureOpenAI:
-    return AzureOpenAI(
+    asynchronous: bool = False,
+) -> Union[AzureOpenAI, AsyncAzureOpenAI]:
+    client_class = AsyncAzureOpenAI if asynchronous else AzureOpenAI
+    return client_class(
         api_version=api_version,
         azure_endpoint=endpoint,
         api_key=api_key,
@@ -22,31 +51,263 @@ def create_client(
 
 def ask_about_paris(client: AzureOpenAI, *, deployment: str = DEFAULT_DEPLOYMENT) -> str:
     response = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a helpful assistant.",
-            },
-            {
-                "role": "user",
-                "content": "I am going to Paris, what should I see?",
-            },
-        ],
-        max_tokens=4096,
-        temperature=1.0,
-        top_p=1.0,
+        messages=PARIS_MESSAGES,
         model=deployment,
+        **COMPLETION_SETTINGS,
     )
     return response.choices[0].message.content
 
 
+@dataclass
+class CompletionResult:
+    content: str = ""
+    latency: float = 0.0
+    # only set for streamed completions
+    time_to_first_token: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    error: Optional[str] = None
+
+
+class _StreamCollector:
+    """Puts a streamed completion back together, and times its first token."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.result = CompletionResult()
+        self.parts = []
+
+    def add(self, chunk):
+        if chunk.usage is not None:
+            self.result.input_tokens = chunk.usage.prompt_tokens
+            self.result.output_tokens = chunk.usage.completion_tokens
+        for choice in chunk.choices:
+            if choice.delta and choice.delta.content:
+                if self.result.time_to_first_token is None:
+                    self.result.time_to_first_token = time.perf_counter() - self.start
+                self.parts.append(choice.delta.content)
+
+    def finish(self) -> CompletionResult:
+        self.result.content = "".join(self.parts)
+        self.result.latency = time.perf_counter() - self.start
+        return self.result
+
+
+def stream_about_paris(client: AzureOpenAI, *, deployment: str = DEFAULT_DEPLOYMENT) -> CompletionResult:
+    collector = _StreamCollector()
+    stream = client.chat.completions.create(
+        messages=PARIS_MESSAGES,
+        model=deployment,
+        stream=True,
+        stream_options={"include_usage": True},
+        **COMPLETION_SETTINGS,
+    )
+    for chunk in stream:
+        collector.add(chunk)
+    return collector.finish()
+
+
+async def ask_about_paris_async(
+    client: AsyncAzureOpenAI,
+    *,
+    deployment: str = DEFAULT_DEPLOYMENT,
+    stream: bool = False,
+) -> CompletionResult:
+    if stream:
+        collector = _StreamCollector()
+        response = await client.chat.completions.create(
+            messages=PARIS_MESSAGES,
+            model=deployment,
+            stream=True,
+            stream_options={"include_usage": True},
+            **COMPLETION_SETTINGS,
+        )
+        async for chunk in response:
+            collector.add(chunk)
+        return collector.finish()
+
+    start = time.perf_counter()
+    response = await client.chat.completions.create(
+        messages=PARIS_MESSAGES,
+        model=deployment,
+        **COMPLETION_SETTINGS,
+    )
+    return CompletionResult(
+        content=response.choices[0].message.content,
+        latency=time.perf_counter() - start,
+        input_tokens=response.usage.prompt_tokens if response.usage else 0,
+        output_tokens=response.usage.completion_tokens if response.usage else 0,
+    )
+
+
+class TimedSpanExporter(SpanExporter):
+    """
+    Wraps the span exporter of the tracing pipeline, and times its exports, to show
+    what exporting the spans of the instrumented requests costs.
+    """
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+        self.calls = 0
+        self.spans = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> SpanExportResult:
+        start = time.perf_counter()
+        try:
+            return self.exporter.export(spans)
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.spans += len(spans)
+                self.seconds += time.perf_counter() - start
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+
+def _otlp_span_exporter() -> SpanExporter:
+    protocol = os.getenv("OTEL_EXPORTER_OTLP_TRACES_PROTOCOL") or os.getenv("OTEL_EXPORTER_OTLP_PROTOCOL", "grpc")
+    if protocol.startswith("http"):
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    else:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter()
+
+
+def set_up_timed_tracing(exporter: Optional[SpanExporter] = None) -> TimedSpanExporter:
+    """
+    Builds the tracing pipeline with its OTLP exporter wrapped in a TimedSpanExporter,
+    for when the app isn't run through opentelemetry-instrument, which builds its own.
+    """
+    timed = TimedSpanExporter(exporter or _otlp_span_exporter())
+    provider = TracerProvider(resource=Resource.create())
+    provider.add_span_processor(BatchSpanProcessor(timed))
+    trace.set_tracer_provider(provider)
+    return timed
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+@dataclass
+class BatchReport:
+    results: List[CompletionResult]
+    duration: float
+    concurrency: int
+    stream: bool
+
+    @property
+    def succeeded(self) -> List[CompletionResult]:
+        return [result for result in self.results if result.error is None]
+
+    @property
+    def throughput(self) -> float:
+        return len(self.succeeded) / self.duration if self.duration else 0.0
+
+    def summary(self, export_timer: Optional[TimedSpanExporter] = None) -> str:
+        succeeded = self.succeeded
+        latencies = [result.latency for result in succeeded]
+        output_tokens = sum(result.output_tokens for result in succeeded)
+        lines = [
+            f"{len(succeeded)}/{len(self.results)} requests succeeded in {self.duration:.2f}s "
+            f"with {self.concurrency} at once{' (streaming)' if self.stream else ''}",
+            f"throughput: {self.throughput:.2f} requests/s, "
+            f"{output_tokens / self.duration if self.duration else 0.0:.1f} output tokens/s",
+            "latency: " + ", ".join(f"p{pct} {percentile(latencies, pct):.3f}s" for pct in (50, 90, 99)),
+        ]
+        if self.stream:
+            first_tokens = [result.time_to_first_token for result in succeeded
+                            if result.time_to_first_token is not None]
+            lines.append("time to first token: "
+                         + ", ".join(f"p{pct} {percentile(first_tokens, pct):.3f}s" for pct in (50, 90, 99)))
+        if export_timer is not None:
+            per_request = export_timer.seconds / len(self.results) * 1000 if self.results else 0.0
+            lines.append(f"span export: {export_timer.spans} spans in {export_timer.calls} exports, "
+                         f"{export_timer.seconds * 1000:.1f}ms in total, {per_request:.2f}ms per request")
+        failed = [result.error for result in self.results if result.error is not None]
+        if failed:
+            lines.append(f"{len(failed)} requests failed, e.g. {failed[0]}")
+        return "\n".join(lines)
+
+
+async def run_batch(
+    client: AsyncAzureOpenAI,
+    *,
+    requests: int,
+    concurrency: int = 8,
+    deployment: str = DEFAULT_DEPLOYMENT,
+    stream: bool = False,
+) -> BatchReport:
+    """Sends `requests` chat completions over one client, with at most `concurrency` in flight."""
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ask():
+        async with semaphore:
+            try:
+                return await ask_about_paris_async(client, deployment=deployment, stream=stream)
+            except OpenAIError as error:
+                return CompletionResult(error=str(error))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(ask() for _ in range(requests)))
+    return BatchReport(results=results, duration=time.perf_counter() - start, concurrency=concurrency, stream=stream)
+
+
+async def _main_batch(endpoint: str, api_key: str, args, export_timer: Optional[TimedSpanExporter]) -> None:
+    # one client, and so one connection pool, for every request in the batch
+    client = create_client(endpoint=endpoint, api_key=api_key, asynchronous=True)
+    try:
+        report = await run_batch(
+            client, requests=args.batch, concurrency=args.concurrency, deployment=args.deployment, stream=args.stream
+        )
+    finally:
+        await client.close()
+    # export whatever is still queued, so it's part of the export cost
+    force_flush = getattr(trace.get_tracer_provider(), "force_flush", None)
+    if force_flush is not None:
+        force_flush()
+    print(report.summary(export_timer))
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Ask Azure OpenAI about Paris")
+    parser.add_argument("--stream", action="store_true", help="stream the response and time the first token")
+    parser.add_argument("--batch", type=int, default=0, help="send this many requests at once on an async client")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once in batch mode")
+    parser.add_argument("--deployment", default=DEFAULT_DEPLOYMENT)
+    args = parser.parse_args()
+
+    export_timer = None
+    if args.batch and not isinstance(trace.get_tracer_provider(), TracerProvider):
+        export_timer = set_up_timed_tracing()
     OpenAIInstrumentor().instrument()
 
     endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
     subscription_key = os.getenv("AZURE_OPENAI_API_KEY")
+    if args.batch:
+        asyncio.run(_main_batch(endpoint, subscription_key, args, export_timer))
+        return
+
     client = create_client(endpoint=endpoint, api_key=subscription_key)
-    print(ask_about_paris(client, deployment=DEFAULT_DEPLOYMENT))
+    if args.stream:
+        result = stream_about_paris(client, deployment=args.deployment)
+        print(result.content)
+        if result.time_to_first_token is not None:
+            print(f"time to first token: {result.time_to_first_token:.3f}s, total: {result.latency:.3f}s")
+    else:
+        print(ask_about_paris(client, deployment=args.deployment))
 
 
 if __name__ == "__main__":
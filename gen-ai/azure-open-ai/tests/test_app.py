@@ -1,6 +1,20 @@
+import asyncio
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
-from app import ask_about_paris, create_client
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app import (
+    BatchReport,
+    TimedSpanExporter,
+    ask_about_paris,
+    create_client,
+    run_batch,
+    stream_about_paris,
+)
 
 
 def test_create_client_uses_azure_settings():
@@ -26,3 +40,91 @@ def test_ask_about_paris_returns_message_content():
 
     assert result == "Visit the Eiffel Tower."
     client.chat.completions.create.assert_called_once()
+
+
+def _chunk(content=None, usage=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+STREAM = [
+    _chunk("Visit "),
+    _chunk("the Louvre."),
+    _chunk(usage=SimpleNamespace(prompt_tokens=20, completion_tokens=5)),
+]
+
+
+def test_create_client_can_create_an_async_client():
+    with patch("app.AsyncAzureOpenAI") as mock_async_azure_openai:
+        create_client(endpoint="https://example.openai.azure.com", api_key="test-key", asynchronous=True)
+
+    mock_async_azure_openai.assert_called_once()
+
+
+def test_stream_about_paris_joins_the_chunks_and_times_the_first_token():
+    client = MagicMock()
+    client.chat.completions.create.return_value = iter(STREAM)
+
+    result = stream_about_paris(client)
+
+    assert result.content == "Visit the Louvre."
+    assert 0 <= result.time_to_first_token <= result.latency
+    assert (result.input_tokens, result.output_tokens) == (20, 5)
+    assert client.chat.completions.create.call_args.kwargs["stream"] is True
+
+
+class FakeAsyncStream:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_run_batch_limits_the_requests_in_flight(stream):
+    tracker = {"running": 0, "peak": 0}
+
+    async def create(**kwargs):
+        tracker["running"] += 1
+        tracker["peak"] = max(tracker["peak"], tracker["running"])
+        await asyncio.sleep(0.01)
+        tracker["running"] -= 1
+        if kwargs.get("stream"):
+            return FakeAsyncStream(STREAM)
+        message = SimpleNamespace(content="Visit the Louvre.")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message)],
+            usage=SimpleNamespace(prompt_tokens=20, completion_tokens=5),
+        )
+
+    client = MagicMock()
+    client.chat.completions.create = create
+
+    report = asyncio.run(run_batch(client, requests=10, concurrency=3, stream=stream))
+
+    assert tracker["peak"] == 3
+    assert len(report.succeeded) == 10
+    assert all(result.content == "Visit the Louvre." for result in report.results)
+    assert report.throughput > 0
+    assert "10/10 requests succeeded" in report.summary()
+
+
+def test_timed_span_exporter_times_the_exports():
+    provider = TracerProvider()
+    exporter = InMemorySpanExporter()
+    timer = TimedSpanExporter(exporter)
+    provider.add_span_processor(SimpleSpanProcessor(timer))
+
+    with provider.get_tracer("test").start_as_current_span("request"):
+        pass
+
+    assert (timer.calls, timer.spans) == (1, 1)
+    assert len(exporter.get_finished_spans()) == 1
+    assert "span export: 1 spans in 1 exports" in BatchReport([], 1.0, 1, False).summary(timer)
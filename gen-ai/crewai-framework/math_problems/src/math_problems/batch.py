@@ -0,0 +1,117 @@
+import asyncio
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from crewai import Crew
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+tracer = trace.get_tracer("crewai-example")
+
+ALL_GRADES = [str(grade) for grade in range(1, 13)]
+
+
+def build_inputs(grades: List[str] = ALL_GRADES, repetitions: int = 1) -> List[Dict[str, Any]]:
+    """
+    Build one set of crew inputs for every grade, repeated `repetitions` times.
+    """
+    return [{"grade": grade} for _ in range(repetitions) for grade in grades]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+@dataclass
+class BatchSummary:
+    """
+    Aggregated results of a batch of crew runs.
+    """
+    runs: int
+    failures: int
+    wall_time: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    task_latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+
+    def add_usage(self, usage):
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.total_tokens += usage.total_tokens
+
+    def report(self) -> str:
+        lines = [
+            f"Ran {self.runs - self.failures}/{self.runs} crews in {self.wall_time:.2f}s "
+            f"({self.failures} failed)",
+            f"Tokens: {self.total_tokens} total, {self.prompt_tokens} prompt, {self.completion_tokens} completion",
+        ]
+        for task_name, latencies in self.task_latencies.items():
+            lines.append(
+                f"{task_name:<24} p50={percentile(latencies, 50):.2f}s "
+                f"p90={percentile(latencies, 90):.2f}s p99={percentile(latencies, 99):.2f}s"
+            )
+        return "\n".join(lines)
+
+
+async def run_batch(
+    crew: Crew,
+    inputs: List[Dict[str, Any]],
+    max_concurrency: int = 4,
+    verbose: bool = False,
+) -> tuple[List[Optional[Any]], BatchSummary]:
+    """
+    Run the crew once for each set of inputs, with at most `max_concurrency` crews running at a time.
+
+    Like Crew.kickoff_for_each_async, every run uses its own copy of the crew, since agents
+    and tasks are mutated while they run.  The copies share the LLM configuration of the
+    template crew, so the YAML configs are parsed and the agents are built only once.
+    Each run is recorded in its own span.
+
+    The copies don't log to the console unless `verbose` is set, since CrewAI's console
+    logging is not safe to use from several crews running at the same time.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    summary = BatchSummary(runs=len(inputs), failures=0, wall_time=0.0)
+
+    async def run_one(index: int, input_data: Dict[str, Any]):
+        async with semaphore:
+            crew_copy = crew.copy()
+            crew_copy.verbose = verbose
+            for agent in crew_copy.agents:
+                agent.verbose = verbose
+            with tracer.start_as_current_span("math-problems-crew") as span:
+                span.set_attribute("crew.batch.index", index)
+                for key, value in input_data.items():
+                    span.set_attribute(f"crew.input.{key}", str(value))
+                try:
+                    # kickoff_async runs the crew on a worker thread, copying the current
+                    # context, so the crew's spans are parented to this one
+                    output = await crew_copy.kickoff_async(inputs=input_data)
+                except Exception as e:
+                    span.record_exception(e)
+                    span.set_status(Status(StatusCode.ERROR, str(e)))
+                    summary.failures += 1
+                    return None
+
+                if output.token_usage:
+                    summary.add_usage(output.token_usage)
+                    span.set_attribute("crew.tokens.total", output.token_usage.total_tokens)
+                for task in crew_copy.tasks:
+                    if task.execution_duration is not None:
+                        summary.task_latencies[task.name].append(task.execution_duration)
+                return output
+
+    start = time.perf_counter()
+    outputs = await asyncio.gather(*(run_one(index, input_data) for index, input_data in enumerate(inputs)))
+    summary.wall_time = time.perf_counter() - start
+    return list(outputs), summary
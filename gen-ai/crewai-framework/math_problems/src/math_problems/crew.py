@@ -1,11 +1,37 @@
+import copy
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import yaml
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
-from typing import List
+from typing import Dict, List, Optional
 # If you want to run a snippet of code before or after the crew starts,
 # you can use the @before_kickoff and @after_kickoff decorators
 # https://docs.crewai.com/concepts/crews#example-crew-class-with-decorators
 
+# sequential: each task runs after the previous one (the default)
+# parallel: several students answer the question at the same time, and all answers are graded together
+# hierarchical: a manager agent delegates the tasks to the other agents
+PROCESS_MODES = ("sequential", "parallel", "hierarchical")
+
+DEFAULT_ATTEMPTS = 3
+
+
+@lru_cache(maxsize=None)
+def _parse_yaml(config_path: str):
+    with open(config_path, "r", encoding="utf-8") as file:
+        return yaml.safe_load(file)
+
+
+def _load_yaml(config_path: Path):
+    # CrewBase mutates the configs it loads, so every instance gets its own copy
+    return copy.deepcopy(_parse_yaml(str(config_path)))
+
+
 @CrewBase
 class MathProblems():
     """MathProblems crew"""
@@ -13,32 +39,49 @@ class MathProblems():
     agents: List[BaseAgent]
     tasks: List[Task]
 
+    # Agents are built from their config once, as templates shared by every MathProblems
+    # instance.  Each instance gets copies of them, which reuse the template's LLM and
+    # tools, so crews running at the same time never share an agent
+    _agent_templates: Dict[str, Agent] = {}
+    _agent_templates_lock = threading.Lock()
+
+    def __init__(self, mode: Optional[str] = None, attempts: Optional[int] = None):
+        self.mode = mode or os.getenv("MATH_PROBLEMS_PROCESS", "sequential")
+        if self.mode not in PROCESS_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROCESS_MODES)}")
+        self.attempts = attempts or int(os.getenv("MATH_PROBLEMS_ATTEMPTS", DEFAULT_ATTEMPTS))
+        # Repeated MathProblems() instantiations reuse the parsed agents_config/tasks_config.
+        # CrewBase's wrapper loads them after this, through a load_yaml of its own, so the
+        # cached one is set on the instance
+        self.load_yaml = _load_yaml
+
     # Learn more about YAML configuration files here:
     # Agents: https://docs.crewai.com/concepts/agents#yaml-configuration-recommended
     # Tasks: https://docs.crewai.com/concepts/tasks#yaml-configuration-recommended
-    
+
     # If you would like to add tools to your agents, you can learn more about it here:
     # https://docs.crewai.com/concepts/agents#agent-tools
     @agent
     def teacher(self) -> Agent:
-        return Agent(
-            config=self.agents_config['teacher'], # type: ignore[index]
-            verbose=True
-        )
+        return self._cached_agent('teacher')
 
     @agent
     def student(self) -> Agent:
-        return Agent(
-            config=self.agents_config['student'], # type: ignore[index]
-            verbose=True
-        )
+        return self._cached_agent('student')
 
     @agent
     def teaching_assistant(self) -> Agent:
-        return Agent(
-            config=self.agents_config['teaching_assistant'], # type: ignore[index]
-            verbose=True
-        )
+        return self._cached_agent('teaching_assistant')
+
+    def _cached_agent(self, name: str) -> Agent:
+        with self._agent_templates_lock:
+            template = self._agent_templates.get(name)
+            if template is None:
+                template = self._agent_templates[name] = Agent(
+                    config=self.agents_config[name], # type: ignore[index]
+                    verbose=True,
+                )
+        return template.copy()
 
     # To learn more about structured task outputs,
     # task dependencies, and task callbacks, check out the documentation:
@@ -61,16 +104,57 @@ class MathProblems():
             config=self.tasks_config['grade_question_task'] # type: ignore[index]
         )
 
+    def answer_attempt_tasks(self) -> List[Task]:
+        """Tasks for several students answering the same question asynchronously"""
+        attempts = []
+        for attempt in range(1, self.attempts + 1):
+            # each attempt gets its own copy of the student, since an agent can't run
+            # two tasks at once, and console logging isn't safe from several threads
+            student = self.student().copy()
+            student.verbose = False
+            attempts.append(Task(
+                config=self.tasks_config['answer_question_task'], # type: ignore[index]
+                name=f"answer_question_task_{attempt}",
+                agent=student,
+                async_execution=True,
+                output_file=f"output/answer_{attempt}.md",
+            ))
+        return attempts
+
     @crew
     def crew(self) -> Crew:
         """Creates the MathProblems crew"""
         # To learn how to add knowledge sources to your crew, check out the documentation:
         # https://docs.crewai.com/concepts/knowledge#what-is-knowledge
 
+        if self.mode == "parallel":
+            question = self.create_question_task()
+            attempts = self.answer_attempt_tasks()
+            grading = Task(
+                config=self.tasks_config['grade_question_task'], # type: ignore[index]
+                name="grade_question_task",
+                context=[question, *attempts],
+            )
+            return Crew(
+                agents=self.agents, # Automatically created by the @agent decorator
+                tasks=[question, *attempts, grading],
+                process=Process.sequential,
+                verbose=True,
+            )
+
+        if self.mode == "hierarchical":
+            # https://docs.crewai.com/how-to/Hierarchical/
+            return Crew(
+                agents=self.agents, # Automatically created by the @agent decorator
+                tasks=self.tasks, # Automatically created by the @task decorator
+                process=Process.hierarchical,
+                manager_llm=self.agents_config['teacher']['llm'], # type: ignore[index]
+                verbose=True,
+            )
+
         return Crew(
             agents=self.agents, # Automatically created by the @agent decorator
             tasks=self.tasks, # Automatically created by the @task decorator
             process=Process.sequential,
             verbose=True,
-            # process=Process.hierarchical, # In case you wanna use that instead https://docs.crewai.com/how-to/Hierarchical/
         )
@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import asyncio
 import sys
 import warnings
 import openlit
@@ -6,6 +7,7 @@ from crewai.utilities import Logger
 
 from datetime import datetime
 
+from math_problems.batch import build_inputs, run_batch
 from math_problems.crew import MathProblems
 
 my_logger = Logger(verbose=True)
@@ -42,6 +44,28 @@ def run():
         raise Exception(f"An error occurred while running the crew: {e}")
 
 
+def batch():
+    """
+    Run the crew for every grade from 1 to 12, several times over, with bounded concurrency.
+    Usage: batch [repetitions] [max_concurrency]
+    """
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    max_concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    inputs = build_inputs(repetitions=repetitions)
+
+    my_logger.log(
+        "info",
+        f"About to kickoff {len(inputs)} crews, {max_concurrency} at a time...",
+        color="blue"
+    )
+    _, summary = asyncio.run(run_batch(MathProblems().crew(), inputs, max_concurrency=max_concurrency))
+    my_logger.log(
+        "info",
+        summary.report(),
+        color="blue"
+    )
+
+
 def train():
     """
     Train the crew for a given number of iterations.
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import threading
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, ClassVar, Dict, Hashable, Optional, Tuple
+
+from crewai.tools import BaseTool
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from pydantic import Field
+
+tracer = trace.get_tracer("crewai-example")
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries expire `ttl` seconds after they were stored.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size < 1:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# the result of a call that failed or was cancelled, so the callers waiting for it make their own
+_RETRY = object()
+
+
+class CachedTool(BaseTool):
+    """
+    Base class for tools that call slow external APIs.
+
+    Subclasses implement the async `_arun` method.  Results are cached by tool name and
+    arguments, so agents calling the tool with the same arguments from different tasks,
+    crews or agent copies only pay for the call once, and at most `max_concurrency`
+    calls of a tool run at the same time.  Every call gets its own span, a child of the
+    current one, which records the tool duration and whether the result came from the cache.
+
+    CrewAI calls tools synchronously from the thread running the crew, through `_run`.
+    Async code can await `arun` instead.
+    """
+
+    cache_ttl: float = Field(default=300.0, description="Seconds a cached result stays valid.")
+    cache_max_size: int = Field(default=128, description="Maximum number of cached results, 0 disables caching.")
+    max_concurrency: int = Field(default=4, description="Maximum number of calls of this tool running at once.")
+
+    # shared by every instance of a tool with the same name, since CrewAI builds new
+    # tool and agent instances for every crew
+    _caches: ClassVar[Dict[str, TTLCache]] = {}
+    _limits: ClassVar[Dict[str, threading.BoundedSemaphore]] = {}
+    _shared_lock: ClassVar[threading.Lock] = threading.Lock()
+    # the calls in progress, by tool name and cache key; calls with the same arguments
+    # wait for the one in progress instead of making their own
+    _in_flight: ClassVar[Dict[Tuple[str, str], Future]] = {}
+
+    @abstractmethod
+    async def _arun(self, **kwargs: Any) -> Any:
+        """Here goes the actual implementation of the tool."""
+
+    @property
+    def result_cache(self) -> TTLCache:
+        with self._shared_lock:
+            cache = self._caches.get(self.name)
+            if cache is None:
+                cache = self._caches[self.name] = TTLCache(self.cache_ttl, self.cache_max_size)
+            return cache
+
+    @property
+    def concurrency_limit(self) -> threading.BoundedSemaphore:
+        with self._shared_lock:
+            limit = self._limits.get(self.name)
+            if limit is None:
+                limit = self._limits[self.name] = threading.BoundedSemaphore(self.max_concurrency)
+            return limit
+
+    @staticmethod
+    def cache_key(kwargs: Dict[str, Any]) -> str:
+        return json.dumps(kwargs, sort_keys=True, default=str)
+
+    def _join_call(self, key: str) -> Tuple[Future, bool]:
+        """Returns the future of the call in progress with this key, and whether the caller has to make it."""
+        with self._shared_lock:
+            future = self._in_flight.get((self.name, key))
+            if future is not None:
+                return future, False
+            future = self._in_flight[(self.name, key)] = Future()
+            return future, True
+
+    def _finish_call(self, key: str, future: Future, result: Any = _RETRY):
+        """Hands the result to the callers waiting for it, or tells them to retry if the call failed."""
+        if result is not _RETRY:
+            self.result_cache.put(key, result)
+        with self._shared_lock:
+            del self._in_flight[(self.name, key)]
+        future.set_result(result)
+
+    def _run(self, **kwargs: Any) -> Any:
+        with tracer.start_as_current_span(f"tool {self.name}") as span:
+            start = time.perf_counter()
+            hit, result = self._call(kwargs)
+            self._record(span, hit, start)
+        return result
+
+    async def arun(self, **kwargs: Any) -> Any:
+        with tracer.start_as_current_span(f"tool {self.name}") as span:
+            start = time.perf_counter()
+            hit, result = await self._acall(kwargs)
+            self._record(span, hit, start)
+        return result
+
+    def _call(self, kwargs: Dict[str, Any]) -> Tuple[bool, Any]:
+        key = self.cache_key(kwargs)
+        while True:
+            hit, result = self.result_cache.get(key)
+            if hit:
+                return True, result
+            future, leader = self._join_call(key)
+            if not leader:
+                result = future.result()
+                if result is not _RETRY:
+                    return True, result
+                continue
+            try:
+                with self.concurrency_limit:
+                    result = _run_coroutine(self._arun(**kwargs))
+            except BaseException:
+                self._finish_call(key, future)
+                raise
+            self._finish_call(key, future, result)
+            return False, result
+
+    async def _acall(self, kwargs: Dict[str, Any]) -> Tuple[bool, Any]:
+        key = self.cache_key(kwargs)
+        while True:
+            hit, result = self.result_cache.get(key)
+            if hit:
+                return True, result
+            future, leader = self._join_call(key)
+            if not leader:
+                # shielded, so cancelling this caller doesn't cancel the call it waits for
+                result = await asyncio.shield(asyncio.wrap_future(future))
+                if result is not _RETRY:
+                    return True, result
+                continue
+            limit = self.concurrency_limit
+            try:
+                await _acquire_in_thread(limit)
+                try:
+                    result = await self._arun(**kwargs)
+                finally:
+                    limit.release()
+            except BaseException:
+                self._finish_call(key, future)
+                raise
+            self._finish_call(key, future, result)
+            return False, result
+
+    def _record(self, span: trace.Span, hit: bool, start: float):
+        span.set_attribute("crewai.tool.name", self.name)
+        span.set_attribute("crewai.tool.cache_hit", hit)
+        span.set_attribute("crewai.tool.duration", time.perf_counter() - start)
+
+    @classmethod
+    def clear_caches(cls, name: Optional[str] = None):
+        with cls._shared_lock:
+            for cache_name, cache in cls._caches.items():
+                if name is None or cache_name == name:
+                    cache.clear()
+
+
+async def _acquire_in_thread(lock):
+    """Acquires a threading lock or semaphore without blocking the event loop."""
+    acquiring = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        # the thread goes on to acquire the lock, so it's released as soon as it has
+        acquiring.add_done_callback(lambda done: done.cancelled() or done.exception() or lock.release())
+        raise
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _tool_loop() -> asyncio.AbstractEventLoop:
+    """
+    The event loop the tools' coroutines run on when they're called synchronously.  It runs
+    in a thread of its own for as long as the process does, so the async clients a tool
+    keeps between calls stay bound to a loop that is still running.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="cached-tool-loop", daemon=True).start()
+        return _loop
+
+
+async def _in_context(coroutine, parent: otel_context.Context):
+    # the loop's thread has a context of its own, so the caller's span is attached
+    # for the spans the tool starts
+    token = otel_context.attach(parent)
+    try:
+        return await coroutine
+    finally:
+        otel_context.detach(token)
+
+
+def _run_coroutine(coroutine):
+    loop = _tool_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coroutine.close()
+        raise RuntimeError("a tool can't be called synchronously from another tool's coroutine")
+    return asyncio.run_coroutine_threadsafe(_in_context(coroutine, otel_context.get_current()), loop).result()
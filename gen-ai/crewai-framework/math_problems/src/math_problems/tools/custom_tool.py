@@ -1,19 +1,24 @@
-from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
 
+from math_problems.tools.cached_tool import CachedTool
+
 
 class MyCustomToolInput(BaseModel):
     """Input schema for MyCustomTool."""
     argument: str = Field(..., description="Description of the argument.")
 
-class MyCustomTool(BaseTool):
+class MyCustomTool(CachedTool):
     name: str = "Name of my tool"
     description: str = (
         "Clear description for what this tool is useful for, your agent will need this information to use it."
     )
     args_schema: Type[BaseModel] = MyCustomToolInput
+    # tune these to the API the tool calls
+    cache_ttl: float = 300.0
+    cache_max_size: int = 128
+    max_concurrency: int = 4
 
-    def _run(self, argument: str) -> str:
-        # Implementation goes here
+    async def _arun(self, argument: str) -> str:
+        # Implementation goes here, e.g. await an httpx.AsyncClient request
         return "this is an example of a tool output, ignore it and move along."
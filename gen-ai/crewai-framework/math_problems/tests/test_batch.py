@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from math_problems.batch import build_inputs, percentile, run_batch
+
+
+class FakeCrew:
+    """Stands in for a copied Crew, recording how many copies run at once."""
+
+    def __init__(self, tracker, fail_grade=None):
+        self.tracker = tracker
+        self.fail_grade = fail_grade
+        self.verbose = True
+        self.agents = [SimpleNamespace(verbose=True)]
+        self.tasks = [
+            SimpleNamespace(name="create_question_task", execution_duration=1.0),
+            SimpleNamespace(name="grade_question_task", execution_duration=None),
+        ]
+
+    async def kickoff_async(self, inputs):
+        self.tracker["running"] += 1
+        self.tracker["peak"] = max(self.tracker["peak"], self.tracker["running"])
+        await asyncio.sleep(0.01)
+        self.tracker["running"] -= 1
+        if inputs["grade"] == self.fail_grade:
+            raise RuntimeError("model unavailable")
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        return SimpleNamespace(raw=f"grade {inputs['grade']}", token_usage=usage)
+
+
+def template_crew(fail_grade=None):
+    tracker = {"running": 0, "peak": 0}
+    copies = []
+
+    def copy():
+        copies.append(FakeCrew(tracker, fail_grade))
+        return copies[-1]
+
+    crew = MagicMock()
+    crew.copy.side_effect = copy
+    return crew, tracker, copies
+
+
+def test_build_inputs_covers_every_grade_for_each_repetition():
+    inputs = build_inputs(repetitions=2)
+
+    assert len(inputs) == 24
+    assert inputs[0] == {"grade": "1"}
+    assert inputs[12] == {"grade": "1"}
+    assert inputs[-1] == {"grade": "12"}
+
+
+@pytest.mark.asyncio
+async def test_run_batch_bounds_concurrency_and_sums_usage():
+    crew, tracker, copies = template_crew()
+
+    outputs, summary = await run_batch(crew, build_inputs(), max_concurrency=3)
+
+    assert [output.raw for output in outputs] == [f"grade {grade}" for grade in range(1, 13)]
+    assert tracker["peak"] == 3
+    assert crew.copy.call_count == 12
+    assert summary.total_tokens == 180
+    assert summary.task_latencies["create_question_task"] == [1.0] * 12
+    assert "grade_question_task" not in summary.task_latencies
+    assert not any(copy.verbose or copy.agents[0].verbose for copy in copies)
+
+
+@pytest.mark.asyncio
+async def test_run_batch_records_failures():
+    crew, _, _ = template_crew(fail_grade="3")
+
+    outputs, summary = await run_batch(crew, build_inputs(["2", "3"]), max_concurrency=2)
+
+    assert outputs[1] is None
+    assert summary.failures == 1
+    assert "Ran 1/2 crews" in summary.report()
+
+
+@pytest.mark.asyncio
+async def test_run_batch_rejects_zero_concurrency():
+    with pytest.raises(ValueError):
+        await run_batch(MagicMock(), build_inputs(), max_concurrency=0)
+
+
+def test_percentile_uses_nearest_rank():
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+    assert percentile([], 90) == 0.0
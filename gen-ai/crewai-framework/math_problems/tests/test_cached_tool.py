@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from pydantic import BaseModel
+
+from math_problems.tools.cached_tool import CachedTool, TTLCache
+from math_problems.tools.custom_tool import MyCustomTool
+
+
+class LookupInput(BaseModel):
+    term: str
+
+
+calls = []
+tracker = {"running": 0, "peak": 0}
+tracker_lock = threading.Lock()
+
+
+class SlowLookupTool(CachedTool):
+    """Records its calls and how many of them run at once."""
+    name: str = "slow_lookup"
+    description: str = "Looks up a term."
+    args_schema: type[BaseModel] = LookupInput
+    max_concurrency: int = 2
+
+    async def _arun(self, term: str) -> str:
+        with tracker_lock:
+            calls.append(term)
+            tracker["running"] += 1
+            tracker["peak"] = max(tracker["peak"], tracker["running"])
+        await asyncio.sleep(0.02)
+        with tracker_lock:
+            tracker["running"] -= 1
+        return f"definition of {term}"
+
+
+@pytest.fixture(autouse=True)
+def reset_tools():
+    CachedTool.clear_caches()
+    calls.clear()
+    tracker["peak"] = 0
+
+
+def test_same_arguments_are_only_looked_up_once_across_instances():
+    first, second = SlowLookupTool(), SlowLookupTool()
+
+    assert first.run(term="prime") == "definition of prime"
+    assert second.to_structured_tool().invoke(input={"term": "prime"}) == "definition of prime"
+    assert second.run(term="integer") == "definition of integer"
+
+    assert calls == ["prime", "integer"]
+
+
+def test_concurrent_calls_are_limited_per_tool_and_deduplicated():
+    tool = SlowLookupTool()
+    terms = [f"term {i % 4}" for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda term: tool.run(term=term), terms))
+
+    assert results == [f"definition of {term}" for term in terms]
+    assert tracker["peak"] == 2
+    assert sorted(calls) == [f"term {i}" for i in range(4)]
+
+
+@pytest.mark.asyncio
+async def test_arun_shares_the_cache_and_limit():
+    tool = SlowLookupTool()
+
+    results = await asyncio.gather(*(tool.arun(term=term) for term in ["a", "b", "c", "a"]))
+
+    assert results[0] == results[3] == "definition of a"
+    assert tracker["peak"] == 2
+    assert tool.run(term="b") == "definition of b"
+    assert sorted(calls) == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_run_works_from_a_running_event_loop():
+    assert SlowLookupTool().run(term="sum") == "definition of sum"
+
+
+client_loops = []
+
+
+class ClientTool(CachedTool):
+    """Keeps an async client, bound to the loop it was created on, between calls."""
+    name: str = "client_lookup"
+    description: str = "Looks up a term with a kept client."
+    args_schema: type[BaseModel] = LookupInput
+
+    async def _arun(self, term: str) -> str:
+        if not client_loops:
+            client_loops.append(asyncio.get_running_loop())
+        assert asyncio.get_running_loop() is client_loops[0] and not client_loops[0].is_closed()
+        return trace.get_current_span().get_span_context().span_id
+
+
+def test_sync_calls_share_one_running_loop_and_keep_the_trace_context():
+    tool = ClientTool()
+    provider = TracerProvider()
+
+    with patch("math_problems.tools.cached_tool.tracer", provider.get_tracer("test")):
+        first = tool.run(term="a")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(lambda: asyncio.run(_run_in_loop(tool))).result()
+
+    assert first != 0
+    assert len(client_loops) == 1
+
+
+async def _run_in_loop(tool):
+    return tool.run(term="b")
+
+
+def test_every_call_records_its_cache_hit_and_duration_on_its_own_span():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tool = SlowLookupTool()
+
+    with patch("math_problems.tools.cached_tool.tracer", provider.get_tracer("test")):
+        with provider.get_tracer("test").start_as_current_span("agent-step") as step:
+            tool.run(term="ratio")
+            tool.run(term="ratio")
+
+    calls = [span for span in exporter.get_finished_spans() if span.name == "tool slow_lookup"]
+    assert [span.attributes["crewai.tool.cache_hit"] for span in calls] == [False, True]
+    assert calls[0].attributes["crewai.tool.duration"] >= 0.02 > calls[1].attributes["crewai.tool.duration"]
+    assert all(span.parent.span_id == step.get_span_context().span_id for span in calls)
+    assert "crewai.tool.cache_hit" not in step.attributes
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(ttl=10, max_size=2)
+    with patch("math_problems.tools.cached_tool.time.monotonic", return_value=0):
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == (True, 1)
+        cache.put("c", 3)
+        assert cache.get("b") == (False, None)
+    with patch("math_problems.tools.cached_tool.time.monotonic", return_value=11):
+        assert cache.get("a") == (False, None)
+    assert len(cache) == 1
+
+
+def test_my_custom_tool_runs_through_the_base():
+    assert MyCustomTool().run(argument="x").startswith("this is an example")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_calls_release_the_limit_and_let_waiting_calls_retry():
+    tool = SlowLookupTool()
+    # the first call makes the lookup, the second waits for it, the others wait for the limit
+    tasks = [asyncio.ensure_future(tool.arun(term=term)) for term in ["a", "a", "b", "c", "d"]]
+    await asyncio.sleep(0.01)
+    for task in tasks[0], tasks[3], tasks[4]:
+        task.cancel()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert results[1] == "definition of a"
+    assert results[2] == "definition of b"
+    assert all(isinstance(result, asyncio.CancelledError) for result in (results[0], results[3], results[4]))
+    later = await asyncio.wait_for(asyncio.gather(*(tool.arun(term=term) for term in ["e", "f", "g"])), timeout=1)
+    assert later == ["definition of e", "definition of f", "definition of g"]
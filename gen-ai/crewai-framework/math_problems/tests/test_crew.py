@@ -1,6 +1,10 @@
 from pathlib import Path
 
+import pytest
 import yaml
+from crewai import Process
+
+from math_problems.crew import MathProblems, _parse_yaml
 
 
 def test_agent_config_defines_three_roles():
@@ -20,3 +24,48 @@ def test_task_config_defines_three_tasks():
         "answer_question_task",
         "grade_question_task",
     } == set(config.keys())
+
+
+def test_math_problems_reuses_parsed_configs_and_agents():
+    _parse_yaml.cache_clear()
+    first = MathProblems()
+    second = MathProblems()
+
+    assert _parse_yaml.cache_info().misses == 2
+    assert _parse_yaml.cache_info().hits == 2
+    assert first.agents_config is not second.agents_config
+    assert first.teacher() is not second.teacher()
+
+
+def test_agents_are_not_shared_between_instances():
+    student = MathProblems().student()
+    student.interpolate_inputs({"grade": "4"})
+    assert student.role.startswith("Grade 4")
+
+    assert MathProblems().student().role.strip() == "Grade {grade} Math Student"
+    assert MathProblems._agent_templates["student"].role.strip() == "Grade {grade} Math Student"
+
+
+def test_parallel_mode_answers_asynchronously_and_grades_together():
+    crew = MathProblems(mode="parallel", attempts=4).crew()
+
+    names = [task.name for task in crew.tasks]
+    assert names[0] == "create_question_task"
+    assert names[-1] == "grade_question_task"
+    attempts = crew.tasks[1:-1]
+    assert len(attempts) == 4
+    assert all(task.async_execution for task in attempts)
+    assert len({id(task.agent) for task in attempts}) == 4
+    assert crew.tasks[-1].context == [crew.tasks[0], *attempts]
+
+
+def test_hierarchical_mode_uses_a_manager_llm():
+    crew = MathProblems(mode="hierarchical").crew()
+
+    assert crew.process == Process.hierarchical
+    assert crew.manager_llm is not None
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        MathProblems(mode="round-robin")
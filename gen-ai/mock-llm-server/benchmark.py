@@ -0,0 +1,191 @@
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from server import LatencyDistribution, MockConfig, start_in_background
+
+GEN_AI_DIR = Path(__file__).resolve().parent.parent
+
+LANGGRAPH_SNIPPET = (
+    "import asyncio, app; "
+    "m = app.MathProblems(); "
+    "asyncio.run(m.setup()); "
+    "asyncio.run(m.run('Create a math question for a grade 8 student'))"
+)
+
+
+@dataclass
+class Example:
+    name: str
+    cwd: str
+    args: list[str]
+    launcher: list[str] = field(default_factory=lambda: ["uv", "run"])
+    env: dict[str, str] = field(default_factory=dict)
+
+    def command(self, instrumented: bool) -> list[str]:
+        prefix = ["opentelemetry-instrument"] if instrumented else []
+        return self.launcher + prefix + self.args
+
+
+EXAMPLES = {
+    example.name: example
+    for example in [
+        Example("openai-agents", "openai-agents/math_problems", ["python", "src/assignment_manager.py"]),
+        # the langgraph example sleeps after the run to wait for evaluations, so drive it directly
+        Example("langgraph", "langgraph/math_problems/src", ["python", "-c", LANGGRAPH_SNIPPET]),
+        Example("autogen", "autogen/src", ["python", "app.py"]),
+        Example("crewai", "crewai-framework/math_problems", ["python", "-c", "from math_problems.main import run; run()"]),
+        Example("azure-open-ai", "azure-open-ai", ["python", "app.py"], launcher=[]),
+        # requires a LiteLLM proxy on port 4000 whose api_base points at the mock server
+        Example("lite-llm-proxy", "lite-llm-proxy/app", ["python", "app.py"], launcher=[], env={"LITELLM_VIRTUAL_KEY": "mock-key"}),
+    ]
+}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+@dataclass
+class ModeResult:
+    example: str
+    mode: str
+    durations: list[float] = field(default_factory=list)
+    failures: int = 0
+    model_requests: int = 0
+    otlp_bytes: int = 0
+
+    @property
+    def mean(self) -> float:
+        return statistics.fmean(self.durations) if self.durations else 0.0
+
+    @property
+    def runs_per_min(self) -> float:
+        total = sum(self.durations)
+        return len(self.durations) / total * 60 if total else 0.0
+
+    def per_run(self, value: int) -> float:
+        runs = len(self.durations) + self.failures
+        return value / runs if runs else 0.0
+
+
+def example_env(example: Example, base_url: str, instrumented: bool) -> dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "mock-key",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "OPENAI_API_BASE": f"{base_url}/v1",
+        "OPENAI_AGENTS_DISABLE_TRACING": "1",
+        "AZURE_OPENAI_API_KEY": "mock-key",
+        "AZURE_OPENAI_ENDPOINT": base_url,
+        "OTEL_SERVICE_NAME": f"{example.name}-benchmark",
+        "OTEL_EXPORTER_OTLP_ENDPOINT": base_url,
+        "OTEL_EXPORTER_OTLP_PROTOCOL": "http/protobuf",
+        "OTEL_SDK_DISABLED": "false" if instrumented else "true",
+    })
+    env.update(example.env)
+    return env
+
+
+def fetch_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        return json.load(response)
+
+
+def reset_stats(base_url: str):
+    request = urllib.request.Request(f"{base_url}/stats/reset", data=b"", method="POST")
+    urllib.request.urlopen(request).close()
+
+
+def run_mode(example: Example, base_url: str, instrumented: bool, iterations: int, warmup: int, timeout: float) -> ModeResult:
+    result = ModeResult(example.name, "instrumented" if instrumented else "baseline")
+    command = example.command(instrumented)
+    env = example_env(example, base_url, instrumented)
+    cwd = GEN_AI_DIR / example.cwd
+
+    for iteration in range(warmup + iterations):
+        if iteration == warmup:
+            reset_stats(base_url)
+        started = time.perf_counter()
+        try:
+            completed = subprocess.run(command, cwd=cwd, env=env, capture_output=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            completed = None
+        elapsed = time.perf_counter() - started
+        if iteration < warmup:
+            continue
+        if completed is not None and completed.returncode == 0:
+            result.durations.append(elapsed)
+        else:
+            result.failures += 1
+            reason = "timed out" if completed is None else \
+                f"exited with {completed.returncode}: {completed.stderr.decode(errors='replace').strip()[-300:]}"
+            print(f"{example.name} ({result.mode}) {reason}")
+
+    stats = fetch_stats(base_url)
+    result.model_requests = stats["model_requests"]
+    result.otlp_bytes = sum(stats["otlp_bytes"].values())
+    return result
+
+
+def format_report(results: list[ModeResult]) -> str:
+    header = f"{'example':<16}{'mode':<14}{'runs':>6}{'failed':>8}{'mean s':>9}{'p50 s':>8}{'p95 s':>8}" \
+             f"{'runs/min':>10}{'llm calls':>11}{'otlp KiB':>10}{'overhead':>10}"
+    lines = [header, "-" * len(header)]
+    baselines = {r.example: r for r in results if r.mode == "baseline"}
+    for r in results:
+        overhead = ""
+        baseline = baselines.get(r.example)
+        if r.mode == "instrumented" and baseline and baseline.mean:
+            overhead = f"{(r.mean - baseline.mean) / baseline.mean * 100:+.1f}%"
+        lines.append(
+            f"{r.example:<16}{r.mode:<14}{len(r.durations):>6}{r.failures:>8}{r.mean:>9.2f}"
+            f"{percentile(r.durations, 50):>8.2f}{percentile(r.durations, 95):>8.2f}{r.runs_per_min:>10.1f}"
+            f"{r.per_run(r.model_requests):>11.1f}{r.per_run(r.otlp_bytes) / 1024:>10.1f}{overhead:>10}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the throughput and tracing overhead of the gen-ai examples against the mock LLM server")
+    parser.add_argument("--examples", default=",".join(EXAMPLES), help="comma-separated list of examples to run")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds before a single run is abandoned")
+    parser.add_argument("--latency", default="fixed:0", help="latency distribution of the mock server")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    unknown = set(args.examples.split(",")) - set(EXAMPLES)
+    if unknown:
+        parser.error(f"unknown example(s): {', '.join(sorted(unknown))}")
+
+    server = start_in_background(MockConfig(
+        latency=LatencyDistribution(args.latency),
+        tokens_per_second=args.tokens_per_second,
+    ))
+    try:
+        results = []
+        for name in args.examples.split(","):
+            for instrumented in (False, True):
+                print(f"Running {name} ({'instrumented' if instrumented else 'baseline'})...")
+                results.append(run_mode(EXAMPLES[name], server.base_url, instrumented, args.iterations, args.warmup, args.timeout))
+        print(format_report(results))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from server import LatencyDistribution, MockConfig, start_in_background
+
+# "none" sets up the same SDK pipeline without instrumenting anything, and is the baseline
+STRATEGIES = ("none", "openlit", "openai_v2", "langchain")
+
+WORKLOADS = ("openai", "langchain")
+
+MESSAGES = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "I am going to Paris, what should I see?"},
+]
+
+
+class CountingSpanExporter:
+    """ Encodes spans the way the OTLP exporter would and counts them, without sending anything """
+
+    def __init__(self):
+        from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+
+        self._encode = encode_spans
+        self.spans = 0
+        self.payload_bytes = 0
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        self.spans += len(spans)
+        self.payload_bytes += len(self._encode(spans).SerializeToString())
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def instrument(strategy: str):
+    """ Apply an instrumentation strategy the same way the examples do """
+    if strategy == "openlit":
+        import openlit
+
+        # openlit reuses the TracerProvider that is already registered
+        openlit.init(environment="test", disable_metrics=True)
+    elif strategy == "openai_v2":
+        from opentelemetry.instrumentation.openai_v2 import OpenAIInstrumentor
+
+        OpenAIInstrumentor().instrument()
+    elif strategy == "langchain":
+        from opentelemetry.instrumentation.langchain import LangChainInstrumentor
+
+        LangChainInstrumentor().instrument()
+
+
+def make_call(workload: str, base_url: str):
+    """ Return a function that makes one model call for the given workload """
+    if workload == "openai":
+        from openai import OpenAI
+
+        client = OpenAI(base_url=f"{base_url}/v1", api_key="mock-key")
+        return lambda: client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+    from langchain_openai import ChatOpenAI
+
+    llm = ChatOpenAI(model="gpt-4o-mini", base_url=f"{base_url}/v1", api_key="mock-key")
+    prompt = [(message["role"], message["content"]) for message in MESSAGES]
+    return lambda: llm.invoke(prompt)
+
+
+def run_worker(strategy: str, workload: str, base_url: str, calls: int, warmup: int) -> dict:
+    """ Runs in a child process, since instrumentors patch libraries globally """
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    exporter = CountingSpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    instrument(strategy)
+
+    call = make_call(workload, base_url)
+    for _ in range(warmup):
+        call()
+    provider.force_flush()
+    exporter.spans = exporter.payload_bytes = 0
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(calls):
+        call()
+    provider.force_flush()
+    cpu_time = time.process_time() - cpu_start
+    wall_time = time.perf_counter() - wall_start
+    spans, payload_bytes = exporter.spans, exporter.payload_bytes
+
+    # measured separately, as tracing allocations slows every call down
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(calls, 20)):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        call()
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    provider.shutdown()
+
+    return {
+        "strategy": strategy,
+        "calls": calls,
+        "cpu_seconds": cpu_time,
+        "wall_seconds": wall_time,
+        "peak_alloc_bytes": sum(peaks) / len(peaks) if peaks else 0,
+        "spans": spans,
+        "payload_bytes": payload_bytes,
+    }
+
+
+@dataclass
+class StrategyResult:
+    strategy: str
+    calls: int
+    cpu_seconds: float
+    wall_seconds: float
+    peak_alloc_bytes: float
+    spans: int
+    payload_bytes: int
+
+    def per_call(self, value: float) -> float:
+        return value / self.calls if self.calls else 0.0
+
+
+def format_report(results: Sequence[StrategyResult], workload: str) -> str:
+    baseline = next((r for r in results if r.strategy == "none"), None)
+    header = f"{'strategy':<12}{'calls':>7}{'cpu ms/call':>13}{'overhead ms':>13}{'alloc KiB/call':>16}" \
+             f"{'spans/call':>12}{'export B/call':>15}"
+    lines = [f"Workload: {workload}", header, "-" * len(header)]
+    for r in results:
+        cpu_ms = r.per_call(r.cpu_seconds) * 1000
+        overhead = "" if baseline is None or r is baseline else \
+            f"{cpu_ms - baseline.per_call(baseline.cpu_seconds) * 1000:+.3f}"
+        lines.append(
+            f"{r.strategy:<12}{r.calls:>7}{cpu_ms:>13.3f}{overhead:>13}{r.peak_alloc_bytes / 1024:>16.1f}"
+            f"{r.per_call(r.spans):>12.2f}{r.per_call(r.payload_bytes):>15.0f}"
+        )
+    return "\n".join(lines)
+
+
+def run_strategy(strategy: str, workload: str, base_url: str, calls: int, warmup: int) -> Optional[StrategyResult]:
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--worker", strategy,
+        "--workload", workload,
+        "--base-url", base_url,
+        "--calls", str(calls),
+        "--warmup", str(warmup),
+    ]
+    # keep environment driven auto-configuration from adding exporters of its own
+    env = dict(os.environ, OTEL_TRACES_EXPORTER="none", OTEL_METRICS_EXPORTER="none", OTEL_LOGS_EXPORTER="none")
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        print(f"{strategy} failed: {completed.stderr.strip()[-500:]}")
+        return None
+    return StrategyResult(**json.loads(completed.stdout.strip().splitlines()[-1]))
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare the overhead of the LLM instrumentors used by the gen-ai examples")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="comma-separated list of strategies to compare")
+    parser.add_argument("--workload", choices=WORKLOADS, default="langchain",
+                        help="langchain calls ChatOpenAI, which every instrumentor can see; openai calls the OpenAI client directly")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--worker", choices=STRATEGIES, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.workload, args.base_url, args.calls, args.warmup)))
+        return
+
+    strategies = args.strategies.split(",")
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(sorted(unknown))}")
+    if args.workload == "openai" and "langchain" in strategies:
+        print("Skipping langchain, which does not instrument direct OpenAI client calls")
+        strategies.remove("langchain")
+
+    server = start_in_background(MockConfig(latency=LatencyDistribution("fixed:0")))
+    try:
+        results = []
+        for strategy in strategies:
+            print(f"Running {strategy}...")
+            result = run_strategy(strategy, args.workload, server.base_url, args.calls, args.warmup)
+            if result is not None:
+                results.append(result)
+        print(format_report(results, args.workload))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+DEFAULT_TEXT = (
+    "Here is a mock response from the local model server. It stands in for a real "
+    "model so the examples can be exercised without network access or API keys. "
+    "The content is not meaningful, but its length and timing are representative."
+)
+
+# Values used when a structured output schema has a property with one of these names,
+# so the example schemas (MathQuestion, AssignmentResult, ...) get plausible content.
+FIELD_FIXTURES = {
+    "mathematics_branch": "algebra",
+    "rationale": "The question practises solving linear equations in one variable.",
+    "question": "Solve for x: 2x + 3 = 11",
+    "solution": "Subtract 3 from both sides to get 2x = 8, then divide by 2 so x = 4.",
+    "grade": "A-",
+}
+
+REACT_FINAL_ANSWER = "Final Answer:"
+
+OTLP_PATHS = {"/v1/traces": "traces", "/v1/metrics": "metrics", "/v1/logs": "logs"}
+
+AZURE_CHAT_PATH = re.compile(r"^/openai/deployments/[^/]+/chat/completions$")
+
+
+class LatencyDistribution:
+    """ Samples delays in seconds from a distribution given as `name:arg1,arg2`
+
+    Supported forms are `fixed:s`, `uniform:low,high`, `normal:mean,stddev`
+    and `lognormal:mu,sigma`. """
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, args = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown latency distribution '{kind}'")
+        try:
+            params = [float(arg) for arg in args.split(",")] if args else []
+        except ValueError:
+            raise ValueError(f"invalid latency parameters in '{spec}'") from None
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"'{kind}' latency takes {self.KINDS[kind]} parameter(s)")
+        self.spec = spec
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        else:
+            value = rng.lognormvariate(*self.params)
+        return max(0.0, value)
+
+
+@dataclass
+class MockConfig:
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    tokens_per_second: float = 0.0
+    completion_tokens: int = 0
+    error_rate: float = 0.0
+    error_statuses: tuple[int, ...] = (500,)
+    seed: Optional[int] = None
+
+
+@dataclass
+class ServerStats:
+    model_requests: int = 0
+    streamed_requests: int = 0
+    injected_errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    otlp_requests: dict[str, int] = field(default_factory=lambda: {signal: 0 for signal in OTLP_PATHS.values()})
+    otlp_bytes: dict[str, int] = field(default_factory=lambda: {signal: 0 for signal in OTLP_PATHS.values()})
+
+    def as_dict(self) -> dict:
+        return {
+            "model_requests": self.model_requests,
+            "streamed_requests": self.streamed_requests,
+            "injected_errors": self.injected_errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "otlp_requests": dict(self.otlp_requests),
+            "otlp_bytes": dict(self.otlp_bytes),
+        }
+
+
+def count_tokens(text: str) -> int:
+    """ A rough token count; whitespace separated words are close enough for load testing """
+    return len(text.split())
+
+
+def value_from_schema(schema: dict, defs: Optional[dict] = None, name: str = "value") -> Any:
+    """ Build a value that conforms to a JSON schema, using FIELD_FIXTURES where possible """
+    defs = defs if defs is not None else schema.get("$defs", schema.get("definitions", {}))
+    if "$ref" in schema:
+        return value_from_schema(defs[schema["$ref"].rsplit("/", 1)[-1]], defs, name)
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    for combinator in ("anyOf", "oneOf", "allOf"):
+        if combinator in schema:
+            options = [option for option in schema[combinator] if option.get("type") != "null"]
+            return value_from_schema((options or schema[combinator])[0], defs, name)
+
+    schema_type = schema.get("type", "object")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+    if schema_type == "object":
+        return {
+            prop: value_from_schema(prop_schema, defs, prop)
+            for prop, prop_schema in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        return [value_from_schema(schema.get("items", {}), defs, name)]
+    if schema_type == "integer":
+        return 1
+    if schema_type == "number":
+        return 1.0
+    if schema_type == "boolean":
+        return True
+    if schema_type == "null":
+        return None
+    return FIELD_FIXTURES.get(name, f"Mock {name.replace('_', ' ')}")
+
+
+class MockModel:
+    """ Produces completions and tracks statistics, independent of the HTTP transport """
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.stats = ServerStats()
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = ServerStats()
+
+    def sample_latency(self) -> float:
+        with self._lock:
+            return self.config.latency.sample(self._rng)
+
+    def injected_error(self) -> Optional[int]:
+        with self._lock:
+            if self.config.error_rate and self._rng.random() < self.config.error_rate:
+                self.stats.injected_errors += 1
+                return self._rng.choice(self.config.error_statuses)
+        return None
+
+    def content_for(self, schema: Optional[dict], prompt: str = "") -> str:
+        if schema is not None:
+            return json.dumps(value_from_schema(schema))
+        if not self.config.completion_tokens:
+            text = DEFAULT_TEXT
+        else:
+            words = DEFAULT_TEXT.split()
+            text = " ".join(words[i % len(words)] for i in range(self.config.completion_tokens))
+        if REACT_FINAL_ANSWER in prompt:
+            # ReAct style agents such as CrewAI only accept answers in this format
+            return f"Thought: I now can give a great answer\n{REACT_FINAL_ANSWER} {text}"
+        return text
+
+    def record(self, prompt: str, completion: str, streamed: bool = False) -> dict:
+        usage = {
+            "prompt_tokens": count_tokens(prompt),
+            "completion_tokens": count_tokens(completion),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self._lock:
+            self.stats.model_requests += 1
+            self.stats.streamed_requests += int(streamed)
+            self.stats.prompt_tokens += usage["prompt_tokens"]
+            self.stats.completion_tokens += usage["completion_tokens"]
+        return usage
+
+    def record_otlp(self, signal: str, size: int):
+        with self._lock:
+            self.stats.otlp_requests[signal] += 1
+            self.stats.otlp_bytes[signal] += size
+
+
+def _message_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def chat_schema(body: dict) -> Optional[dict]:
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return response_format.get("json_schema", {}).get("schema", {})
+    if response_format.get("type") == "json_object":
+        return {"type": "object", "properties": {"response": {"type": "string"}}}
+    return None
+
+
+def responses_schema(body: dict) -> Optional[dict]:
+    text_format = (body.get("text") or {}).get("format") or {}
+    if text_format.get("type") == "json_schema":
+        return text_format.get("schema", {})
+    return None
+
+
+def responses_prompt(body: dict) -> str:
+    parts = [body.get("instructions") or ""]
+    items = body.get("input", "")
+    if isinstance(items, str):
+        parts.append(items)
+    else:
+        parts.extend(_message_text(item.get("content")) for item in items if isinstance(item, dict))
+    return " ".join(parts)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    server_version = "MockLLM/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def model(self) -> MockModel:
+        return self.server.model
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/v1/models":
+            self._send_json({"object": "list", "data": [{"id": DEFAULT_MODEL, "object": "model", "owned_by": "mock"}]})
+        elif path == "/stats":
+            self._send_json(self.model.stats.as_dict())
+        elif path == "/health":
+            self._send_json({"status": "ok"})
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"no route for {path}")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        if path in OTLP_PATHS:
+            # accept OTLP/HTTP exports so the examples can run without a collector
+            self.model.record_otlp(OTLP_PATHS[path], len(raw))
+            self._send_bytes(b"", HTTPStatus.OK, self.headers.get("Content-Type", "application/x-protobuf"))
+            return
+        if path == "/stats/reset":
+            self.model.reset_stats()
+            self._send_json({"status": "reset"})
+            return
+
+        try:
+            body = json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(HTTPStatus.BAD_REQUEST, "request body is not valid JSON")
+            return
+
+        if path in ("/v1/chat/completions", "/chat/completions") or AZURE_CHAT_PATH.match(path):
+            handler = self._chat_completions
+        elif path in ("/v1/responses", "/responses"):
+            handler = self._responses
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"no route for {path}")
+            return
+
+        time.sleep(self.model.sample_latency())
+        status = self.model.injected_error()
+        if status is not None:
+            self._send_error(HTTPStatus(status), "injected error from mock LLM server")
+            return
+        handler(body)
+
+    def _chat_completions(self, body: dict):
+        prompt = " ".join(_message_text(message.get("content")) for message in body.get("messages", []))
+        content = self.model.content_for(chat_schema(body), prompt)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model") or DEFAULT_MODEL
+
+        if body.get("stream"):
+            self._stream_chat(completion_id, model, prompt, content, body.get("stream_options") or {})
+            return
+
+        usage = self.model.record(prompt, content)
+        self._send_json({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": usage,
+        })
+
+    def _stream_chat(self, completion_id: str, model: str, prompt: str, content: str, stream_options: dict):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None, usage: Optional[dict] = None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage:
+                payload["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        delay = 1 / self.model.config.tokens_per_second if self.model.config.tokens_per_second else 0
+        chunk({"role": "assistant", "content": ""})
+        for token in re.findall(r"\S+\s*", content):
+            if delay:
+                time.sleep(delay)
+            chunk({"content": token})
+        chunk({}, finish_reason="stop")
+
+        usage = self.model.record(prompt, content, streamed=True)
+        if stream_options.get("include_usage"):
+            chunk({}, usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _responses(self, body: dict):
+        if body.get("stream"):
+            self._send_error(HTTPStatus.BAD_REQUEST, "streaming is only supported on /v1/chat/completions")
+            return
+        prompt = responses_prompt(body)
+        content = self.model.content_for(responses_schema(body), prompt)
+        usage = self.model.record(prompt, content)
+        self._send_json({
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model") or DEFAULT_MODEL,
+            "output": [{
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": content, "annotations": []}],
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": body.get("tool_choice", "auto"),
+            "tools": [],
+            "usage": {
+                "input_tokens": usage["prompt_tokens"],
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": usage["completion_tokens"],
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": usage["total_tokens"],
+            },
+        })
+
+    def _send_json(self, payload: dict, status: HTTPStatus = HTTPStatus.OK):
+        self._send_bytes(json.dumps(payload).encode("utf-8"), status, "application/json")
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        payload = {"error": {"message": message, "type": "mock_error", "param": None, "code": status.value}}
+        self._send_json(payload, status)
+
+    def _send_bytes(self, data: bytes, status: HTTPStatus, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if status == HTTPStatus.TOO_MANY_REQUESTS:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: MockConfig, verbose: bool = False):
+        super().__init__(address, MockLLMHandler)
+        self.model = MockModel(config)
+        self.verbose = verbose
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_in_background(config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0) -> MockLLMServer:
+    """ Start a server on a daemon thread and return it; call `shutdown()` to stop it """
+    server = MockLLMServer((host, port), config or MockConfig())
+    threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True).start()
+    return server
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock model server for offline load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="fixed:0", help="e.g. fixed:0.2, uniform:0.1,0.5, normal:0.4,0.1, lognormal:-1,0.5")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="streaming rate, 0 streams as fast as possible")
+    parser.add_argument("--completion-tokens", type=int, default=0, help="length of plain text completions, 0 uses a short default")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of model requests that fail")
+    parser.add_argument("--error-statuses", default="500", help="comma-separated HTTP statuses used for injected errors")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = MockConfig(
+        latency=LatencyDistribution(args.latency),
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(status) for status in args.error_statuses.split(",")),
+        seed=args.seed,
+    )
+    server = MockLLMServer((args.host, args.port), config, verbose=args.verbose)
+    print(f"Mock LLM server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+from benchmark import EXAMPLES, Example, ModeResult, example_env, format_report
+
+
+def test_instrumented_command_wraps_with_opentelemetry_instrument():
+    example = Example("demo", "demo", ["python", "app.py"])
+
+    assert example.command(instrumented=False) == ["uv", "run", "python", "app.py"]
+    assert example.command(instrumented=True) == ["uv", "run", "opentelemetry-instrument", "python", "app.py"]
+
+
+def test_example_env_points_clients_and_exporter_at_mock_server():
+    env = example_env(EXAMPLES["azure-open-ai"], "http://127.0.0.1:9000", instrumented=False)
+
+    assert env["OPENAI_BASE_URL"] == "http://127.0.0.1:9000/v1"
+    assert env["AZURE_OPENAI_ENDPOINT"] == "http://127.0.0.1:9000"
+    assert env["OTEL_EXPORTER_OTLP_ENDPOINT"] == "http://127.0.0.1:9000"
+    assert env["OTEL_SDK_DISABLED"] == "true"
+
+
+def test_report_includes_overhead_against_baseline():
+    results = [
+        ModeResult("demo", "baseline", durations=[1.0, 1.0], model_requests=6),
+        ModeResult("demo", "instrumented", durations=[1.2, 1.2], model_requests=6, otlp_bytes=4096),
+    ]
+
+    report = format_report(results)
+
+    assert "+20.0%" in report
+    assert report.splitlines()[-1].split()[-2] == "2.0"
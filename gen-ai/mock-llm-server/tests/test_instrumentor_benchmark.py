@@ -0,0 +1,28 @@
+from instrumentor_benchmark import StrategyResult, format_report
+
+
+def result(strategy, cpu_seconds, spans=0, payload_bytes=0):
+    return StrategyResult(
+        strategy=strategy,
+        calls=100,
+        cpu_seconds=cpu_seconds,
+        wall_seconds=cpu_seconds * 2,
+        peak_alloc_bytes=2048,
+        spans=spans,
+        payload_bytes=payload_bytes,
+    )
+
+
+def test_report_shows_cpu_overhead_per_call_against_baseline():
+    report = format_report([result("none", 0.4), result("openlit", 0.6, spans=200, payload_bytes=90000)], "openai")
+
+    none_row, openlit_row = report.splitlines()[-2:]
+    assert none_row.split()[:3] == ["none", "100", "4.000"]
+    assert openlit_row.split() == ["openlit", "100", "6.000", "+2.000", "2.0", "2.00", "900"]
+
+
+def test_report_without_baseline_leaves_overhead_blank():
+    report = format_report([result("openai_v2", 0.5, spans=100, payload_bytes=45000)], "langchain")
+
+    assert report.splitlines()[0] == "Workload: langchain"
+    assert report.splitlines()[-1].split() == ["openai_v2", "100", "5.000", "2.0", "1.00", "450"]
@@ -0,0 +1,146 @@
+import json
+import random
+import urllib.error
+import urllib.request
+
+import pytest
+
+from server import LatencyDistribution, MockConfig, start_in_background, value_from_schema
+
+MATH_QUESTION_SCHEMA = {
+    "title": "MathQuestion",
+    "type": "object",
+    "properties": {
+        "mathematics_branch": {"type": "string", "description": "Which branch of mathematics the question is part of."},
+        "rationale": {"type": "string"},
+        "question": {"type": "string"},
+    },
+    "required": ["mathematics_branch", "rationale", "question"],
+}
+
+
+@pytest.fixture
+def server():
+    server = start_in_background(MockConfig(seed=1))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, payload, raw=False):
+    data = payload if raw else json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def test_latency_distributions():
+    rng = random.Random(1)
+
+    assert LatencyDistribution("fixed:0.25").sample(rng) == 0.25
+    assert 0.1 <= LatencyDistribution("uniform:0.1,0.2").sample(rng) <= 0.2
+    assert LatencyDistribution("normal:-5,0.1").sample(rng) == 0.0
+    assert LatencyDistribution("lognormal:0,0.5").sample(rng) > 0
+    with pytest.raises(ValueError):
+        LatencyDistribution("gamma:1,2")
+    with pytest.raises(ValueError):
+        LatencyDistribution("uniform:0.1")
+
+
+def test_value_from_schema_uses_fixtures_and_refs():
+    schema = {
+        "type": "object",
+        "properties": {
+            "result": {"$ref": "#/$defs/AssignmentResult"},
+            "attempts": {"type": "integer"},
+            "notes": {"anyOf": [{"type": "null"}, {"type": "array", "items": {"type": "string"}}]},
+        },
+        "$defs": {
+            "AssignmentResult": {
+                "type": "object",
+                "properties": {"grade": {"type": "string"}, "rationale": {"type": "string"}},
+            }
+        },
+    }
+
+    value = value_from_schema(schema)
+
+    assert value["result"]["grade"] == "A-"
+    assert value["attempts"] == 1
+    assert value["notes"] == ["Mock notes"]
+
+
+def test_chat_completion_with_structured_output(server):
+    body = post(f"{server.base_url}/v1/chat/completions", {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": "Create a math question"}],
+        "response_format": {"type": "json_schema", "json_schema": {"name": "MathQuestion", "schema": MATH_QUESTION_SCHEMA}},
+    })
+
+    response = json.loads(body)
+    question = json.loads(response["choices"][0]["message"]["content"])
+    assert set(question) == {"mathematics_branch", "rationale", "question"}
+    assert response["usage"]["prompt_tokens"] == 4
+
+
+def test_streamed_chat_completion_reports_usage(server):
+    body = post(f"{server.base_url}/openai/deployments/gpt-35-turbo/chat/completions?api-version=2024-12-01-preview", {
+        "messages": [{"role": "user", "content": "Hello"}],
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }).decode("utf-8")
+
+    events = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    text = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks if chunk["choices"])
+    assert text.startswith("Here is a mock response")
+    assert chunks[-1]["usage"]["completion_tokens"] == len(text.split())
+
+
+def test_responses_api_with_structured_output(server):
+    body = post(f"{server.base_url}/v1/responses", {
+        "model": "gpt-4o-mini",
+        "instructions": "You are a teacher",
+        "input": [{"role": "user", "content": "Create a math question"}],
+        "text": {"format": {"type": "json_schema", "name": "MathQuestion", "schema": MATH_QUESTION_SCHEMA}},
+    })
+
+    response = json.loads(body)
+    text = response["output"][0]["content"][0]["text"]
+    assert json.loads(text)["question"] == "Solve for x: 2x + 3 = 11"
+    assert response["usage"]["input_tokens"] == 8
+
+
+def test_error_injection():
+    server = start_in_background(MockConfig(error_rate=1.0, error_statuses=(429,)))
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(f"{server.base_url}/v1/chat/completions", {"messages": []})
+        assert error.value.code == 429
+        assert server.model.stats.injected_errors == 1
+        assert server.model.stats.model_requests == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_otlp_sink_counts_export_bytes(server):
+    post(f"{server.base_url}/v1/traces", b"\x0a\x00\x0a\x00", raw=True)
+
+    with urllib.request.urlopen(f"{server.base_url}/stats") as response:
+        stats = json.load(response)
+    assert stats["otlp_requests"]["traces"] == 1
+    assert stats["otlp_bytes"]["traces"] == 4
+
+    post(f"{server.base_url}/stats/reset", b"", raw=True)
+    assert server.model.stats.otlp_bytes["traces"] == 0
+
+
+def test_react_prompts_get_a_final_answer(server):
+    body = post(f"{server.base_url}/v1/chat/completions", {
+        "messages": [{"role": "system", "content": "When you are done, respond with\\nFinal Answer: your answer"}],
+    })
+
+    content = json.loads(body)["choices"][0]["message"]["content"]
+    assert content.startswith("Thought: I now can give a great answer\nFinal Answer: Here is a mock response")
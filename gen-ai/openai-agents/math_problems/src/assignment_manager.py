@@ -2,6 +2,9 @@ from agents import Runner
 from student_agent import student_agent
 from teacher_agent import teacher_agent, MathQuestion
 from teaching_assistant_agent import teaching_assistant_agent, AssignmentResult
+from stage_cache import StageCache
+from typing import Optional
+import argparse
 import asyncio
 from opentelemetry import trace
 import openlit
@@ -9,8 +12,22 @@ import openlit
 tracer = trace.get_tracer("openai-agents")
 openlit.init(environment="test")
 
+STAGES = ("question", "solution", "grading")
+
 class AssignmentManager:
 
+    def __init__(self, cache: Optional[StageCache] = None, replay_from: Optional[str] = None):
+        """ Stage outputs are read from and written to `cache` when one is given.
+        With `replay_from`, that stage and the ones after it always call their agent,
+        while the stages before it are served from the cache """
+        if replay_from is not None:
+            if replay_from not in STAGES:
+                raise ValueError(f"replay_from must be one of {', '.join(STAGES)}")
+            if cache is None:
+                raise ValueError("replay_from requires a cache")
+        self.cache = cache
+        self.replay_from = replay_from
+
     async def run(self):
        with tracer.start_as_current_span("math-assignment") as current_span:
             """ Run the assignment process """
@@ -24,40 +41,72 @@ class AssignmentManager:
             return assignment_result
 
 
-    async def create_question(self) -> MathQuestion:
+    async def create_question(self, sample: int = 0) -> MathQuestion:
         """ Create a math question to assign to the student """
         print("Creating a math question...")
         input = "Create a math question for a grade 8 student"
-        result = await Runner.run(
+        return await self._run_stage(
+            "question",
             teacher_agent,
-            input
+            input,
+            MathQuestion,
+            lambda result: result.final_output_as(MathQuestion),
+            sample=sample,
         )
-        return result.final_output_as(MathQuestion)
 
     async def prepare_solution(self, question: MathQuestion) -> str:
         """ Prepare a solution to the question """
         input = f"The math question: {question.question}"
-        result = await Runner.run(
+        return await self._run_stage(
+            "solution",
             student_agent,
             input,
+            str,
+            lambda result: str(result.final_output),
         )
-        return str(result.final_output)
 
     async def grade_assignment(self, solution: str) -> AssignmentResult:
         """ Assigning a grade to the solution """
         input = f"Solution: {solution}"
-        result = await Runner.run(
+        return await self._run_stage(
+            "grading",
             teaching_assistant_agent,
             solution,
+            AssignmentResult,
+            lambda result: result.final_output_as(AssignmentResult),
         )
 
-        return result.final_output_as(AssignmentResult)
+    async def _run_stage(self, stage, agent, input, output_type, parse, sample=0):
+        """ Run an agent for one stage, going through the cache when there is one """
+        if self.cache is None:
+            return parse(await Runner.run(agent, input))
+
+        key = self.cache.key(agent, input, sample)
+        if self._serve_from_cache(stage):
+            cached = self.cache.get(key, output_type)
+            trace.get_current_span().set_attribute(f"assignment.{stage}.cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+        output = parse(await Runner.run(agent, input))
+        self.cache.put(key, stage, output)
+        return output
+
+    def _serve_from_cache(self, stage: str) -> bool:
+        if self.replay_from is None:
+            return True
+        return STAGES.index(stage) < STAGES.index(self.replay_from)
 
 
 def main():
-   assignment_manager = AssignmentManager()
+   parser = argparse.ArgumentParser(description="Run a math assignment with a teacher, student and teaching assistant agent")
+   parser.add_argument("--cache-dir", help="directory used to cache the output of each stage")
+   parser.add_argument("--replay-from", choices=STAGES, help="re-run this stage and the ones after it, reading earlier stages from the cache")
+   args = parser.parse_args()
+
+   cache = StageCache(args.cache_dir) if args.cache_dir else None
+   assignment_manager = AssignmentManager(cache=cache, replay_from=args.replay_from)
    asyncio.run(assignment_manager.run())
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+from assignment_manager import STAGES, AssignmentManager, tracer
+from stage_cache import StageCache
+
+_DONE = object()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """ Nearest-rank percentile of a list of values """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+@dataclass
+class StageStats:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    failures: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name:<10} n={len(self.latencies):<5} failed={self.failures:<3} "
+            f"p50={percentile(self.latencies, 50):.2f}s "
+            f"p90={percentile(self.latencies, 90):.2f}s "
+            f"p99={percentile(self.latencies, 99):.2f}s"
+        )
+
+
+@dataclass
+class BatchReport:
+    requested: int
+    completed: int
+    wall_time: float
+    stages: dict[str, StageStats]
+
+    @property
+    def throughput_per_min(self) -> float:
+        if self.wall_time <= 0:
+            return 0.0
+        return self.completed / self.wall_time * 60
+
+    def summary(self) -> str:
+        lines = [
+            f"Completed {self.completed}/{self.requested} assignments in {self.wall_time:.2f}s "
+            f"({self.throughput_per_min:.1f} assignments/min)"
+        ]
+        lines.extend(self.stages[name].summary() for name in STAGES)
+        return "\n".join(lines)
+
+
+@dataclass
+class _Assignment:
+    index: int
+    span: Optional[trace.Span] = None
+    value: Any = None
+
+
+class AssignmentPipeline:
+    """ Runs many assignments through the teacher, student and teaching assistant
+    stages concurrently, connected by bounded queues """
+
+    def __init__(
+        self,
+        manager: Optional[AssignmentManager] = None,
+        question_workers: int = 1,
+        solution_workers: int = 2,
+        grading_workers: int = 2,
+        queue_size: int = 4,
+    ):
+        self.manager = manager or AssignmentManager()
+        self.workers = {
+            "question": question_workers,
+            "solution": solution_workers,
+            "grading": grading_workers,
+        }
+        if min(self.workers.values()) < 1:
+            raise ValueError("each stage needs at least one worker")
+        self.queue_size = queue_size
+
+    async def run(self, count: int) -> tuple[list, BatchReport]:
+        """ Run `count` assignments and return the results (None for failures) in order """
+        stats = {name: StageStats(name) for name in STAGES}
+        results: list = [None] * count
+
+        inbox = asyncio.Queue(maxsize=self.queue_size)
+        to_solution = asyncio.Queue(maxsize=self.queue_size)
+        to_grading = asyncio.Queue(maxsize=self.queue_size)
+
+        async def create_question(item: _Assignment):
+            return await self.manager.create_question(sample=item.index)
+
+        async def prepare_solution(item: _Assignment):
+            return await self.manager.prepare_solution(item.value)
+
+        async def grade_assignment(item: _Assignment):
+            results[item.index] = await self.manager.grade_assignment(item.value)
+            return results[item.index]
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            self._feed(inbox, count),
+            self._run_stage("question", create_question, inbox, to_solution, stats),
+            self._run_stage("solution", prepare_solution, to_solution, to_grading, stats),
+            self._run_stage("grading", grade_assignment, to_grading, None, stats),
+        )
+        wall_time = time.perf_counter() - start
+
+        completed = sum(1 for result in results if result is not None)
+        return results, BatchReport(count, completed, wall_time, stats)
+
+    async def _feed(self, inbox: asyncio.Queue, count: int):
+        for index in range(count):
+            await inbox.put(_Assignment(index))
+        for _ in range(self.workers["question"]):
+            await inbox.put(_DONE)
+
+    async def _run_stage(
+        self,
+        name: str,
+        handler: Callable[[_Assignment], Awaitable[Any]],
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        stats: dict[str, StageStats],
+    ):
+        await asyncio.gather(
+            *(self._worker(name, handler, inbox, outbox, stats[name]) for _ in range(self.workers[name]))
+        )
+        if outbox is not None:
+            next_stage = STAGES[STAGES.index(name) + 1]
+            for _ in range(self.workers[next_stage]):
+                await outbox.put(_DONE)
+
+    async def _worker(
+        self,
+        name: str,
+        handler: Callable[[_Assignment], Awaitable[Any]],
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        stats: StageStats,
+    ):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            if item.span is None:
+                item.span = tracer.start_span("math-assignment", attributes={"assignment.index": item.index})
+            with trace.use_span(item.span, end_on_exit=False):
+                started = time.perf_counter()
+                try:
+                    item.value = await handler(item)
+                except Exception as exc:
+                    stats.failures += 1
+                    item.span.record_exception(exc)
+                    item.span.set_status(Status(StatusCode.ERROR, f"{name} stage failed"))
+                    item.span.end()
+                    continue
+                stats.latencies.append(time.perf_counter() - started)
+            if outbox is None:
+                item.span.end()
+            else:
+                await outbox.put(item)
+
+
+async def run_batch(count: int, manager: Optional[AssignmentManager] = None, **kwargs) -> BatchReport:
+    pipeline = AssignmentPipeline(manager, **kwargs)
+    _, report = await pipeline.run(count)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many math assignments through a pipelined set of agents")
+    parser.add_argument("--count", type=int, default=10, help="number of assignments to run")
+    parser.add_argument("--question-workers", type=int, default=1)
+    parser.add_argument("--solution-workers", type=int, default=2)
+    parser.add_argument("--grading-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=4, help="capacity of the queues between stages")
+    parser.add_argument("--cache-dir", help="directory used to cache the output of each stage")
+    parser.add_argument("--replay-from", choices=STAGES, help="re-run this stage and the ones after it, reading earlier stages from the cache")
+    args = parser.parse_args()
+
+    cache = StageCache(args.cache_dir) if args.cache_dir else None
+    report = asyncio.run(run_batch(
+        args.count,
+        AssignmentManager(cache=cache, replay_from=args.replay_from),
+        question_workers=args.question_workers,
+        solution_workers=args.solution_workers,
+        grading_workers=args.grading_workers,
+        queue_size=args.queue_size,
+    ))
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+from agents import Agent
+from pydantic import BaseModel
+
+
+def agent_fingerprint(agent: Agent) -> dict:
+    """ The parts of an agent's configuration that influence its output """
+    output_type = agent.output_type
+    return {
+        "name": agent.name,
+        "instructions": agent.instructions if isinstance(agent.instructions, str) else repr(agent.instructions),
+        "model": str(agent.model),
+        "model_settings": repr(agent.model_settings),
+        "output_type": output_type.model_json_schema()
+        if isinstance(output_type, type) and issubclass(output_type, BaseModel)
+        else repr(output_type),
+        "handoffs": sorted(getattr(handoff, "name", repr(handoff)) for handoff in agent.handoffs),
+    }
+
+
+class StageCache:
+    """ Persists agent stage outputs on disk, keyed by agent config and input """
+
+    def __init__(self, directory: str | os.PathLike):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, agent: Agent, input: str, sample: int = 0) -> str:
+        payload = json.dumps(
+            {"agent": agent_fingerprint(agent), "input": input, "sample": sample},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, output_type: type) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError):
+            # a truncated or unreadable entry is treated as a miss and rewritten later
+            return None
+        try:
+            output = entry["output"]
+            if isinstance(output_type, type) and issubclass(output_type, BaseModel):
+                return output_type.model_validate(output)
+            return output_type(output)
+        except (KeyError, TypeError, ValueError):
+            # an entry from an older version, or one that doesn't fit the output type, is a miss too
+            return None
+
+    def put(self, key: str, stage: str, output: Any):
+        entry = {
+            "stage": stage,
+            "output": output.model_dump() if isinstance(output, BaseModel) else output,
+        }
+        # write to a temporary file first so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            # don't leave the temporary file behind in the cache directory
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
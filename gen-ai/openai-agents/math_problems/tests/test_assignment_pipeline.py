@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from assignment_pipeline import AssignmentPipeline, percentile
+from student_agent import student_agent
+from teacher_agent import MathQuestion, teacher_agent
+from teaching_assistant_agent import AssignmentResult
+
+
+def fake_runner():
+    async def run(agent, input):
+        await asyncio.sleep(0.01)
+        if agent is teacher_agent:
+            question = MathQuestion(
+                mathematics_branch="algebra",
+                rationale="Practice linear equations",
+                question="Solve for x: x + 3 = 7",
+            )
+            return MagicMock(final_output_as=MagicMock(return_value=question))
+        if agent is student_agent:
+            return MagicMock(final_output="x = 4")
+        return MagicMock(final_output_as=MagicMock(return_value=AssignmentResult(grade="A", rationale="Correct.")))
+
+    return run
+
+
+@pytest.mark.asyncio
+@patch("assignment_manager.Runner.run", new_callable=AsyncMock)
+async def test_pipeline_runs_every_assignment(mock_runner):
+    mock_runner.side_effect = fake_runner()
+
+    results, report = await AssignmentPipeline(solution_workers=3, grading_workers=2).run(6)
+
+    assert [result.grade for result in results] == ["A"] * 6
+    assert mock_runner.await_count == 18
+    assert report.completed == 6
+    assert report.throughput_per_min > 0
+    assert all(len(report.stages[name].latencies) == 6 for name in ("question", "solution", "grading"))
+
+
+@pytest.mark.asyncio
+@patch("assignment_manager.Runner.run", new_callable=AsyncMock)
+async def test_pipeline_records_stage_failures(mock_runner):
+    runner = fake_runner()
+
+    async def failing_student(agent, input):
+        if agent is student_agent:
+            raise RuntimeError("model unavailable")
+        return await runner(agent, input)
+
+    mock_runner.side_effect = failing_student
+
+    results, report = await AssignmentPipeline().run(3)
+
+    assert results == [None, None, None]
+    assert report.completed == 0
+    assert report.stages["solution"].failures == 3
+    assert report.stages["grading"].latencies == []
+
+
+def test_pipeline_requires_workers_for_each_stage():
+    with pytest.raises(ValueError):
+        AssignmentPipeline(grading_workers=0)
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 11)]
+
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 90) == 9.0
+    assert percentile(values, 100) == 10.0
+    assert percentile([], 50) == 0.0
@@ -0,0 +1,109 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from agents import Agent
+
+from assignment_manager import AssignmentManager
+from stage_cache import StageCache
+from teacher_agent import MathQuestion, teacher_agent
+from teaching_assistant_agent import AssignmentResult
+
+QUESTION = MathQuestion(
+    mathematics_branch="algebra",
+    rationale="Practice linear equations",
+    question="Solve for x: x + 3 = 7",
+)
+
+
+def runner_results(grade="B+"):
+    return [
+        MagicMock(final_output_as=MagicMock(return_value=QUESTION)),
+        MagicMock(final_output="x = 4"),
+        MagicMock(final_output_as=MagicMock(return_value=AssignmentResult(grade=grade, rationale="Fine work."))),
+    ]
+
+
+def test_cache_round_trips_models_and_text(tmp_path):
+    cache = StageCache(tmp_path)
+    question_key = cache.key(teacher_agent, "Create a question")
+    cache.put(question_key, "question", QUESTION)
+    cache.put("solution-key", "solution", "x = 4")
+
+    assert StageCache(tmp_path).get(question_key, MathQuestion) == QUESTION
+    assert StageCache(tmp_path).get("solution-key", str) == "x = 4"
+    assert cache.get("missing", str) is None
+
+
+def test_cache_key_changes_with_agent_config(tmp_path):
+    cache = StageCache(tmp_path)
+    changed = Agent(
+        name=teacher_agent.name,
+        instructions=teacher_agent.instructions + " Keep it short.",
+        model=teacher_agent.model,
+        output_type=MathQuestion,
+    )
+
+    assert cache.key(teacher_agent, "input") == cache.key(teacher_agent, "input")
+    assert cache.key(teacher_agent, "input") != cache.key(changed, "input")
+    assert cache.key(teacher_agent, "input") != cache.key(teacher_agent, "other input")
+    assert cache.key(teacher_agent, "input", sample=1) != cache.key(teacher_agent, "input")
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = StageCache(tmp_path)
+    (tmp_path / "broken.json").write_text("{not json")
+
+    assert cache.get("broken", str) is None
+
+
+def test_entry_without_an_output_is_a_miss(tmp_path):
+    cache = StageCache(tmp_path)
+    (tmp_path / "old.json").write_text('{"stage": "question"}')
+    (tmp_path / "stale.json").write_text('{"stage": "question", "output": {"question": "?"}}')
+
+    assert cache.get("old", str) is None
+    assert cache.get("stale", MathQuestion) is None
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path):
+    cache = StageCache(tmp_path)
+
+    with pytest.raises(TypeError):
+        cache.put("key", "solution", object())
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+@patch("assignment_manager.Runner.run", new_callable=AsyncMock)
+async def test_cached_run_skips_all_agents(mock_runner, tmp_path):
+    mock_runner.side_effect = runner_results()
+    await AssignmentManager(cache=StageCache(tmp_path)).run()
+
+    mock_runner.reset_mock()
+    result = await AssignmentManager(cache=StageCache(tmp_path)).run()
+
+    assert result.grade == "B+"
+    mock_runner.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("assignment_manager.Runner.run", new_callable=AsyncMock)
+async def test_replay_reruns_only_downstream_stages(mock_runner, tmp_path):
+    mock_runner.side_effect = runner_results()
+    await AssignmentManager(cache=StageCache(tmp_path)).run()
+
+    mock_runner.reset_mock()
+    mock_runner.side_effect = runner_results(grade="A")[2:]
+    result = await AssignmentManager(cache=StageCache(tmp_path), replay_from="grading").run()
+
+    assert result.grade == "A"
+    mock_runner.assert_awaited_once()
+    assert mock_runner.await_args.args[0].name == "TeachingAssistantAgent"
+
+
+def test_replay_requires_a_cache():
+    with pytest.raises(ValueError):
+        AssignmentManager(replay_from="grading")
+    with pytest.raises(ValueError):
+        AssignmentManager(cache=MagicMock(), replay_from="homework")
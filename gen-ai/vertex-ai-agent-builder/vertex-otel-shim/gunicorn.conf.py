@@ -0,0 +1,79 @@
+"""Gunicorn settings for the shim, with a telemetry pipeline per worker process.
+
+Gunicorn reads this file from the working directory.  Settings can be tuned
+with environment variables on the Cloud Run service:
+
+  WORKERS_PER_CPU   worker processes per vCPU of the container's quota (default 2),
+                    or set WEB_CONCURRENCY
+  GUNICORN_THREADS  threads per worker (default 4)
+  GUNICORN_PRELOAD  import the app and converter once in the master (default true)
+  MAX_REQUESTS      recycle workers after this many requests (default 0, never)
+  OTLP_FLUSH_TIMEOUT_MS  time a stopping worker has to export its spans (default 5000)
+"""
+from __future__ import annotations
+
+import math
+import os
+
+
+def _cgroup_cpu_quota() -> float | None:
+    """The container's CPU limit in CPUs, from cgroup v2 or v1, or None if there isn't one."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    """
+    The CPUs this container may use.  os.cpu_count() counts the host's CPUs, which on
+    Cloud Run or GKE is far more than the container's quota.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+bind = f":{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY")
+              or available_cpus() * int(os.environ.get("WORKERS_PER_CPU", "2")))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = 30
+
+# Preloading imports main.py, the converter, Flask and the OTel SDK once in the
+# master, so forked workers start without importing them again.  The export
+# pipeline isn't built at import time, so nothing with a thread is forked.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+FLUSH_TIMEOUT_MS = int(os.environ.get("OTLP_FLUSH_TIMEOUT_MS", "5000"))
+# give workers time to flush their spans before the master kills them
+graceful_timeout = max(30, FLUSH_TIMEOUT_MS // 1000 + 5)
+
+
+def post_fork(server, worker):
+    import main
+
+    main.init_pipeline()
+
+
+def worker_exit(server, worker):
+    import main
+
+    main.shutdown_pipeline(timeout_millis=FLUSH_TIMEOUT_MS)
@@ -5,6 +5,7 @@ import base64
 import json
 import logging
 import os
+import threading
 from typing import Any
 
 from flask import Flask, request
@@ -42,13 +43,46 @@ resource = Resource.create({
     "cloud.provider": "gcp",
 })
 
-provider = TracerProvider(resource=resource)
-exporter = OTLPSpanExporter(
-    endpoint=OTLP_ENDPOINT,
-    headers=_parse_headers(OTLP_HEADERS_RAW),
-)
-span_processor = BatchSpanProcessor(exporter)
-provider.add_span_processor(span_processor)
+# The span processor's export thread doesn't survive a fork, so the pipeline is
+# built lazily, once per process.  Under gunicorn, gunicorn.conf.py builds it in
+# each worker after the fork and flushes it when the worker exits.
+_pipeline_lock = threading.Lock()
+_pipeline_pid: int | None = None
+provider: TracerProvider | None = None
+span_processor: BatchSpanProcessor | None = None
+
+
+def init_pipeline() -> BatchSpanProcessor:
+    """Build the export pipeline for this process, if it hasn't been built yet."""
+    global provider, span_processor, _pipeline_pid
+    processor = span_processor
+    if processor is not None and _pipeline_pid == os.getpid():
+        return processor
+    with _pipeline_lock:
+        if span_processor is not None and _pipeline_pid == os.getpid():
+            return span_processor
+        provider = TracerProvider(resource=resource)
+        exporter = OTLPSpanExporter(
+            endpoint=OTLP_ENDPOINT,
+            headers=_parse_headers(OTLP_HEADERS_RAW),
+        )
+        span_processor = BatchSpanProcessor(exporter)
+        provider.add_span_processor(span_processor)
+        _pipeline_pid = os.getpid()
+        logger.info("Built OTLP export pipeline in process %d", _pipeline_pid)
+        return span_processor
+
+
+def shutdown_pipeline(timeout_millis: int = 5000) -> None:
+    """Export the spans still queued in this process, then stop the pipeline."""
+    global provider, span_processor, _pipeline_pid
+    with _pipeline_lock:
+        if span_processor is None or _pipeline_pid != os.getpid():
+            return
+        if not span_processor.force_flush(timeout_millis):
+            logger.warning("Timed out flushing spans in process %d", _pipeline_pid)
+        provider.shutdown()
+        provider = span_processor = _pipeline_pid = None
 
 # --- Span emission helper ----------------------------------------------------
 
@@ -111,7 +145,7 @@ def _emit_synth_span(s: SynthSpan) -> None:
         # we set the private attr, which BatchSpanProcessor reads on export.
         readable._events = evs
 
-    span_processor.on_end(readable)
+    init_pipeline().on_end(readable)
 
 # --- Flask app ---------------------------------------------------------------
 
@@ -166,4 +200,7 @@ def healthz() -> tuple[str, int]:
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
\ No newline at end of file
+    try:
+        app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
+    finally:
+        shutdown_pipeline()
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+A variant of app.py that keeps setup out of the request path, and does less work
+on warm invocations:
+
+* the logging instrumentation and the HTTP session are set up in runtime_init.py,
+  which is imported on the first invocation rather than when the handler is loaded,
+  unless EAGER_INIT is true, e.g. with provisioned concurrency, where the init phase
+  runs before any request arrives
+* the HTTP session keeps its connection open between warm invocations
+* the IP address is cached for IP_CACHE_TTL_SECONDS (300 by default) on a warm
+  instance, so most invocations make no HTTP request at all
+* with LOG_FORMAT=json, the logs are written as JSON by a background thread,
+  see structured_logging.py
+
+To use it, set the handler in template.yaml to app_optimized.lambda_handler.
+"""
+import json
+import os
+import time
+
+CHECKIP_URL = "http://checkip.amazonaws.com/"
+IP_CACHE_TTL_SECONDS = float(os.environ.get("IP_CACHE_TTL_SECONDS", "300"))
+
+_runtime = None
+_cached_ip = None
+_cached_until = 0.0
+
+
+def _init():
+    global _runtime
+    if _runtime is None:
+        import runtime_init
+
+        _runtime = runtime_init
+    return _runtime
+
+
+if os.environ.get("EAGER_INIT", "false").lower() == "true":
+    _init()
+
+
+def _get_ip(runtime):
+    global _cached_ip, _cached_until
+    now = time.monotonic()
+    if _cached_ip is not None and now < _cached_until:
+        return _cached_ip
+    try:
+        response = runtime.session.get(CHECKIP_URL, timeout=5)
+        response.raise_for_status()
+    except runtime.requests.RequestException as e:
+        runtime.logger.error(e)
+        raise e
+    _cached_ip = response.text.replace("\n", "")
+    _cached_until = now + IP_CACHE_TTL_SECONDS
+    return _cached_ip
+
+
+def lambda_handler(event, context):
+    runtime = _init()
+    try:
+        runtime.logger.info('In lambda_handler, about to get the IP address...')
+
+        ip = _get_ip(runtime)
+
+        runtime.logger.info('Successfully got the IP address, returning a response.')
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "message": "hello world",
+                "location": ip
+            }),
+        }
+    finally:
+        runtime.flush_logs()
@@ -0,0 +1,143 @@
+"""
+JSON logging with trace context, for LOG_FORMAT=json.
+
+With LOG_FORMAT=text, the default, the handlers log the way app.py always has:
+LoggingInstrumentor adds the trace context to every record, and each record is
+formatted and written twice, by the handler of the app's logger and by the root
+logger's handler, and stdout is flushed after every write.
+
+With LOG_FORMAT=json, the handler of the app's logger adds the trace and span IDs
+to the record once, when it's logged, and puts it on a queue.  A QueueListener
+thread formats it as one line of JSON, and writes it to a buffered stdout.
+flush_logs waits for the queue to empty, and flushes stdout; the handlers call it
+at the end of each invocation, before Lambda can freeze the instance.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from opentelemetry import trace
+
+_queue = None
+_listener = None
+_output = None
+
+
+def json_logging_enabled():
+    return os.environ.get("LOG_FORMAT", "text").strip().lower() == "json"
+
+
+class _TraceContextQueueHandler(QueueHandler):
+    """Queues records with the trace context of the thread that logged them."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        span_context = trace.get_current_span().get_span_context()
+        if span_context.is_valid:
+            record.otelTraceID = format(span_context.trace_id, "032x")
+            record.otelSpanID = format(span_context.span_id, "016x")
+            record.otelTraceSampled = span_context.trace_flags.sampled
+        else:
+            record.otelTraceID = "0"
+            record.otelSpanID = "0"
+            record.otelTraceSampled = False
+        # the arguments may change once the call returns, and the traceback can't be
+        # pickled or kept, so they're resolved now; the rest is formatted by the listener
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON, with the fields of app.py's FORMAT."""
+
+    def __init__(self, service_name):
+        super().__init__()
+        self._service_name = service_name
+
+    def format(self, record):
+        entry = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "severity": record.levelname,
+            "logger": record.name,
+            "location": f"{record.filename}:{record.lineno}",
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "otelTraceID", "0"),
+            "span_id": getattr(record, "otelSpanID", "0"),
+            "trace_sampled": getattr(record, "otelTraceSampled", False),
+            "service.name": self._service_name,
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry)
+
+
+class _BufferedStreamHandler(logging.StreamHandler):
+    """A StreamHandler that leaves flushing the stream to flush_logs."""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+def _service_name():
+    resource = getattr(trace.get_tracer_provider(), "resource", None)
+    if resource is not None:
+        return resource.attributes.get("service.name", "")
+    return os.environ.get("OTEL_SERVICE_NAME", "")
+
+
+def _start_listener():
+    global _queue, _listener, _output
+    # the Lambda runtime replaces sys.stdout with a stream that flushes after every
+    # write, so the listener writes to a buffered stream of its own, on the same file
+    stream = open(sys.__stdout__.fileno(), "w", buffering=64 * 1024, encoding="utf-8", closefd=False)
+    _output = _BufferedStreamHandler(stream)
+    _output.setFormatter(JsonFormatter(_service_name()))
+    _queue = queue.Queue()
+    _listener = QueueListener(_queue, _output)
+    _listener.start()
+    atexit.register(_stop_listener)
+
+
+def _stop_listener():
+    _listener.stop()
+    _output.flush()
+
+
+def configure_json_logging(name, level=logging.INFO):
+    """
+    Returns the logger called name, logging JSON through the queue.  It doesn't
+    propagate its records to the root logger, so they're only written once.
+    """
+    if _listener is None:
+        _start_listener()
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.addHandler(_TraceContextQueueHandler(_queue))
+    logger.propagate = False
+    return logger
+
+
+def flush_logs():
+    """Writes out every record logged so far; with LOG_FORMAT=text, there's nothing to do."""
+    if _listener is None:
+        return
+    # the listener marks each record done once it has written it
+    _queue.join()
+    _output.flush()
@@ -4,32 +4,40 @@ import logging
 import sys
 from opentelemetry.instrumentation.logging import LoggingInstrumentor
 
-LoggingInstrumentor().instrument(set_logging_format=True)
-FORMAT = '%(asctime)s [severity=%(levelname)s] [%(name)s] [%(filename)s:%(lineno)d] [trace_id=%(otelTraceID)s span_id=%(otelSpanID)s service.name=%(otelServiceName)s d trace_sampled=%(otelTraceSampled)s] - %(message)s'
+from structured_logging import configure_json_logging, flush_logs, json_logging_enabled
 
-logger = logging.getLogger(__name__)
-logger.setLevel("INFO")
-h = logging.StreamHandler(sys.stdout)
-h.setFormatter(logging.Formatter(FORMAT))
-logger.addHandler(h)
+if json_logging_enabled():
+    logger = configure_json_logging(__name__)
+else:
+    LoggingInstrumentor().instrument(set_logging_format=True)
+    FORMAT = '%(asctime)s [severity=%(levelname)s] [%(name)s] [%(filename)s:%(lineno)d] [trace_id=%(otelTraceID)s span_id=%(otelSpanID)s service.name=%(otelServiceName)s d trace_sampled=%(otelTraceSampled)s] - %(message)s'
+
+    logger = logging.getLogger(__name__)
+    logger.setLevel("INFO")
+    h = logging.StreamHandler(sys.stdout)
+    h.setFormatter(logging.Formatter(FORMAT))
+    logger.addHandler(h)
 logging.getLogger().setLevel(logging.INFO)
 
 def lambda_handler(event, context):
-
-    logger.info('In lambda_handler, about to get the IP address...')
-
     try:
-        ip = requests.get("http://checkip.amazonaws.com/")
-    except requests.RequestException as e:
-        logger.error(e)
-        raise e
+        logger.info('In lambda_handler, about to get the IP address...')
+
+        try:
+            ip = requests.get("http://checkip.amazonaws.com/")
+        except requests.RequestException as e:
+            logger.error(e)
+            raise e
 
-    logger.info('Successfully got the IP address, returning a response.')
+        logger.info('Successfully got the IP address, returning a response.')
 
-    return {
-        "statusCode": 200,
-        "body": json.dumps({
-            "message": "hello world",
-             "location": ip.text.replace("\n", "")
-        }),
-    }
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "message": "hello world",
+                 "location": ip.text.replace("\n", "")
+            }),
+        }
+    finally:
+        # with LOG_FORMAT=json, the logs are written before Lambda can freeze the instance
+        flush_logs()
@@ -0,0 +1,33 @@
+"""
+The cold-start work of app_optimized.py: configuring logging with trace context,
+and creating the HTTP session.  app_optimized.py imports this module on its first
+invocation, so importing the handler stays cheap, and warm invocations reuse what
+was set up here.
+"""
+import logging
+import sys
+
+import requests
+from requests.adapters import HTTPAdapter
+from opentelemetry.instrumentation.logging import LoggingInstrumentor
+
+from structured_logging import configure_json_logging, flush_logs, json_logging_enabled
+
+if json_logging_enabled():
+    logger = configure_json_logging("app_optimized")
+else:
+    LoggingInstrumentor().instrument(set_logging_format=True)
+    FORMAT = '%(asctime)s [severity=%(levelname)s] [%(name)s] [%(filename)s:%(lineno)d] [trace_id=%(otelTraceID)s span_id=%(otelSpanID)s service.name=%(otelServiceName)s d trace_sampled=%(otelTraceSampled)s] - %(message)s'
+
+    logger = logging.getLogger("app_optimized")
+    logger.setLevel("INFO")
+    h = logging.StreamHandler(sys.stdout)
+    h.setFormatter(logging.Formatter(FORMAT))
+    logger.addHandler(h)
+logging.getLogger().setLevel(logging.INFO)
+
+# An instance handles one invocation at a time, so one pooled connection is enough.
+# It's kept open between warm invocations, so they skip the TCP handshake.
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=1))
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=1))
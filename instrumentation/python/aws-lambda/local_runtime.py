@@ -0,0 +1,273 @@
+"""
+Measures the cold starts and warm invocations of the handlers in hello_world/
+on this machine, with the AWS Lambda runtime interface client (awslambdaric).
+
+The script emulates the Lambda Runtime API that the runtime interface client
+polls for invocations, so the handlers are loaded and invoked the same way as in
+a Lambda function.  Requests to checkip.amazonaws.com go through a local HTTP
+proxy, which answers them itself after --upstream-latency seconds, and counts the
+connections opened to it.  For each handler, the script starts the runtime
+--cold-starts times, and invokes each one once cold, then --warm times warm:
+
+    pip install -r requirements-benchmark.txt
+    python local_runtime.py --handlers app.lambda_handler app_optimized.lambda_handler
+
+The cold start is split into the init phase, from starting the runtime until it
+asks for its first invocation, and the first invocation itself.
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+API_PREFIX = "/2018-06-01/runtime"
+FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hello_world")
+EVENT = {"httpMethod": "GET", "path": "/hello", "headers": {}, "queryStringParameters": None, "body": None}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # the headers and the body are written separately, which Nagle's algorithm
+        # would otherwise hold back until the client acknowledges the headers
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # runtimes are killed after they're measured, in the middle of polling
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _RuntimeApiHandler(_Handler):
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != f"{API_PREFIX}/invocation/next":
+            self._reply(404)
+            return
+        self.server.polled.set()
+        request_id, event = self.server.invocations.get()
+        self._reply(200, json.dumps(event).encode(), {
+            "Content-Type": "application/json",
+            "Lambda-Runtime-Aws-Request-Id": request_id,
+            "Lambda-Runtime-Deadline-Ms": str(int((time.time() + 30) * 1000)),
+            "Lambda-Runtime-Invoked-Function-Arn": "arn:aws:lambda:us-west-1:000000000000:function:hello-world",
+        })
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        parts = self.path[len(API_PREFIX):].strip("/").split("/")
+        if parts == ["init", "error"]:
+            self.server.complete(None, error=body.decode())
+        elif len(parts) == 3 and parts[0] == "invocation":
+            self.server.complete(parts[1], error=body.decode() if parts[2] == "error" else None)
+        self._reply(202)
+
+
+class RuntimeApi(_Server):
+    """The part of the Lambda Runtime API that the runtime interface client uses."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _RuntimeApiHandler)
+        self.invocations = queue.Queue()
+        self.polled = threading.Event()
+        self.lock = threading.Lock()
+        self.waiting: Dict[str, queue.Queue] = {}
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def invoke(self, event, timeout=30.0):
+        """Sends an invocation to the runtime, and waits for its response."""
+        request_id = str(uuid.uuid4())
+        done = queue.Queue(maxsize=1)
+        with self.lock:
+            self.waiting[request_id] = done
+        self.invocations.put((request_id, event))
+        error = done.get(timeout=timeout)
+        if error:
+            raise RuntimeError(f"the invocation failed: {error}")
+
+    def complete(self, request_id, error=None):
+        with self.lock:
+            if request_id is None:
+                waiting = list(self.waiting.values())
+                self.waiting.clear()
+            else:
+                waiting = [self.waiting.pop(request_id)]
+        for done in waiting:
+            done.put(error)
+
+
+class _UpstreamHandler(_Handler):
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        body = b"203.0.113.10\n"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Upstream(_Server):
+    """Stands in for checkip.amazonaws.com, as the HTTP proxy of the runtime."""
+
+    def __init__(self, latency: float):
+        super().__init__(("127.0.0.1", 0), _UpstreamHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def counts(self):
+        with self.lock:
+            return self.connections, self.requests
+
+
+@dataclass
+class HandlerResult:
+    handler: str
+    init: List[float] = field(default_factory=list)
+    first_invocation: List[float] = field(default_factory=list)
+    warm: List[float] = field(default_factory=list)
+    warm_connections: int = 0
+    warm_requests: int = 0
+
+    @property
+    def cold_start(self) -> List[float]:
+        return [init + first for init, first in zip(self.init, self.first_invocation)]
+
+
+def start_runtime(handler: str, function_dir: str, api: RuntimeApi, upstream: Upstream, log) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        AWS_LAMBDA_RUNTIME_API=api.address,
+        AWS_LAMBDA_FUNCTION_NAME="hello-world",
+        AWS_LAMBDA_FUNCTION_MEMORY_SIZE="512",
+        AWS_LAMBDA_FUNCTION_VERSION="$LATEST",
+        AWS_REGION="us-west-1",
+        HTTP_PROXY=upstream.url,
+        NO_PROXY="127.0.0.1,localhost",
+        OTEL_SERVICE_NAME="aws-lambda-python-opentelemetry-example",
+    )
+    return subprocess.Popen([sys.executable, "-m", "awslambdaric", handler], cwd=function_dir, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+
+
+def measure(handler: str, args, upstream: Upstream, log) -> HandlerResult:
+    result = HandlerResult(handler)
+    for _ in range(args.cold_starts):
+        api = RuntimeApi()
+        started = time.perf_counter()
+        process = start_runtime(handler, args.function_dir, api, upstream, log)
+        try:
+            if not api.polled.wait(timeout=60):
+                raise TimeoutError(f"{handler} didn't start within 60s")
+            ready = time.perf_counter()
+            api.invoke(EVENT)
+            result.init.append(ready - started)
+            result.first_invocation.append(time.perf_counter() - ready)
+
+            connections, requests = upstream.counts()
+            for _ in range(args.warm):
+                invoked = time.perf_counter()
+                api.invoke(EVENT)
+                result.warm.append(time.perf_counter() - invoked)
+            after_connections, after_requests = upstream.counts()
+            result.warm_connections += after_connections - connections
+            result.warm_requests += after_requests - requests
+        finally:
+            process.kill()
+            process.wait()
+            api.shutdown()
+            api.server_close()
+    return result
+
+
+def print_results(results: List[HandlerResult]):
+    header = (f"{'handler':<32}{'init ms':>9}{'1st call ms':>13}{'cold ms':>9}"
+              f"{'warm p50 ms':>13}{'warm p99 ms':>13}{'conns/call':>12}{'upstream/call':>15}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        calls = len(result.warm) or 1
+        print(f"{result.handler:<32}{percentile(result.init, 50) * 1000:>9.1f}"
+              f"{percentile(result.first_invocation, 50) * 1000:>13.1f}{percentile(result.cold_start, 50) * 1000:>9.1f}"
+              f"{percentile(result.warm, 50) * 1000:>13.2f}{percentile(result.warm, 99) * 1000:>13.2f}"
+              f"{result.warm_connections / calls:>12.2f}{result.warm_requests / calls:>15.2f}")
+    print("\ncold ms is the init phase plus the first invocation; each figure is the median over the cold starts, "
+          "and conns/call and upstream/call count the connections and requests to the upstream per warm invocation")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Lambda cold starts and warm invocations locally")
+    parser.add_argument("--handlers", nargs="+", default=["app.lambda_handler", "app_optimized.lambda_handler"])
+    parser.add_argument("--function-dir", default=FUNCTION_DIR, help="the directory of the handlers' modules")
+    parser.add_argument("--cold-starts", type=int, default=10, help="runtimes started per handler")
+    parser.add_argument("--warm", type=int, default=100, help="warm invocations per runtime")
+    parser.add_argument("--upstream-latency", type=float, default=0.02,
+                        help="seconds the stand-in for checkip.amazonaws.com takes to answer")
+    parser.add_argument("--log", default="local-runtime.log", help="where the output of the runtimes goes")
+    args = parser.parse_args()
+
+    upstream = Upstream(args.upstream_latency)
+    results = []
+    with open(args.log, "w") as log:
+        for handler in args.handlers:
+            print(f"measuring {handler} ...", flush=True)
+            results.append(measure(handler, args, upstream, log))
+    print()
+    print_results(results)
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Measures what a log call in the handlers costs with LOG_FORMAT=text and
+LOG_FORMAT=json, at a high log volume.
+
+Each mode runs in a fresh process, which sets up logging the way the Lambda
+runtime interface client does, imports the handlers' logging setup from
+hello_world/runtime_init.py, and logs --calls records inside a span, timing every
+call.  After every --records-per-invocation records, it calls flush_logs, as the
+handlers do at the end of an invocation.  This script reads the process's stdout
+and stderr through pipes, as Lambda does, and counts the lines written:
+
+    pip install -r requirements-benchmark.txt
+    python log_benchmark.py --calls 100000 --records-per-invocation 100
+
+us/call with flush is the time of the log calls and the flushes together, and
+CPU us/call is the CPU time of the whole process, including the listener thread
+of the JSON mode, each divided by the number of calls.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import List
+
+FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hello_world")
+MODES = ("text", "json")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_child(calls: int, per_invocation: int, function_dir: str, results_path: str):
+    from awslambdaric import bootstrap
+    from opentelemetry import trace
+    from opentelemetry.trace import NonRecordingSpan, SpanContext, TraceFlags
+
+    # what bootstrap.run does before it loads the handler
+    sys.stdout = bootstrap.Unbuffered(sys.stdout)
+    sys.stderr = bootstrap.Unbuffered(sys.stderr)
+    log_sink = bootstrap.create_log_sink()
+    bootstrap._setup_logging(bootstrap._AWS_LAMBDA_LOG_FORMAT, bootstrap._AWS_LAMBDA_LOG_LEVEL, log_sink)
+
+    sys.path.insert(0, function_dir)
+    import runtime_init
+
+    logger = runtime_init.logger
+    span = NonRecordingSpan(SpanContext(trace_id=0x5CE0E9A56015FEC5AADFA328AE398115, span_id=0xAB54A98CEB1F0AD2,
+                                        is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED)))
+    durations = []
+    flushes = []
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    with trace.use_span(span):
+        for i in range(calls):
+            call_started = time.perf_counter_ns()
+            logger.info("Processed item %d of the batch", i)
+            durations.append(time.perf_counter_ns() - call_started)
+            if (i + 1) % per_invocation == 0 or i + 1 == calls:
+                flush_started = time.perf_counter_ns()
+                runtime_init.flush_logs()
+                flushes.append(time.perf_counter_ns() - flush_started)
+    total = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    with open(results_path, "w") as results:
+        json.dump({
+            "durations_ns": durations,
+            "flushes_ns": flushes,
+            "total_seconds": total,
+            "cpu_seconds": cpu,
+        }, results)
+
+
+class _LineCounter(threading.Thread):
+    def __init__(self, stream):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.lines = 0
+        self.sample = b""
+
+    def run(self):
+        for line in self.stream:
+            if not self.sample:
+                self.sample = line
+            self.lines += 1
+
+
+class ModeResult:
+    def __init__(self, mode: str, calls: int, results: dict, stdout_lines: int, stderr_lines: int, sample: bytes):
+        self.mode = mode
+        self.calls = calls
+        self.durations_us = [ns / 1000 for ns in results["durations_ns"]]
+        self.flushes_ms = [ns / 1e6 for ns in results["flushes_ns"]]
+        self.total_seconds = results["total_seconds"]
+        self.cpu_seconds = results["cpu_seconds"]
+        self.stdout_lines = stdout_lines
+        self.stderr_lines = stderr_lines
+        self.sample = sample.decode(errors="replace").rstrip()
+
+
+def run_mode(mode: str, calls: int, per_invocation: int, function_dir: str) -> ModeResult:
+    with tempfile.NamedTemporaryFile(suffix=".json") as results:
+        env = dict(os.environ, LOG_FORMAT=mode, OTEL_SERVICE_NAME="aws-lambda-python-opentelemetry-example")
+        process = subprocess.Popen([sys.executable, __file__, "--child", "--calls", str(calls),
+                                    "--records-per-invocation", str(per_invocation), "--function-dir", function_dir,
+                                    "--results", results.name],
+                                   env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = _LineCounter(process.stdout), _LineCounter(process.stderr)
+        stdout.start()
+        stderr.start()
+        process.wait()
+        stdout.join()
+        stderr.join()
+        if process.returncode != 0:
+            raise RuntimeError(f"the {mode} run failed with exit code {process.returncode}")
+        with open(results.name) as f:
+            return ModeResult(mode, calls, json.load(f), stdout.lines, stderr.lines, stdout.sample or stderr.sample)
+
+
+def print_results(results: List[ModeResult]):
+    header = (f"{'mode':<8}{'p50 us':>9}{'p99 us':>9}{'p99.9 us':>10}{'flush p50 ms':>14}{'flush p99 ms':>14}"
+              f"{'us/call with flush':>20}{'CPU us/call':>13}{'lines/call':>12}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result.mode:<8}{percentile(result.durations_us, 50):>9.2f}{percentile(result.durations_us, 99):>9.2f}"
+              f"{percentile(result.durations_us, 99.9):>10.2f}"
+              f"{percentile(result.flushes_ms, 50):>14.2f}{percentile(result.flushes_ms, 99):>14.2f}"
+              f"{result.total_seconds / result.calls * 1e6:>20.2f}{result.cpu_seconds / result.calls * 1e6:>13.2f}"
+              f"{(result.stdout_lines + result.stderr_lines) / result.calls:>12.2f}")
+    print("\np50, p99 and p99.9 are the time a log call took in the handler, and the flush columns the time "
+          "flush_logs took at the end of an invocation")
+    for result in results:
+        print(f"\n{result.mode} output:\n  {result.sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of a log call with each LOG_FORMAT")
+    parser.add_argument("--calls", type=int, default=100000, help="records logged per mode")
+    parser.add_argument("--records-per-invocation", type=int, default=100,
+                        help="records logged between the calls to flush_logs")
+    parser.add_argument("--function-dir", default=FUNCTION_DIR, help="the directory of runtime_init.py")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--results", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.calls, args.records_per_invocation, os.path.abspath(args.function_dir), args.results)
+        return
+
+    results = []
+    for mode in args.modes:
+        print(f"logging {args.calls} records with LOG_FORMAT={mode} ...", flush=True)
+        results.append(run_mode(mode, args.calls, args.records_per_invocation, os.path.abspath(args.function_dir)))
+    print()
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
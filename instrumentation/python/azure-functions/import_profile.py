@@ -0,0 +1,123 @@
+"""
+Profiles what loading the function app costs on a cold start, with Python's
+-X importtime, and summarizes it: the total load time, the packages that took the
+longest to import, and the slowest modules.  Each profile loads the app in fresh
+processes, and reports the median of --runs of them:
+
+    python import_profile.py
+    python import_profile.py --compare OTEL_LAZY_INIT=false OTEL_LAZY_INIT=true
+
+With --compare, the app is profiled once per environment setting, so the load time
+of OpenTelemetry's lazy initialization can be compared with the eager one.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# how the Azure Functions Python worker loads the app
+STATEMENT = "import function_app"
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# init_opentelemetry requires these, but nothing is exported while profiling
+DEFAULT_ENV = {
+    "OTEL_SERVICE_NAME": "azure-function-python-opentelemetry-example",
+    "OTEL_EXPORTER_OTLP_ENDPOINT": "http://localhost:4318",
+    "OTEL_RESOURCE_ATTRIBUTES": "deployment.environment=test",
+}
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def load_once(statement: str, env: Dict[str, str]) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Returns the time the statement took in a fresh process, and the self and cumulative import time of each module."""
+    code = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=FUNCTION_DIR, env=env,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"loading the app failed:\n{process.stderr[-2000:]}")
+    modules = {}
+    for line in process.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return float(process.stdout.strip().splitlines()[-1]), modules
+
+
+class Profile:
+    def __init__(self, label: str, runs: List[Tuple[float, Dict[str, Tuple[int, int]]]]):
+        self.label = label
+        self.load_seconds = statistics.median(seconds for seconds, _ in runs)
+        # the median self and cumulative time of each module, in ms, over the runs that imported it
+        timings = defaultdict(list)
+        for _, modules in runs:
+            for module, timing in modules.items():
+                timings[module].append(timing)
+        self.modules = {
+            module: (statistics.median(t[0] for t in values) / 1000, statistics.median(t[1] for t in values) / 1000)
+            for module, values in timings.items()
+        }
+
+    @property
+    def module_count(self) -> int:
+        return len(self.modules)
+
+    def by_package(self) -> List[Tuple[str, float, int]]:
+        """The self time of every module, added up by top-level package, so nothing is counted twice."""
+        packages = defaultdict(lambda: [0.0, 0])
+        for module, (self_ms, _) in self.modules.items():
+            package = packages[module.split(".")[0]]
+            package[0] += self_ms
+            package[1] += 1
+        return sorted(((name, ms, count) for name, (ms, count) in packages.items()), key=lambda p: -p[1])
+
+    def slowest_modules(self) -> List[Tuple[str, float, float]]:
+        return sorted(((module, s, c) for module, (s, c) in self.modules.items()), key=lambda m: -m[1])
+
+
+def print_profile(profile: Profile, top: int):
+    print(f"{profile.label}: loaded in {profile.load_seconds * 1000:.0f} ms, importing {profile.module_count} modules")
+    print(f"\n  {'package':<40}{'self ms':>10}{'modules':>9}")
+    for name, ms, count in profile.by_package()[:top]:
+        print(f"  {name:<40}{ms:>10.1f}{count:>9}")
+    print(f"\n  {'module':<60}{'self ms':>10}{'cumulative ms':>15}")
+    for module, self_ms, cumulative_ms in profile.slowest_modules()[:top]:
+        print(f"  {module:<60}{self_ms:>10.1f}{cumulative_ms:>15.1f}")
+    print()
+
+
+def print_comparison(profiles: List[Profile]):
+    baseline = profiles[0]
+    print(f"{'environment':<40}{'load ms':>10}{'modules':>9}{'vs first':>10}")
+    for profile in profiles:
+        delta = (profile.load_seconds - baseline.load_seconds) * 1000
+        print(f"{profile.label:<40}{profile.load_seconds * 1000:>10.0f}{profile.module_count:>9}{delta:>+10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the import time of the function app")
+    parser.add_argument("--statement", default=STATEMENT, help="the Python statement that loads the app")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to load the app in, per profile")
+    parser.add_argument("--top", type=int, default=12, help="packages and modules to list")
+    parser.add_argument("--compare", nargs="+", metavar="NAME=VALUE", default=[],
+                        help="profile the app once per environment variable setting")
+    args = parser.parse_args()
+
+    env = dict(DEFAULT_ENV, **os.environ)
+    settings = args.compare or [""]
+    profiles = []
+    for setting in settings:
+        name, _, value = setting.partition("=")
+        run_env = dict(env, **{name: value}) if name else env
+        profiles.append(Profile(setting or "as configured", [load_once(args.statement, run_env) for _ in range(args.runs)]))
+    for profile in profiles:
+        print_profile(profile, args.top)
+    if len(profiles) > 1:
+        print_comparison(profiles)
+
+
+if __name__ == "__main__":
+    main()
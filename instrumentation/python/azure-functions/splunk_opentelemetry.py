@@ -1,43 +1,264 @@
-import os 
+import os
 import logging
+import math
+import queue
+import threading
+import time
+import azure.functions as func
 from opentelemetry import trace, _logs, metrics
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
 from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
-from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
 from opentelemetry.sdk.metrics import MeterProvider
-from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
-from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.sdk.metrics.export import MetricExporter, PeriodicExportingMetricReader
 
-def init_opentelemetry(): 
+# The OTLP exporters import requests and protobuf, which is a large part of the
+# cold start, so they're only imported when they're built.
 
-    if 'OTEL_SERVICE_NAME' not in os.environ: 
+def _span_exporter():
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter()
+
+def _metric_exporter():
+    from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+    return OTLPMetricExporter()
+
+def _log_exporter():
+    from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
+    return OTLPLogExporter()
+
+
+class _LazyExporter:
+    """
+    Stands in for an exporter until the first export, and only then builds it.  The
+    batch processors export from their own threads, so the exporter is imported
+    there rather than while the function app is loaded.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._exporter = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        with self._lock:
+            if self._exporter is None:
+                self._exporter = self._factory()
+            return self._exporter
+
+    def export(self, batch):
+        return self._get().export(batch)
+
+    def force_flush(self, timeout_millis=30000):
+        return self._exporter is None or self._exporter.force_flush(timeout_millis)
+
+    def shutdown(self):
+        if self._exporter is not None:
+            self._exporter.shutdown()
+
+
+class _LazyMetricExporter(MetricExporter):
+    """Like _LazyExporter, for the metric reader, which needs a MetricExporter."""
+
+    def __init__(self, factory):
+        # the OTLP exporter's default temporality and aggregation, which only
+        # change when their environment variables are set
+        super().__init__()
+        self._lazy = _LazyExporter(factory)
+
+    def export(self, metrics_data, timeout_millis=10000, **kwargs):
+        return self._lazy._get().export(metrics_data, timeout_millis=timeout_millis, **kwargs)
+
+    def force_flush(self, timeout_millis=10000):
+        return self._lazy.force_flush(timeout_millis)
+
+    def shutdown(self, timeout_millis=30000, **kwargs):
+        self._lazy.shutdown()
+
+
+def _env_flag(name, default):
+    return os.environ.get(name, default).strip().lower() == 'true'
+
+def _worker_extensions_enabled():
+    # the worker only runs OpenTelemetryFlushExtension with this application setting
+    return os.environ.get('PYTHON_ENABLE_WORKER_EXTENSIONS', '0').strip() == '1'
+
+def _signal_enabled(signal):
+    # the SDK's environment variables for choosing exporters, with none turning a signal off
+    return os.environ.get(f'OTEL_{signal.upper()}_EXPORTER', 'otlp').strip().lower() != 'none'
+
+# what init_opentelemetry set up, for flush_opentelemetry
+_state = {
+    'traceProvider': None,
+    'meterProvider': None,
+    'loggerProvider': None,
+    'flushAfterInvocation': False,
+    'metricsFlushIntervalSeconds': 60.0,
+    'lastMetricsFlush': 0.0,
+}
+
+def init_opentelemetry(lazy=None, signals=None, max_export_batch_size=None, schedule_delay_millis=None,
+                       export_interval_millis=None, flush_after_invocation=None):
+    """
+    Sets up traces, metrics and logs.
+
+    lazy (or OTEL_LAZY_INIT=true) builds the exporters on their first export,
+    instead of while the function app is loaded.
+
+    signals lists the signals to set up, out of 'traces', 'metrics' and 'logs'.  By
+    default, it's the ones whose OTEL_<SIGNAL>_EXPORTER variable isn't none.
+
+    max_export_batch_size and schedule_delay_millis configure the span and log
+    batch processors, and export_interval_millis the metric reader.  When they're
+    None, the SDK takes them from OTEL_BSP_*, OTEL_BLRP_* and
+    OTEL_METRIC_EXPORT_INTERVAL, or its defaults.
+
+    flush_after_invocation (or OTEL_FLUSH_AFTER_INVOCATION) exports everything
+    that's queued after each invocation, see flush_opentelemetry.  It only takes
+    effect if the worker runs extensions (PYTHON_ENABLE_WORKER_EXTENSIONS=1), and
+    it's on by default then.  The metric reader then doesn't export on its own
+    schedule, so an idle instance makes no exports; metrics are exported after an
+    invocation instead, at most once per export interval.
+    """
+
+    if 'OTEL_SERVICE_NAME' not in os.environ:
         raise Exception('The OTEL_SERVICE_NAME environment variable must be set')
 
-    if 'OTEL_EXPORTER_OTLP_ENDPOINT' not in os.environ: 
+    if 'OTEL_EXPORTER_OTLP_ENDPOINT' not in os.environ:
         raise Exception('The OTEL_EXPORTER_OTLP_ENDPOINT environment variable must be set')
-    
-    if 'OTEL_RESOURCE_ATTRIBUTES' not in os.environ: 
+
+    if 'OTEL_RESOURCE_ATTRIBUTES' not in os.environ:
         raise Exception('The OTEL_RESOURCE_ATTRIBUTES environment variable must be set')
 
-    traceProvider = TracerProvider()
-    processor = BatchSpanProcessor(OTLPSpanExporter())
-    traceProvider.add_span_processor(processor)
-    trace.set_tracer_provider(traceProvider)
-
-    reader = PeriodicExportingMetricReader(OTLPMetricExporter())
-    meterProvider = MeterProvider(metric_readers=[reader])
-    metrics.set_meter_provider(meterProvider)
-
-    _logs.set_logger_provider(
-        LoggerProvider()
-    )
-    logging.getLogger().addHandler(
-        LoggingHandler(
-            logger_provider=_logs.get_logger_provider().add_log_record_processor(
-                BatchLogRecordProcessor(OTLPLogExporter())
-            )
+    if lazy is None:
+        lazy = _env_flag('OTEL_LAZY_INIT', 'false')
+    if signals is None:
+        signals = [signal for signal in ('traces', 'metrics', 'logs') if _signal_enabled(signal)]
+    if flush_after_invocation is None:
+        # with extensions enabled, the flush keeps a frozen instance from losing what's queued
+        flush_after_invocation = _env_flag('OTEL_FLUSH_AFTER_INVOCATION',
+                                           'true' if _worker_extensions_enabled() else 'false')
+    # without the extension, nothing would export the metrics but the reader's thread
+    flushMetrics = flush_after_invocation and _worker_extensions_enabled()
+    batchSettings = {
+        'max_export_batch_size': max_export_batch_size,
+        'schedule_delay_millis': schedule_delay_millis,
+    }
+
+    if 'traces' in signals:
+        traceProvider = TracerProvider()
+        processor = BatchSpanProcessor(_LazyExporter(_span_exporter) if lazy else _span_exporter(), **batchSettings)
+        traceProvider.add_span_processor(processor)
+        trace.set_tracer_provider(traceProvider)
+        _state['traceProvider'] = traceProvider
+
+    if 'metrics' in signals:
+        if export_interval_millis is None:
+            export_interval_millis = float(os.environ.get('OTEL_METRIC_EXPORT_INTERVAL', '60000'))
+        # the reader takes the exporter's preferences when it's created, so the exporter
+        # is built right away if they're configured
+        lazyMetrics = lazy and not any(name in os.environ for name in (
+            'OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE',
+            'OTEL_EXPORTER_OTLP_METRICS_DEFAULT_HISTOGRAM_AGGREGATION',
+        ))
+        reader = PeriodicExportingMetricReader(
+            _LazyMetricExporter(_metric_exporter) if lazyMetrics else _metric_exporter(),
+            # with an infinite interval, the reader doesn't start its export thread
+            export_interval_millis=math.inf if flushMetrics else export_interval_millis,
         )
-    )
\ No newline at end of file
+        meterProvider = MeterProvider(metric_readers=[reader])
+        metrics.set_meter_provider(meterProvider)
+        if flushMetrics:
+            _state['meterProvider'] = meterProvider
+        _state['metricsFlushIntervalSeconds'] = export_interval_millis / 1000
+        _state['lastMetricsFlush'] = time.monotonic()
+
+    if 'logs' in signals:
+        loggerProvider = LoggerProvider()
+        _logs.set_logger_provider(loggerProvider)
+        loggerProvider.add_log_record_processor(
+            BatchLogRecordProcessor(_LazyExporter(_log_exporter) if lazy else _log_exporter(), **batchSettings)
+        )
+        logging.getLogger().addHandler(LoggingHandler(logger_provider=loggerProvider))
+        _state['loggerProvider'] = loggerProvider
+
+    _state['flushAfterInvocation'] = flush_after_invocation
+
+
+def flush_opentelemetry(timeout_millis=None):
+    """
+    Exports the spans and logs that are queued, and the metrics if they're due,
+    and waits for at most timeout_millis (OTEL_FLUSH_TIMEOUT_MILLIS, 2000 by
+    default) for all of it.  Returns whether everything was exported in time; if
+    not, the export carries on in the background.
+    """
+    if timeout_millis is None:
+        timeout_millis = int(os.environ.get('OTEL_FLUSH_TIMEOUT_MILLIS', '2000'))
+    providers = [_state['traceProvider'], _state['loggerProvider']]
+    if _state['meterProvider'] is not None:
+        now = time.monotonic()
+        if now - _state['lastMetricsFlush'] >= _state['metricsFlushIntervalSeconds']:
+            _state['lastMetricsFlush'] = now
+            providers.append(_state['meterProvider'])
+    providers = [provider for provider in providers if provider is not None]
+    if not providers:
+        return True
+
+    return _flushWorker.flush(providers, timeout_millis)
+
+
+class _FlushWorker:
+    """
+    Runs the flushes on a thread of its own, which is started once and reused.  The
+    SDK's batch processors don't bound their flush by the timeout, so the budget is
+    enforced by how long flush waits for the thread.
+    """
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def flush(self, providers, timeout_millis):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='OtelFlush', daemon=True)
+                self._thread.start()
+        deadline = time.monotonic() + timeout_millis / 1000
+        done = threading.Event()
+        self._requests.put((providers, deadline, done))
+        if not done.wait(timeout_millis / 1000):
+            logging.getLogger(__name__).warning('OpenTelemetry flush took longer than %d ms', timeout_millis)
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            providers, deadline, done = self._requests.get()
+            # an error in one flush mustn't stop the thread, or every later flush would time out
+            try:
+                for provider in providers:
+                    provider.force_flush(max(0, int((deadline - time.monotonic()) * 1000)))
+            except Exception:
+                logging.getLogger(__name__).exception('OpenTelemetry flush failed')
+            finally:
+                done.set()
+
+
+_flushWorker = _FlushWorker()
+
+
+class OpenTelemetryFlushExtension(func.AppExtensionBase):
+    """
+    A Python worker extension that calls flush_opentelemetry after every invocation,
+    before the host can freeze or recycle the instance.  It's registered when this
+    module is imported; the worker runs it when PYTHON_ENABLE_WORKER_EXTENSIONS is 1.
+    It runs in the invocation's thread before the worker sends the response, so the
+    flush adds up to OTEL_FLUSH_TIMEOUT_MILLIS to every invocation.
+    """
+
+    @classmethod
+    def post_invocation_app_level(cls, logger, context, func_args=None, func_ret=None, *args, **kwargs):
+        if _state['flushAfterInvocation']:
+            flush_opentelemetry()
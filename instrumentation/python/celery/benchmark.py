@@ -0,0 +1,388 @@
+"""
+Runs the add_timed task under each worker profile in worker_profiles.py, with and
+without tracing, and reports the throughput per core of each pool.
+
+Each run starts a worker, sends tasks to it with the load mode of producer.py, and
+exports the worker's spans to a local OTLP sink started by this script, which
+counts them, to check that every task's span was exported:
+
+    pip install -r requirements-benchmark.txt
+    python benchmark.py --tasks 5000
+
+The forget scenario traces the producer too, and compares waiting for the results
+of a group of tasks with sending tasks whose results are ignored, and whose
+completion callbacks record their latency on task_done spans instead.  It counts
+the commands Redis processed and the Redis calls in the spans of each run, and
+checks that every callback ran in the trace of its task:
+
+    python benchmark.py --scenario forget --profiles threads
+"""
+import argparse
+import contextlib
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple
+from urllib.parse import urlparse
+
+import psutil
+import redis
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
+
+import telemetry
+from producer import percentile, run_load
+from tasks import app
+from worker_profiles import WORKER_PROFILES
+
+SCENARIOS = ("profiles", "forget")
+MODES = ("off", "on")
+# load modes compared in the forget scenario
+FORGET_MODES = ("group", "forget")
+
+
+class _SinkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/v1/traces":
+            self.server.record(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-protobuf")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class SpanRecord(NamedTuple):
+    service: str
+    name: str
+    trace_id: bytes
+    end: float
+    attributes: dict
+
+
+def _attribute_value(value):
+    return getattr(value, value.WhichOneof("value")) if value.WhichOneof("value") else None
+
+
+class SpanSink(ThreadingHTTPServer):
+    """Accepts OTLP/HTTP trace exports, counts the spans in them by name, and keeps a record of each one."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), _SinkHandler)
+        self.lock = threading.Lock()
+        self.spans: Dict[str, int] = {}
+        self.records: List[SpanRecord] = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def record(self, body: bytes):
+        request = ExportTraceServiceRequest()
+        request.ParseFromString(body)
+        with self.lock:
+            for resource_spans in request.resource_spans:
+                service = next((_attribute_value(attribute.value) for attribute in resource_spans.resource.attributes
+                                if attribute.key == "service.name"), "")
+                for scope_spans in resource_spans.scope_spans:
+                    for span in scope_spans.spans:
+                        self.spans[span.name] = self.spans.get(span.name, 0) + 1
+                        self.records.append(SpanRecord(
+                            service=service,
+                            name=span.name,
+                            trace_id=span.trace_id,
+                            end=span.end_time_unix_nano / 1e9,
+                            attributes={attribute.key: _attribute_value(attribute.value)
+                                        for attribute in span.attributes},
+                        ))
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+            self.records = []
+
+    def wait_for(self, name: str, count: int, timeout: float = 300.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if self.spans.get(name, 0) >= count:
+                    return
+            time.sleep(0.1)
+        raise TimeoutError(f"the sink didn't receive {count} {name} spans within {timeout}s")
+
+
+@dataclass
+class RunResult:
+    profile: str
+    traced: bool
+    concurrency: int
+    throughput: float
+    p50: float
+    p99: float
+    cpu_seconds: float
+    tasks: int
+    task_spans: int
+
+    @property
+    def tasks_per_cpu_second(self) -> float:
+        return self.tasks / self.cpu_seconds if self.cpu_seconds else 0.0
+
+
+def worker_command(profile: str, concurrency: int, pidfile: str):
+    pool = "gevent" if profile == "gevent" else WORKER_PROFILES[profile]["worker_pool"]
+    return [
+        os.path.join(os.path.dirname(sys.executable), "celery"), "-A", "tasks", "worker",
+        "-P", pool, "-c", str(concurrency), "--loglevel", "WARNING", "--pidfile", pidfile,
+    ]
+
+
+def wait_for_worker(process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"the worker exited with code {process.returncode}")
+        if app.control.ping(timeout=0.5):
+            return
+    raise TimeoutError(f"the worker didn't answer within {timeout}s")
+
+
+def cpu_seconds(process: psutil.Process) -> float:
+    total = 0.0
+    for member in [process, *process.children(recursive=True)]:
+        try:
+            times = member.cpu_times()
+        except psutil.NoSuchProcess:
+            continue
+        total += times.user + times.system
+    return total
+
+
+def worker_env(profile: str, traced: bool, sink: SpanSink, args) -> dict:
+    return dict(
+        os.environ,
+        CELERY_WORKER_PROFILE=profile,
+        OTEL_SERVICE_NAME=f"python-celery-worker-{profile}",
+        OTEL_SDK_DISABLED="false" if traced else "true",
+        OTEL_EXPORTER_OTLP_PROTOCOL="http/protobuf",
+        OTEL_EXPORTER_OTLP_ENDPOINT=sink.endpoint,
+        OTEL_METRICS_EXPORTER="none",
+        OTEL_LOGS_EXPORTER="none",
+        # a burst of tasks creates spans faster than they're exported
+        OTEL_BSP_MAX_QUEUE_SIZE=str(max(2048, args.tasks * 4)),
+        OTEL_BSP_SCHEDULE_DELAY="200",
+    )
+
+
+@contextlib.contextmanager
+def running_worker(profile: str, concurrency: int, env: dict):
+    with tempfile.TemporaryDirectory() as directory:
+        pidfile = os.path.join(directory, "worker.pid")
+        process = subprocess.Popen(worker_command(profile, concurrency, pidfile), env=env,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            wait_for_worker(process)
+            yield psutil.Process(process.pid)
+        finally:
+            # a warm shutdown, so the children flush their spans before they exit
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def run_once(profile: str, traced: bool, sink: SpanSink, args) -> RunResult:
+    concurrency = args.concurrency or WORKER_PROFILES[profile]["worker_concurrency"]
+    with running_worker(profile, concurrency, worker_env(profile, traced, sink, args)) as worker:
+        run_load(min(args.tasks, args.batch_size), "group", args.batch_size)  # warm up
+        # let the spans of the warm-up tasks be exported before counting spans
+        time.sleep(1)
+        sink.reset()
+        cpu_before = cpu_seconds(worker)
+        report = run_load(args.tasks, "group", args.batch_size)
+        cpu_used = cpu_seconds(worker) - cpu_before
+    with sink.lock:
+        task_spans = sink.spans.get("run/tasks.add_timed", 0)
+    return RunResult(
+        profile=profile,
+        traced=traced,
+        concurrency=concurrency,
+        throughput=report.throughput,
+        p50=percentile(report.latencies, 50),
+        p99=percentile(report.latencies, 99),
+        cpu_seconds=cpu_used,
+        tasks=len(report.latencies),
+        task_spans=task_spans,
+    )
+
+
+@dataclass
+class ForgetResult:
+    mode: str
+    tasks: int
+    seconds: float
+    latencies: List[float]
+    redis_commands: int
+    # Redis calls in the spans of the producer and worker, by database
+    broker_calls: int
+    result_calls: int
+    # task_done spans in the trace of their task, in forget mode
+    linked_callbacks: int = 0
+
+    def per_task(self, count: int) -> float:
+        return count / self.tasks if self.tasks else 0.0
+
+
+def _database(url: str) -> int:
+    return int(urlparse(url).path.strip("/") or 0)
+
+
+def redis_commands_processed() -> int:
+    """The number of commands processed by the Redis servers of the broker and the result backend."""
+    servers = {urlparse(url).netloc: url for url in (app.conf.broker_url, app.conf.result_backend)}
+    total = 0
+    for url in servers.values():
+        client = redis.Redis.from_url(url)
+        try:
+            total += client.info("stats")["total_commands_processed"]
+        finally:
+            client.close()
+    return total
+
+
+def trace_producer(sink: SpanSink, args):
+    """Sets up OpenTelemetry in this process, so the producer's Redis calls are counted too."""
+    os.environ.update(
+        OTEL_SERVICE_NAME="python-celery-producer",
+        OTEL_EXPORTER_OTLP_PROTOCOL="http/protobuf",
+        OTEL_EXPORTER_OTLP_ENDPOINT=sink.endpoint,
+        OTEL_METRICS_EXPORTER="none",
+        OTEL_LOGS_EXPORTER="none",
+        OTEL_BSP_MAX_QUEUE_SIZE=str(max(2048, args.tasks * 4)),
+        OTEL_BSP_SCHEDULE_DELAY="200",
+    )
+    telemetry.setup_telemetry()
+
+
+def run_forget(mode: str, sink: SpanSink, args) -> ForgetResult:
+    profile = args.profiles[0]
+    concurrency = args.concurrency or WORKER_PROFILES[profile]["worker_concurrency"]
+    with running_worker(profile, concurrency, worker_env(profile, True, sink, args)):
+        warm_up = min(args.tasks, args.batch_size)
+        run_load(warm_up, mode, args.batch_size)
+        if mode == "forget":
+            sink.wait_for("task_done", warm_up)
+        # let the spans of the warm-up tasks be exported before counting spans
+        time.sleep(1)
+        sink.reset()
+        commands_before = redis_commands_processed()
+        started = time.time()
+        report = run_load(args.tasks, mode, args.batch_size)
+        if mode == "forget":
+            # the sink, not Redis, tells when the callbacks have run
+            sink.wait_for("task_done", args.tasks)
+        redis_commands = redis_commands_processed() - commands_before
+    telemetry.flush_telemetry()
+
+    with sink.lock:
+        records = list(sink.records)
+    databases = [record.attributes.get("db.redis.database_index") for record in records
+                 if record.attributes.get("db.system") == "redis"]
+    result = ForgetResult(
+        mode=mode,
+        tasks=args.tasks,
+        seconds=report.total_seconds,
+        latencies=report.latencies,
+        redis_commands=redis_commands,
+        broker_calls=databases.count(_database(app.conf.broker_url)),
+        result_calls=databases.count(_database(app.conf.result_backend)),
+    )
+    if mode == "forget":
+        callbacks = [record for record in records if record.name == "task_done"]
+        task_traces = {record.trace_id for record in records if record.name == "run/tasks.add_and_forget"}
+        result.latencies = [record.attributes["app.task.latency_ms"] / 1000 for record in callbacks]
+        result.seconds = max(record.end for record in callbacks) - started
+        result.linked_callbacks = sum(record.trace_id in task_traces for record in callbacks)
+    return result
+
+
+def print_results(results):
+    header = (f"{'profile':<10}{'tracing':<9}{'workers':>8}{'tasks/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+              f"{'CPU s':>8}{'tasks/CPU s':>13}{'task spans':>12}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        spans = f"{result.task_spans}/{result.tasks}" if result.traced else "-"
+        print(f"{result.profile:<10}{'on' if result.traced else 'off':<9}{result.concurrency:>8}"
+              f"{result.throughput:>10.0f}{result.p50 * 1000:>10.1f}{result.p99 * 1000:>10.1f}"
+              f"{result.cpu_seconds:>8.1f}{result.tasks_per_cpu_second:>13.0f}{spans:>12}")
+    print("\ntasks/CPU s is the number of tasks per second of CPU time used by the worker and its children")
+
+
+def print_forget_results(results):
+    header = (f"{'mode':<8}{'tasks/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'Redis cmds/task':>17}"
+              f"{'broker calls/task':>19}{'result calls/task':>19}{'linked callbacks':>18}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        linked = f"{result.linked_callbacks}/{result.tasks}" if result.mode == "forget" else "-"
+        print(f"{result.mode:<8}{result.tasks / result.seconds:>10.0f}"
+              f"{percentile(result.latencies, 50) * 1000:>10.1f}{percentile(result.latencies, 99) * 1000:>10.1f}"
+              f"{result.per_task(result.redis_commands):>17.2f}{result.per_task(result.broker_calls):>19.2f}"
+              f"{result.per_task(result.result_calls):>19.2f}{linked:>18}")
+    print("\nRedis cmds/task counts the commands the Redis server processed; broker and result calls/task "
+          "count the Redis calls in the spans of the producer and the worker")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Celery worker profiles, with and without tracing")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="profiles",
+                        help="profiles: each worker profile with and without tracing, "
+                             "forget: waiting for results against fire-and-forget tasks, on the first profile")
+    parser.add_argument("--profiles", nargs="+", choices=list(WORKER_PROFILES), default=list(WORKER_PROFILES))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES),
+                        help="run without (off) and/or with (on) tracing")
+    parser.add_argument("--tasks", type=int, default=5000, help="tasks per run")
+    parser.add_argument("--batch-size", type=int, default=1000, help="tasks per group")
+    parser.add_argument("--concurrency", type=int, default=0, help="override the concurrency of the profiles")
+    args = parser.parse_args()
+
+    sink = SpanSink()
+    if args.scenario == "forget":
+        trace_producer(sink, args)
+        forget_results = []
+        for mode in FORGET_MODES:
+            print(f"running {args.tasks} tasks in {mode} mode on the {args.profiles[0]} profile ...", flush=True)
+            forget_results.append(run_forget(mode, sink, args))
+        print()
+        print_forget_results(forget_results)
+        sink.shutdown()
+        return
+
+    results = []
+    for profile in args.profiles:
+        for mode in args.modes:
+            print(f"running {args.tasks} tasks on the {profile} profile with tracing {mode} ...", flush=True)
+            results.append(run_once(profile, mode == "on", sink, args))
+    print()
+    print_results(results)
+    sink.shutdown()
+
+
+if __name__ == "__main__":
+    main()
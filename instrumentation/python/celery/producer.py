@@ -1,7 +1,125 @@
-from tasks import add
+import argparse
+import gc
+import math
+import time
+from dataclasses import dataclass
+from typing import List
+
+from celery import chord, group
+
+from tasks import add, add_and_forget, add_timed, summarize
+
+LOAD_MODES = ("group", "chord", "chunks", "forget")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def submit_batch(mode, args, chunk_size):
+    if mode == "forget":
+        # no result is stored or subscribed to; the worker calls task_done when each
+        # task is done, without another message or round trip to Redis
+        with add_and_forget.app.producer_or_acquire() as producer:
+            for task_args in args:
+                add_and_forget.apply_async(task_args, producer=producer)
+        return None
+    if mode == "group":
+        # one message per task, all published over the same producer connection
+        return group(add_timed.s(*task_args) for task_args in args).apply_async()
+    if mode == "chord":
+        # the producer only waits for the callback, instead of every task result
+        return chord(add_timed.s(*task_args) for task_args in args)(summarize.s())
+    # one message per chunk of tasks, which the worker runs one after the other
+    return add_timed.chunks(args, chunk_size).group().apply_async()
+
+
+def collect_batch(mode, result, timeout):
+    """Returns the latencies of the tasks in a batch, and when the last of them finished."""
+    value = result.get(timeout=timeout)
+    if mode == "chord":
+        return value["latencies"], value["done_at"]
+    records = value if mode == "group" else [record for chunk in value for record in chunk]
+    return [record["done_at"] - record["sent_at"] for record in records], max(record["done_at"] for record in records)
+
+
+@dataclass
+class LoadReport:
+    tasks: int
+    mode: str
+    batch_size: int
+    latencies: List[float]
+    enqueue_seconds: float
+    total_seconds: float
+
+    @property
+    def throughput(self):
+        return len(self.latencies) / self.total_seconds if self.total_seconds else 0.0
+
+    def summary(self):
+        enqueue = f"enqueue: {self.enqueue_seconds:.2f}s, {self.tasks / self.enqueue_seconds:.0f} tasks/s"
+        if self.mode == "forget":
+            return "\n".join([
+                f"{self.tasks} tasks sent in forget mode, in batches of {self.batch_size}",
+                enqueue,
+                "the producer doesn't wait for the tasks; their latency is recorded on the task_done "
+                "spans of their completion callbacks",
+            ])
+        return "\n".join([
+            f"{len(self.latencies)}/{self.tasks} tasks completed in {self.mode} mode, in batches of {self.batch_size}",
+            enqueue,
+            f"end to end: {self.total_seconds:.2f}s, {self.throughput:.0f} tasks/s",
+            "task latency (sent to finished): "
+            + ", ".join(f"p{pct} {percentile(self.latencies, pct) * 1000:.1f}ms" for pct in (50, 90, 99)),
+        ])
+
+
+def run_load(tasks, mode="group", batch_size=1000, chunk_size=100, timeout=300):
+    started = time.time()
+    pending = []
+    for first in range(0, tasks, batch_size):
+        sent_at = time.time()
+        args = [(number, number, sent_at) for number in range(first, min(first + batch_size, tasks))]
+        pending.append(submit_batch(mode, args, chunk_size))
+    enqueue_seconds = time.time() - started
+    if mode == "forget":
+        return LoadReport(tasks, mode, batch_size, [], enqueue_seconds, enqueue_seconds)
+
+    latencies, finished = [], started
+    # a result collected as garbage while the Redis backend waits for other results
+    # unsubscribes from them in the middle of that wait, which deadlocks, so garbage
+    # is only collected once all the results are in
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for result in pending:
+            batch_latencies, batch_finished = collect_batch(mode, result, timeout)
+            latencies.extend(batch_latencies)
+            finished = max(finished, batch_finished)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return LoadReport(tasks, mode, batch_size, latencies, enqueue_seconds, finished - started)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Send tasks to the Celery worker")
+    parser.add_argument("--load", type=int, default=0, metavar="TASKS",
+                        help="send this many tasks and report the throughput, instead of a single task")
+    parser.add_argument("--mode", choices=LOAD_MODES, default="group", help="how the tasks are sent with --load")
+    parser.add_argument("--batch-size", type=int, default=1000, help="tasks per group or chord")
+    parser.add_argument("--chunk-size", type=int, default=100, help="tasks per message in chunks mode")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for each batch")
+    args = parser.parse_args()
+
+    if args.load:
+        print(run_load(args.load, args.mode, args.batch_size, args.chunk_size, args.timeout).summary())
+        return
+
     result = add.delay(4, 4)
     print(f"Submitted task: {result.id}")
     print(f"Task result: {result.get(timeout=10)}")
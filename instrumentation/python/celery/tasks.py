@@ -1,7 +1,12 @@
 import logging
 import os
+import time
 
 from celery import Celery
+from opentelemetry import trace
+
+import telemetry  # noqa: F401, sets up OpenTelemetry in each worker process
+from worker_profiles import worker_profile
 
 logger = logging.getLogger(__name__)
 
@@ -10,8 +15,53 @@ result_backend = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/2")
 
 app = Celery("otel_celery_example", broker=broker_url, backend=result_backend)
 
+if os.getenv("CELERY_WORKER_PROFILE"):
+    app.conf.update(worker_profile(os.environ["CELERY_WORKER_PROFILE"]))
+
 
 @app.task
 def add(x, y):
     logger.info("Adding %s and %s", x, y)
     return x + y
+
+
+@app.task
+def add_timed(x, y, sent_at):
+    """Like add, but also returns when the task was sent and when it finished, for producer.py --load"""
+    return {"sum": x + y, "sent_at": sent_at, "done_at": time.time()}
+
+
+@app.task
+def summarize(results):
+    """Chord callback, which reduces the results of a batch of add_timed tasks to their latencies"""
+    return {
+        "latencies": [result["done_at"] - result["sent_at"] for result in results],
+        "done_at": max(result["done_at"] for result in results),
+    }
+
+
+tracer = trace.get_tracer(__name__)
+
+
+def task_done(result):
+    """
+    Completion callback of add_and_forget, for producer.py --mode forget.  There's no
+    result for the producer to wait for, so it records the task's latency on a span in
+    the trace of the task instead.
+    """
+    with tracer.start_as_current_span("task_done") as span:
+        span.set_attribute("app.task.sent_at", result["sent_at"])
+        span.set_attribute("app.task.latency_ms", (result["done_at"] - result["sent_at"]) * 1000)
+
+
+class CompletionCallbackTask(app.Task):
+    """Calls task_done in the worker when the task succeeds, while the task's span is still current."""
+
+    def on_success(self, retval, task_id, args, kwargs):
+        task_done(retval)
+
+
+@app.task(base=CompletionCallbackTask, ignore_result=True)
+def add_and_forget(x, y, sent_at):
+    """Like add_timed, but its result isn't stored in the result backend, only passed to task_done"""
+    return {"sum": x + y, "sent_at": sent_at, "done_at": time.time()}
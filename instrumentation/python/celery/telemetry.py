@@ -0,0 +1,84 @@
+"""
+Sets up OpenTelemetry in the worker processes that run the tasks.
+
+The prefork pool runs tasks in forked child processes, so each child sets up its
+own export pipeline in worker_process_init, and flushes it in
+worker_process_shutdown, since children exit when they're recycled or the worker
+stops, taking any spans still in the queue with them.  The threads and gevent
+pools run tasks in the worker's main process, which is set up in worker_init.
+
+When the worker runs under opentelemetry-instrument, OpenTelemetry is already
+set up, and this only adds the flushing.  Set OTEL_SDK_DISABLED=true to run the
+worker without telemetry.
+"""
+import logging
+import os
+
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+from opentelemetry import trace
+
+logger = logging.getLogger(__name__)
+
+FLUSH_TIMEOUT_MILLIS = int(os.getenv("OTEL_FLUSH_TIMEOUT_MILLIS", "5000"))
+
+_setup_pid = None
+
+
+def _telemetry_disabled():
+    return os.getenv("OTEL_SDK_DISABLED", "false").strip().lower() == "true"
+
+
+def _sdk_configured():
+    # the SDK's provider has force_flush, the API's default proxy doesn't
+    return hasattr(trace.get_tracer_provider(), "force_flush")
+
+
+def setup_telemetry():
+    global _setup_pid
+    if _setup_pid == os.getpid() or _telemetry_disabled():
+        return
+    _setup_pid = os.getpid()
+    if _sdk_configured():
+        return
+
+    from opentelemetry.instrumentation.celery import CeleryInstrumentor
+    from opentelemetry.instrumentation.redis import RedisInstrumentor
+    from splunk_otel import init_splunk_otel
+
+    init_splunk_otel()
+    CeleryInstrumentor().instrument()
+    RedisInstrumentor().instrument()
+    logger.info("Set up OpenTelemetry in process %d", os.getpid())
+
+
+def flush_telemetry():
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "force_flush") and not provider.force_flush(FLUSH_TIMEOUT_MILLIS):
+        logger.warning("Timed out flushing spans in process %d", os.getpid())
+
+
+def _is_prefork(pool_cls):
+    name = pool_cls if isinstance(pool_cls, str) else getattr(pool_cls, "__module__", "")
+    return "prefork" in name
+
+
+@worker_init.connect(weak=False)
+def _on_worker_init(sender=None, **kwargs):
+    # prefork children set up their own pipeline after they're forked
+    if not _is_prefork(getattr(sender, "pool_cls", "prefork")):
+        setup_telemetry()
+
+
+@worker_process_init.connect(weak=False)
+def _on_worker_process_init(**kwargs):
+    setup_telemetry()
+
+
+@worker_process_shutdown.connect(weak=False)
+def _on_worker_process_shutdown(**kwargs):
+    flush_telemetry()
+
+
+@worker_shutdown.connect(weak=False)
+def _on_worker_shutdown(**kwargs):
+    flush_telemetry()
@@ -0,0 +1,56 @@
+"""
+Worker settings for each pool, picked with the CELERY_WORKER_PROFILE environment variable:
+
+* prefork: a child process per core, for CPU-bound tasks
+* threads: several threads per core in one process, for I/O-bound tasks
+* gevent: hundreds of greenlets in one process, for tasks that mostly wait on I/O
+
+The gevent pool must also be selected with `-P gevent` on the command line, so its
+monkey patches are applied before anything else is imported.
+
+CELERY_CONCURRENCY, CELERY_PREFETCH_MULTIPLIER and CELERY_ACKS_LATE override the
+settings of the profile.  With CELERY_ACKS_LATE=true, tasks are acknowledged after
+they've run instead of before, so a task running in a worker that dies is delivered
+again.  Tasks must then be safe to run twice, and a prefetch multiplier of 1 keeps
+one slow task from holding up the tasks prefetched behind it.
+"""
+import os
+
+WORKER_PROFILES = {
+    "prefork": {
+        "worker_pool": "prefork",
+        "worker_concurrency": os.cpu_count() or 1,
+        # children take tasks from the parent, which prefetches for all of them
+        "worker_prefetch_multiplier": 4,
+    },
+    "threads": {
+        "worker_pool": "threads",
+        "worker_concurrency": (os.cpu_count() or 1) * 4,
+        "worker_prefetch_multiplier": 4,
+    },
+    "gevent": {
+        "worker_concurrency": 100,
+        # with this many greenlets, each one can wait for its next task on its own
+        "worker_prefetch_multiplier": 1,
+    },
+}
+
+
+def _is_true(value):
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+def worker_profile(name):
+    """Returns the Celery settings of a profile, with the overrides from the environment."""
+    if name not in WORKER_PROFILES:
+        raise ValueError(f"Unknown worker profile {name!r}, expected one of {', '.join(WORKER_PROFILES)}")
+    settings = dict(WORKER_PROFILES[name])
+    if os.getenv("CELERY_CONCURRENCY"):
+        settings["worker_concurrency"] = int(os.environ["CELERY_CONCURRENCY"])
+    if os.getenv("CELERY_PREFETCH_MULTIPLIER"):
+        settings["worker_prefetch_multiplier"] = int(os.environ["CELERY_PREFETCH_MULTIPLIER"])
+    if os.getenv("CELERY_ACKS_LATE"):
+        acks_late = _is_true(os.environ["CELERY_ACKS_LATE"])
+        settings["task_acks_late"] = acks_late
+        settings["task_reject_on_worker_lost"] = acks_late
+    return settings
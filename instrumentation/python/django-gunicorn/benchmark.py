@@ -0,0 +1,390 @@
+"""
+Load tests the example under several Gunicorn worker classes, with and without
+OpenTelemetry auto-instrumentation, to show what the instrumentation costs.
+
+Each run starts Gunicorn, sends requests from a local load generator for a fixed
+time, and exports telemetry to a local OTLP sink started by this script.  It
+reports requests/sec, p50/p99 latency and the RSS of each worker process:
+
+    pip install -r requirements-benchmark.txt
+    python benchmark.py --duration 20 --connections 32
+
+The async scenario compares the dashboard view under WSGI (gthread workers) with
+the async dashboard view under ASGI (Uvicorn workers), against a local downstream
+service, and checks that the trace context reaches the downstream calls:
+
+    python benchmark.py --scenario async --downstream-latency 0.05
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+WORKER_CLASSES = {
+    "sync": ["--worker-class", "sync"],
+    "gthread": ["--worker-class", "gthread"],
+    "gevent": ["--worker-class", "gevent", "--worker-connections", "1000"],
+    "uvicorn": ["--worker-class", "uvicorn.workers.UvicornWorker"],
+}
+WSGI_APP = "django_gunicorn_example.wsgi:application"
+ASGI_APP = "django_gunicorn_example.asgi:application"
+MODES = ("off", "on")
+SCENARIOS = ("overhead", "async")
+# label, worker class, application and path of the runs in the async scenario
+ASYNC_RUNS = (
+    ("wsgi/gthread", "gthread", WSGI_APP, "/dashboard-sync/"),
+    ("asgi/uvicorn", "uvicorn", ASGI_APP, "/dashboard/"),
+)
+
+
+# --- Local OTLP sink ---------------------------------------------------------
+
+class _SinkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.requests[self.path] = self.server.requests.get(self.path, 0) + 1
+            self.server.bytes += len(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-protobuf")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class OtlpSink(ThreadingHTTPServer):
+    """Accepts OTLP/HTTP exports and only counts them."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), _SinkHandler)
+        self.lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.bytes = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.bytes = 0
+
+
+# --- Local downstream service ------------------------------------------------
+
+class _DownstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        traceparent = self.headers.get("traceparent")
+        if traceparent:
+            self.server.traceparents.append(traceparent)
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+
+class Downstream(ThreadingHTTPServer):
+    """A service that answers after `latency` seconds, and keeps the last traceparent headers it got."""
+
+    daemon_threads = True
+    # the workers open many connections at once, more than the default backlog of 5
+    request_queue_size = 1024
+
+    def __init__(self, latency: float, port: int = 0):
+        super().__init__(("127.0.0.1", port), _DownstreamHandler)
+        self.latency = latency
+        self.traceparents = deque(maxlen=100)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+# --- Load generator ----------------------------------------------------------
+
+def _connection_loop(host: str, port: int, path: str, deadline: float, latencies: List[float], errors: List[int]):
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            # http.client reconnects by itself when the server closes the connection,
+            # which the sync worker does after every response
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            errors.append(0)
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def _load_process(host: str, port: int, path: str, connections: int, duration: float):
+    latencies: List[float] = []
+    errors: List[int] = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_connection_loop, args=(host, port, path, deadline, latencies, errors))
+        for _ in range(connections)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, len(errors)
+
+
+def generate_load(host: str, port: int, path: str, connections: int, duration: float, processes: int):
+    """Keeps `connections` requests in flight for `duration` seconds, from several processes."""
+    processes = max(1, min(processes, connections))
+    shares = [connections // processes + (1 if index < connections % processes else 0) for index in range(processes)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_load_process, host, port, path, share, duration) for share in shares]
+        latencies, errors = [], 0
+        for future in futures:
+            process_latencies, process_errors = future.result()
+            latencies.extend(process_latencies)
+            errors += process_errors
+    return latencies, errors
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# --- Gunicorn runs -----------------------------------------------------------
+
+@dataclass
+class RunResult:
+    label: str
+    worker_class: str
+    instrumented: bool
+    requests: int
+    errors: int
+    duration: float
+    p50: float
+    p99: float
+    worker_rss_mb: List[float]
+    otlp_exports: int
+    otlp_bytes: int
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.duration if self.duration else 0.0
+
+
+def gunicorn_command(worker_class: str, instrumented: bool, port: int, workers: int, threads: int,
+                     app: Optional[str] = None) -> List[str]:
+    if app is None:
+        app = ASGI_APP if worker_class == "uvicorn" else WSGI_APP
+    bin_dir = os.path.dirname(sys.executable)
+    command = [
+        os.path.join(bin_dir, "gunicorn"),
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers),
+        "--threads", str(threads),
+        "--log-level", "warning",
+        *WORKER_CLASSES[worker_class],
+        app,
+    ]
+    if instrumented:
+        command.insert(0, os.path.join(bin_dir, "opentelemetry-instrument"))
+    return command
+
+
+def gunicorn_environment(instrumented: bool, sink: OtlpSink, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="django_gunicorn_example.settings", **(extra or {}))
+    if instrumented:
+        env.update({
+            "OTEL_SERVICE_NAME": "python-django-gunicorn-benchmark",
+            "OTEL_EXPORTER_OTLP_PROTOCOL": "http/protobuf",
+            "OTEL_EXPORTER_OTLP_ENDPOINT": sink.endpoint,
+        })
+    return env
+
+
+def wait_until_ready(port: int, path: str, process: subprocess.Popen, log_path: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}, see {log_path}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", path)
+            status = connection.getresponse().status
+            connection.close()
+            if status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"gunicorn didn't answer on port {port} within {timeout}s")
+
+
+def verify_trace_context(port: int, path: str, downstream: Downstream):
+    """Checks that the dashboard's downstream calls and query all ran in the request's trace."""
+    downstream.traceparents.clear()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request("GET", path)
+    body = json.loads(connection.getresponse().read())
+    connection.close()
+    trace_id = body["trace_id"]
+    seen = {call["trace_id"] for call in body["downstream"]} | {body["database"]["trace_id"]}
+    propagated = {traceparent.split("-")[1] for traceparent in downstream.traceparents}
+    if int(trace_id, 16) == 0 or seen != {trace_id} or propagated != {trace_id}:
+        raise RuntimeError(f"trace context was lost in {path}: request trace {trace_id}, "
+                           f"after awaits {sorted(seen)}, sent downstream {sorted(propagated)}")
+    print(f"  trace context ok: {len(body['downstream'])} downstream calls and the query ran in trace {trace_id}")
+
+
+def run_once(worker_class: str, instrumented: bool, sink: OtlpSink, args, app: Optional[str] = None,
+             path: Optional[str] = None, label: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+             verify: Optional[Callable[[int, str], None]] = None) -> RunResult:
+    path = path or args.path
+    label = label or worker_class
+    command = gunicorn_command(worker_class, instrumented, args.port, args.workers, args.threads, app)
+    os.makedirs(args.log_dir, exist_ok=True)
+    log_path = os.path.join(args.log_dir, f"{label.replace('/', '-')}-otel-{'on' if instrumented else 'off'}.log")
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, env=gunicorn_environment(instrumented, sink, env),
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), stdout=log, stderr=log)
+    try:
+        wait_until_ready(args.port, path, process, log_path)
+        if verify is not None:
+            verify(args.port, path)
+        if args.warmup:
+            generate_load("127.0.0.1", args.port, path, args.connections, args.warmup, args.load_processes)
+        sink.reset()
+        latencies, errors = generate_load(
+            "127.0.0.1", args.port, path, args.connections, args.duration, args.load_processes
+        )
+        worker_rss = [child.memory_info().rss / 2 ** 20 for child in psutil.Process(process.pid).children()]
+    finally:
+        # SIGTERM lets the workers flush their telemetry before they exit
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    with sink.lock:
+        exports, exported_bytes = sum(sink.requests.values()), sink.bytes
+    return RunResult(
+        label=label,
+        worker_class=worker_class,
+        instrumented=instrumented,
+        requests=len(latencies),
+        errors=errors,
+        duration=args.duration,
+        p50=percentile(latencies, 50),
+        p99=percentile(latencies, 99),
+        worker_rss_mb=worker_rss,
+        otlp_exports=exports,
+        otlp_bytes=exported_bytes,
+    )
+
+
+def print_results(results: List[RunResult]):
+    header = f"{'worker':<14}{'otel':<6}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'RSS/worker MB':>15}{'OTLP exports':>14}{'overhead':>10}"
+    print(header)
+    print("-" * len(header))
+    baselines = {result.label: result for result in results if not result.instrumented}
+    for result in results:
+        rss = sum(result.worker_rss_mb) / len(result.worker_rss_mb) if result.worker_rss_mb else 0.0
+        baseline = baselines.get(result.label)
+        overhead = ""
+        if result.instrumented and baseline is not None and baseline.rps:
+            overhead = f"{(1 - result.rps / baseline.rps) * 100:.1f}%"
+        print(f"{result.label:<14}{'on' if result.instrumented else 'off':<6}{result.rps:>10.1f}"
+              f"{result.p50 * 1000:>9.2f}{result.p99 * 1000:>9.2f}{result.errors:>8}{rss:>15.1f}"
+              f"{result.otlp_exports:>14}{overhead:>10}")
+    print("\noverhead is the drop in requests/sec compared with the same run without OpenTelemetry")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Measure what OpenTelemetry costs per Gunicorn worker class")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="overhead",
+                        help="overhead: the hello view per worker class, async: WSGI and ASGI dashboard views")
+    parser.add_argument("--worker-classes", nargs="+", choices=list(WORKER_CLASSES), default=list(WORKER_CLASSES))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES),
+                        help="run without (off) and/or with (on) opentelemetry-instrument")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gthread worker")
+    parser.add_argument("--connections", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--load-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="processes the load generator spreads the connections over")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per run")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of load before measuring")
+    parser.add_argument("--path", default="/hello/", help="path requested in the overhead scenario")
+    parser.add_argument("--downstream-latency", type=float, default=0.02,
+                        help="seconds the downstream service takes to answer in the async scenario")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-dir", default="benchmark-logs", help="where the output of each gunicorn run goes")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    sink = OtlpSink()
+    print(f"OTLP sink listening on {sink.endpoint}")
+    results = []
+    if args.scenario == "async":
+        downstream = Downstream(args.downstream_latency)
+        env = {"DOWNSTREAM_URL": downstream.url}
+        for label, worker_class, app, path in ASYNC_RUNS:
+            for mode in args.modes:
+                print(f"running {label} {path} with OpenTelemetry {mode} for {args.duration:.0f}s ...", flush=True)
+                verify = (lambda port, path: verify_trace_context(port, path, downstream)) if mode == "on" else None
+                results.append(run_once(worker_class, mode == "on", sink, args, app=app, path=path,
+                                        label=label, env=env, verify=verify))
+        downstream.shutdown()
+    else:
+        for worker_class in args.worker_classes:
+            for mode in args.modes:
+                print(f"running {worker_class} with OpenTelemetry {mode} for {args.duration:.0f}s ...", flush=True)
+                results.append(run_once(worker_class, mode == "on", sink, args))
+    print()
+    print_results(results)
+    sink.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -11,5 +12,19 @@ MIDDLEWARE = []
 
 ROOT_URLCONF = "django_gunicorn_example.urls"
 WSGI_APPLICATION = "django_gunicorn_example.wsgi.application"
+ASGI_APPLICATION = "django_gunicorn_example.asgi.application"
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+    }
+}
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# The dashboard views call this URL several times per request, and query the database.
+# It has to be a separate service: with the single sync worker, a call back into this
+# application would wait for the worker that's making it
+DOWNSTREAM_URL = os.environ.get("DOWNSTREAM_URL")
+DOWNSTREAM_CALLS = int(os.environ.get("DOWNSTREAM_CALLS", "3"))
@@ -1,7 +1,10 @@
 from django.urls import path
 
-from django_gunicorn_example.views import hello
+from django_gunicorn_example.views import dashboard, dashboard_sync, hello, hello_async
 
 urlpatterns = [
     path("hello/", hello),
+    path("hello-async/", hello_async),
+    path("dashboard/", dashboard),
+    path("dashboard-sync/", dashboard_sync),
 ]
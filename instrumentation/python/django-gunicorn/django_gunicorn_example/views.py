@@ -1,5 +1,91 @@
-from django.http import HttpResponse
+import asyncio
+import threading
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from opentelemetry import trace
+
+# one connection pool per worker, instead of a new connection per call
+_client = httpx.Client(timeout=10)
+_async_clients = {}
+_async_clients_lock = threading.Lock()
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    # an AsyncClient belongs to the event loop it's first used on, which under ASGI lives
+    # as long as the worker.  Its pooled connections keep that loop alive, so the clients
+    # of loops that have been closed are dropped here
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            for closed in [other for other in _async_clients if other.is_closed()]:
+                del _async_clients[closed]
+            client = _async_clients[loop] = httpx.AsyncClient(timeout=10)
+    return client
+
+
+def _downstream_url() -> str:
+    if not settings.DOWNSTREAM_URL:
+        # the default would have been this application, whose only sync worker is
+        # busy with the request that makes the call
+        raise ImproperlyConfigured("Set DOWNSTREAM_URL to the service the dashboard views call")
+    return settings.DOWNSTREAM_URL
+
+
+def _current_trace_id() -> str:
+    return format(trace.get_current_span().get_span_context().trace_id, "032x")
+
+
+def _query_database() -> dict:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_version()")
+        (version,) = cursor.fetchone()
+    return {"sqlite_version": version, "trace_id": _current_trace_id()}
 
 
 def hello(request):
     return HttpResponse("Hello, World!")
+
+
+async def hello_async(request):
+    return HttpResponse("Hello, World!")
+
+
+async def _call_downstream(client: httpx.AsyncClient) -> dict:
+    response = await client.get(_downstream_url())
+    # the trace ID after the await shows whether the context survived it
+    return {"status": response.status_code, "trace_id": _current_trace_id()}
+
+
+async def dashboard(request):
+    """Makes the downstream calls and the database query at the same time."""
+    if isinstance(request, ASGIRequest):
+        return await _dashboard(_get_async_client())
+    # under WSGI, async_to_sync runs every request on a new event loop, so the client
+    # only lives as long as the request, and its connections are closed with it
+    async with httpx.AsyncClient(timeout=10) as client:
+        return await _dashboard(client)
+
+
+async def _dashboard(client: httpx.AsyncClient) -> JsonResponse:
+    *calls, database = await asyncio.gather(
+        *(_call_downstream(client) for _ in range(settings.DOWNSTREAM_CALLS)),
+        sync_to_async(_query_database)(),
+    )
+    return JsonResponse({"trace_id": _current_trace_id(), "downstream": calls, "database": database})
+
+
+def dashboard_sync(request):
+    """The same work as dashboard, one call after the other, for WSGI workers."""
+    calls = []
+    for _ in range(settings.DOWNSTREAM_CALLS):
+        response = _client.get(_downstream_url())
+        calls.append({"status": response.status_code, "trace_id": _current_trace_id()})
+    database = _query_database()
+    return JsonResponse({"trace_id": _current_trace_id(), "downstream": calls, "database": database})
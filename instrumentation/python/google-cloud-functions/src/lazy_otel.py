@@ -0,0 +1,142 @@
+"""
+A lazy version of init_splunk_otel, which main.py uses when OTEL_LAZY_INIT is true.
+
+init_splunk_otel builds the OTLP exporters for traces, metrics and logs while the
+function loads, which imports grpc and the OTLP protobuf modules.  This sets up the
+same providers, with the SDK's own setup and the Splunk distribution's settings, but
+builds each exporter on its first export, in the thread of its batch processor or
+metric reader, so the exporters are imported after the function has started serving
+requests.
+
+Only the otlp exporters are built lazily; if OTEL_TRACES_EXPORTER, OTEL_METRICS_EXPORTER
+or OTEL_LOGS_EXPORTER names any other exporter, this calls init_splunk_otel instead.
+"""
+import os
+import threading
+
+from opentelemetry.sdk._configuration import _init_logging, _init_metrics, _init_tracing
+from opentelemetry.sdk._logs.export import LogExporter
+from opentelemetry.sdk.metrics.export import MetricExporter
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace.export import SpanExporter
+from splunk_otel import init_splunk_otel
+from splunk_otel.distro import SplunkDistro
+from splunk_otel.profile import _start_profiling_if_enabled
+
+_SIGNALS = ("TRACES", "METRICS", "LOGS")
+
+
+def _uses_grpc(signal):
+    protocol = os.environ.get(f"OTEL_EXPORTER_OTLP_{signal}_PROTOCOL") or os.environ.get("OTEL_EXPORTER_OTLP_PROTOCOL")
+    return (protocol or "grpc").strip().lower() == "grpc"
+
+
+def _span_exporter():
+    if _uses_grpc("TRACES"):
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    else:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter()
+
+
+def _metric_exporter():
+    if _uses_grpc("METRICS"):
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+    else:
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+    return OTLPMetricExporter()
+
+
+def _log_exporter():
+    if _uses_grpc("LOGS"):
+        from opentelemetry.exporter.otlp.proto.grpc._log_exporter import OTLPLogExporter
+    else:
+        from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
+    return OTLPLogExporter()
+
+
+class _LazyExporter:
+    """Stands in for an exporter until the first export, and only then builds it."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._exporter = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        with self._lock:
+            if self._exporter is None:
+                self._exporter = self._factory()
+            return self._exporter
+
+    def export(self, batch):
+        return self._get().export(batch)
+
+    def force_flush(self, timeout_millis=30000):
+        return self._exporter is None or self._exporter.force_flush(timeout_millis)
+
+    def shutdown(self):
+        if self._exporter is not None:
+            self._exporter.shutdown()
+
+
+# the SDK creates each exporter from its class with no arguments
+class _LazySpanExporter(_LazyExporter, SpanExporter):
+    def __init__(self):
+        super().__init__(_span_exporter)
+
+
+class _LazyLogExporter(_LazyExporter, LogExporter):
+    def __init__(self):
+        super().__init__(_log_exporter)
+
+
+class _LazyMetricExporter(MetricExporter):
+    """Like _LazyExporter, for the metric reader, which needs a MetricExporter."""
+
+    def __init__(self):
+        self._lazy = _LazyExporter(_metric_exporter)
+        # the reader takes the exporter's preferences when it's created, so the
+        # exporter is built right away if they're configured; otherwise they're the
+        # OTLP exporter's defaults
+        if any(name in os.environ for name in (
+            "OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE",
+            "OTEL_EXPORTER_OTLP_METRICS_DEFAULT_HISTOGRAM_AGGREGATION",
+        )):
+            exporter = self._lazy._get()
+            super().__init__(preferred_temporality=exporter._preferred_temporality,
+                             preferred_aggregation=exporter._preferred_aggregation)
+        else:
+            super().__init__()
+
+    def export(self, metrics_data, timeout_millis=10000, **kwargs):
+        return self._lazy._get().export(metrics_data, timeout_millis=timeout_millis, **kwargs)
+
+    def force_flush(self, timeout_millis=10000):
+        return self._lazy.force_flush(timeout_millis)
+
+    def shutdown(self, timeout_millis=30000, **kwargs):
+        self._lazy.shutdown()
+
+
+def _exporter_names(signal):
+    # the distribution defaults every signal to otlp
+    names = os.environ.get(f"OTEL_{signal}_EXPORTER", "otlp").strip().lower()
+    if names == "none":
+        return []
+    return [name.strip() for name in names.split(",")]
+
+
+def init_splunk_otel_lazily():
+    if any(name != "otlp" for signal in _SIGNALS for name in _exporter_names(signal)):
+        init_splunk_otel()
+        return
+
+    # the environment defaults, realm, access token and propagator of the distribution
+    SplunkDistro().configure()
+    resource = Resource.create()
+    _init_tracing({"otlp": _LazySpanExporter} if _exporter_names("TRACES") else {}, resource=resource)
+    _init_metrics({"otlp": _LazyMetricExporter} if _exporter_names("METRICS") else {}, resource)
+    _init_logging({"otlp": _LazyLogExporter} if _exporter_names("LOGS") else {}, resource,
+                  os.environ.get("OTEL_PYTHON_LOGGING_AUTO_INSTRUMENTATION_ENABLED", "false").strip().lower() == "true")
+    _start_profiling_if_enabled()
@@ -1,10 +1,17 @@
-from splunk_otel import init_splunk_otel
+import os
 import functions_framework
 import logging
 import flask
 from opentelemetry.instrumentation.wsgi import OpenTelemetryMiddleware
 
-init_splunk_otel()
+# OTEL_LAZY_INIT=true builds the exporters on their first export, rather than
+# while the function loads, see lazy_otel.py
+if os.environ.get("OTEL_LAZY_INIT", "false").strip().lower() == "true":
+    from lazy_otel import init_splunk_otel_lazily
+    init_splunk_otel_lazily()
+else:
+    from splunk_otel import init_splunk_otel
+    init_splunk_otel()
 logging.getLogger().setLevel(logging.INFO)
 
 flask.current_app.wsgi_app = OpenTelemetryMiddleware(flask.current_app.wsgi_app)